@@ -1,69 +1,571 @@
+import copy
 import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+import orjson
 
 from services.logging_services.logger import AppLogger
-from models.output_model import Result
+from models.output_model import FileAnalysis, Result
 from services.github_services.diff_parser import DiffParser
+from services.github_services.streaming_diff_parser import DEV_NULL, CompactFile, StreamingDiffParser, render_prompt
+from services.ai_services.prompt_packer import PromptBatch, PromptPacker, estimate_tokens
+from services.ai_services.model_router import PRO, TIER_MODELS, ModelRouter
+from services.ai_services.triage import FileTriage
 from services.github_services.get_pr import GitHubService
+from services.github_services.patch_download import PATCH_MAX_BYTES
 from services.redis_services.redis_cache import RedisCacheService
-from services.ai_services.crew import crew
-from typing import Dict, Any, List
+from services.metrics_services.metrics import (
+    LLM_CALL_SECONDS, LLM_FALLBACKS, LLM_ROUTES, LLM_TOKENS, record_cache_lookup, stage_timer,
+)
+from services.redis_services.cache_keys import analysis_key, file_analysis_key, task_run_key
+from services.redis_services.inflight_registry import InFlightRegistry
+from services.redis_services.pr_heads import PrHeadPointers
+from services.redis_services.rate_limiter import RateLimited, RateLimiter
+from services.redis_services.result_index import ResultIndexWriter
+from services.redis_services.task_events import TaskEventPublisher
+from typing import Dict, Any, Iterator, List
+
+
+# Celery keeps finished task states for an hour (`result_expires`); run statistics live as long.
+TASK_RUN_TTL_SECONDS = 3600
+ANALYSIS_RESULT_TTL_SECONDS = int(os.environ.get("ANALYSIS_RESULT_TTL_SECONDS", 86400))
+# LLM budgets shared by all workers (0 disables a limit), and how long every worker backs off
+# after the provider answered 429 anyway.
+LLM_REQUESTS_PER_MINUTE = int(os.environ.get("LLM_REQUESTS_PER_MINUTE", 150))
+LLM_TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", 2_000_000))
+LLM_RATE_LIMIT_BACKOFF_SECONDS = int(os.environ.get("LLM_RATE_LIMIT_BACKOFF_SECONDS", 30))
+
+
+class AnalysisSuperseded(Exception):
+    """
+    Raised when a newer head commit of the PR is known, so the running analysis is outdated.
+    """
+
+
+class PipelineResources:
+    """
+    The long-lived dependencies of analyses: the GitHub session, the Redis services, the crew and
+    the logger. A worker process builds them once and shares them with every task it runs, so
+    connections (and TLS sessions) to GitHub and Redis are reused across tasks. All of them are
+    safe to use from several threads or greenlets at once.
+
+    Args:
+        github_token: A GitHub token; without one only public repositories can be analysed.
+        crew: The crew reviewing the diffs with every model tier; built with `get_crew(tier)` when omitted.
+        http_pool_size: Keep-alive GitHub connections; at least the number of concurrent tasks.
+        crews: The crew of each model tier, instead of one `crew` for all of them.
+    """
+    def __init__(self, github_token: str = None, crew=None, http_pool_size: int = None, crews: Dict[str, Any] = None):
+        self.diff_parser = StreamingDiffParser()
+        self.result_cache = RedisCacheService(db=2)
+        # GitHub and LLM calls of all workers share their rate limits through Redis.
+        self.rate_limiter = RateLimiter(self.result_cache)
+        # ETag validators are shared with the API through the result cache database.
+        self.github_service = GitHubService(github_token=github_token, etag_store=self.result_cache,
+                                            pool_size=http_pool_size, rate_limiter=self.rate_limiter)
+        self.inflight = InFlightRegistry(self.result_cache)
+        # The newest head of each PR, moved by the API; analyses of older heads stop.
+        self.pr_heads = PrHeadPointers(self.result_cache)
+        # Stored results are decomposed into per-repository indexes for `GET /repos/...`.
+        self.result_index = ResultIndexWriter(self.result_cache)
+        # Progress, per-file analyses and the final result are pushed to `GET /stream/{task_id}`.
+        self.events = TaskEventPublisher(self.result_cache, ttl_seconds=TASK_RUN_TTL_SECONDS)
+        # The crews reviewing the diffs, one per model tier; any object with `copy()` and
+        # `kickoff(inputs=...)` works, which lets benchmarks run the pipeline against a fake LLM.
+        if crews is None and crew is not None:
+            crews = {tier: crew for tier in TIER_MODELS}
+        if crews is None:
+            # Imported here so that only processes running analyses load the AI stack.
+            from services.ai_services.crew import get_crew
+            crews = {tier: get_crew(tier) for tier, model in TIER_MODELS.items() if model}
+        if PRO not in crews:
+            raise ValueError("No LLM model is configured: set LLM_MODEL_PRO or LLM_MODEL_FAST.")
+        self.crews = crews
+        self.crew = crews[PRO]
+        self.logger = AppLogger(name="Pipeline Logger")
+
+
+def _normalize_reported_name(name: str) -> str:
+    """Strips what the crew may add to a file path: whitespace, a leading ./ or /, and git's a/ or b/ prefix."""
+    name = name.strip()
+    while name.startswith(("./", "/")):
+        name = name[1:] if name.startswith("/") else name[2:]
+    return DiffParser.normalize_path(name)
+
+
+def _shard_aliases(files: List[CompactFile]) -> Dict[str, str]:
+    """
+    Maps the names the crew may report a shard's files under to their names: the diff paths with
+    and without prefixes, including the old path of a renamed file. A file's own name always maps to itself.
+    """
+    aliases: Dict[str, str] = {}
+    for file_change in files:
+        for path in (file_change.source_file, file_change.target_file):
+            if path != DEV_NULL:
+                aliases.setdefault(path, file_change.name)
+                aliases.setdefault(_normalize_reported_name(path), file_change.name)
+    aliases.update((file_change.name, file_change.name) for file_change in files)
+    return aliases
+
+
+def _is_rate_limit_error(error: BaseException) -> bool:
+    """Whether an LLM call failed with 429, possibly wrapped by the crew (e.g. litellm's RateLimitError)."""
+    while error is not None:
+        if getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError":
+            return True
+        error = error.__cause__ or error.__context__
+    return False
 
 
 class AnalysisPipeline:
     """
     Orchestrates the entire PR analysis process, including caching and AI interaction.
+
+    A pipeline holds the state of a single run. Its dependencies come from `resources`, which
+    workers build once per process; without them a private set is created.
     """
-    def __init__(self, github_token: str, task_state_updater=None):
-        self.github_service = GitHubService(github_token=github_token)
-        self.diff_parser = DiffParser()
-        # self.diff_cache = RedisCacheService(db=2)
-        self.result_cache = RedisCacheService(db=2)  # <-- Enable result cache
+    def __init__(self, github_token: str = None, task_state_updater=None, shard_size: int = None,
+                 max_concurrency: int = None, task_id: str = None, crew=None, resources: PipelineResources = None):
+        resources = resources or PipelineResources(github_token=github_token, crew=crew)
+        self.diff_parser = resources.diff_parser
+        self.result_cache = resources.result_cache
+        self.github_service = resources.github_service
+        self.inflight = resources.inflight
+        self.pr_heads = resources.pr_heads
+        self.result_index = resources.result_index
+        self.rate_limiter = resources.rate_limiter
+        self.events = resources.events
+        self.crews = {tier: crew for tier in resources.crews} if crew else resources.crews
+        self.crew = self.crews[PRO]
+        self.logger = resources.logger
         self.update_state = task_state_updater
-        self.logger = AppLogger(name="Pipeline Logger")
-        self.logger.info("Initializing analysis pipeline")
+        # The id of the running task, registered in the in-flight registry by the API.
+        self.task_id = task_id
+        self._inflight_result_key = None
+        # The result cache key of the analysis, once it is stored or found there.
+        self.result_key = None
+        # Number of changed files reviewed per crew call, and how many calls run at once.
+        self.shard_size = shard_size or int(os.environ.get("ANALYSIS_SHARD_SIZE", 10))
+        # Drops noise paths, trims context and packs files into calls under the token budget.
+        self.packer = PromptPacker(max_files=self.shard_size)
+        # Keeps everything but code files away from the crew.
+        self.triage = FileTriage(is_generated=self.packer.is_excluded)
+        # Sends small, simple shards to the fast model tier.
+        self.router = ModelRouter()
+        self.max_concurrency = max_concurrency or int(os.environ.get("ANALYSIS_MAX_CONCURRENCY", 4))
+        # Oversized patches are reviewed partially: only their leading files within these caps.
+        self.max_patch_bytes = PATCH_MAX_BYTES
+        self.max_patch_files = int(os.environ.get("PATCH_MAX_FILES", 300))
+        self.max_patch_lines = int(os.environ.get("PATCH_MAX_LINES", 50000))
+        # Per-file analyses are reused across pushes, so they outlive the per-SHA result.
+        self.file_cache_ttl = int(os.environ.get("FILE_ANALYSIS_CACHE_TTL", 7 * 86400))
+        # Run statistics, attached to every progress update. `timings` holds seconds per stage.
+        self.timings: Dict[str, float] = {}
+        self.run_meta: Dict[str, Any] = {"timings": self.timings}
+        self._meta_lock = threading.Lock()
+        self.logger.info("Initializing analysis pipeline for task %s", task_id, task_id=task_id)
+
+    def _publish(self, event: str, data: Any):
+        if self.task_id:
+            self.events.publish(self.task_id, event, data)
 
     def _update_progress(self, state: str, meta: Dict[str, Any]):
         if self.update_state:
-            self.update_state(state=state, meta=meta)
+            # Shard threads update the nested statistics while the snapshot is serialized.
+            with self._meta_lock:
+                snapshot = copy.deepcopy({**self.run_meta, **meta})
+            self.update_state(state=state, meta=snapshot)
+        self._publish("progress", {"state": state, **meta})
+        # Progress doubles as a heartbeat that keeps the in-flight entry alive.
+        if self.task_id and self._inflight_result_key:
+            self.inflight.refresh(self._inflight_result_key, self.task_id)
 
-    def _run_crew_analysis(self, parsed_diff: List[Dict[str, Any]]):
-        self.logger.info("Starting AI analysis with CrewAI...")
-        result_str = crew.kickoff(inputs={"code": parsed_diff}).raw
-        self.logger.info("AI crew analysis completed successfully.Results:\n{result}".format(result=result_str))
-        return json.loads(result_str)
+    def _ensure_latest(self, repo_url: str, pr_number: int, sha: str, patch_sha: str = None):
+        """
+        Stops the analysis if a newer head SHA was registered for the PR (e.g. by a push webhook).
+        The registered head is the SHA the task was enqueued for (`sha`) unless the PR moved since;
+        a patch already built from a later commit (`patch_sha`) is the newest head itself.
+        """
+        head_sha = self.pr_heads.head_sha(repo_url, pr_number)
+        if head_sha and head_sha not in (sha, patch_sha):
+            raise AnalysisSuperseded(
+                f"PR #{pr_number} moved on to {head_sha}; analysis of {patch_sha or sha} is outdated."
+            )
 
-    def run(self, repo_url: str, pr_number: int) -> dict[str, Any] | Result:
-        self._update_progress("INITIALIZING", {"stage": "Fetching PR metadata"})
-        self.logger.info("Fetching PR metadata")
-        latest_sha = self.github_service.get_pr_head_sha(repo_url, pr_number)
-        self.logger.info(f"Latest SHA: {latest_sha}")
-        cache_key_result = f"analysis:{repo_url}:{pr_number}:{latest_sha}"
+    def _call_crew(self, batch: PromptBatch, tier: str) -> Result:
+        """Reviews a shard with the crew of a model tier and validates its output."""
+        if LLM_REQUESTS_PER_MINUTE:
+            self.rate_limiter.acquire("llm-requests", LLM_REQUESTS_PER_MINUTE / 60, LLM_REQUESTS_PER_MINUTE)
+        if LLM_TOKENS_PER_MINUTE:
+            self.rate_limiter.acquire("llm-tokens", LLM_TOKENS_PER_MINUTE / 60, LLM_TOKENS_PER_MINUTE, cost=batch.tokens)
+        # Each call works on its own copy of the crew so shards can run concurrently.
+        start = time.perf_counter()
+        try:
+            output = self.crews[tier].copy().kickoff(inputs={"code": batch.prompt})
+        except Exception as e:
+            if not _is_rate_limit_error(e):
+                raise
+            # Hold back the other workers as well; the task is retried later.
+            self.rate_limiter.pause("llm-requests", LLM_RATE_LIMIT_BACKOFF_SECONDS)
+            raise RateLimited(f"LLM rate limit exceeded: {e}", retry_after=LLM_RATE_LIMIT_BACKOFF_SECONDS) from e
+        elapsed = time.perf_counter() - start
+        LLM_CALL_SECONDS.labels(tier=tier).observe(elapsed)
+        result_str = output.raw
+
+        # Prefer the usage reported by the crew, fall back to estimates.
+        usage = getattr(output, "token_usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or batch.tokens
+        completion_tokens = getattr(usage, "completion_tokens", 0) or estimate_tokens(result_str)
+        LLM_TOKENS.labels(kind="prompt").observe(prompt_tokens)
+        LLM_TOKENS.labels(kind="completion").observe(completion_tokens)
+        with self._meta_lock:
+            self.run_meta["llm_calls"] = self.run_meta.get("llm_calls", 0) + 1
+            self.run_meta["llm_prompt_tokens"] = self.run_meta.get("llm_prompt_tokens", 0) + prompt_tokens
+            self.run_meta["llm_completion_tokens"] = self.run_meta.get("llm_completion_tokens", 0) + completion_tokens
+            # Calls and seconds per model tier, to tune the routing thresholds against the latency SLO.
+            tier_meta = self.run_meta.setdefault("llm_tiers", {}).setdefault(tier, {"calls": 0, "seconds": 0.0})
+            tier_meta["calls"] += 1
+            tier_meta["seconds"] = round(tier_meta["seconds"] + elapsed, 4)
+
+        self.logger.info("AI crew shard analysis completed on the %s model: %d character(s) of output.",
+                         tier, len(result_str), task_id=self.task_id)
+        self.logger.payload("AI crew shard output:", result_str, task_id=self.task_id)
+        return Result.model_validate(json.loads(result_str))
+
+    def _run_crew_analysis(self, batch: PromptBatch) -> List[FileAnalysis]:
+        tier, reason = self.router.route(batch.files)
+        if tier not in self.crews:
+            tier, reason = PRO, "no_fast_model"
+        LLM_ROUTES.labels(tier=tier, reason=reason).inc()
+        with self._meta_lock:
+            reasons = self.run_meta.setdefault("llm_route_reasons", {})
+            reasons[reason] = reasons.get(reason, 0) + 1
+        try:
+            partial = self._call_crew(batch, tier)
+        except ValueError as e:
+            # JSON or Result validation errors, also when the crew validates the output itself.
+            if tier == PRO:
+                raise
+            self.logger.warning("Output of the %s model failed validation, retrying the shard on the pro model: %s",
+                                tier, e, task_id=self.task_id)
+            LLM_FALLBACKS.labels(tier=tier).inc()
+            with self._meta_lock:
+                self.run_meta["llm_fallbacks"] = self.run_meta.get("llm_fallbacks", 0) + 1
+            partial = self._call_crew(batch, PRO)
+
+        # Attribute the reported issues to the files of this shard, one entry per file,
+        # so that every file can be cached on its own.
+        names = list(dict.fromkeys(file_change.name for file_change in batch.files))
+        aliases = _shard_aliases(batch.files)
+        reported: Dict[str, List] = {}
+        for file in partial.files:
+            name = aliases.get(file.name) or aliases.get(_normalize_reported_name(file.name), file.name)
+            reported.setdefault(name, []).extend(file.issues)
+        unknown = [name for name in reported if name not in names]
+        if unknown:
+            self.logger.warning("Keeping issues reported for files outside the shard under their reported names: %s",
+                                unknown, task_id=self.task_id)
+        # Issues of unknown files follow the shard's files; they are not cached, as no diff is theirs.
+        return [FileAnalysis(name=name, issues=reported.pop(name, [])) for name in names] + [
+            FileAnalysis(name=name, issues=issues) for name, issues in reported.items()
+        ]
+
+    def _run_sharded_analysis(self, parsed_diff: List[CompactFile], fingerprints: List[str]) -> List[FileAnalysis]:
+        """
+        Packs the files into token-budgeted shards, reviews them on a bounded thread pool and
+        returns one analysis per parsed file, followed by those of files the crew reported outside
+        its shards. Issues follow shard order, not completion order, so the output is deterministic.
+
+        Every file is written to the per-file cache (under its entry in `fingerprints`) as soon as
+        all its shards are done, so a task retried after a failure, e.g. a rate limit, reuses the
+        files reviewed so far. The first failure cancels the shards that have not started.
+        """
+        with stage_timer("pack", self.timings):
+            shards = self.packer.pack(parsed_diff)
+        tokens_before = sum(estimate_tokens(render_prompt([file])) for file in parsed_diff)
+        tokens_after = sum(shard.tokens for shard in shards)
+        self.run_meta.update({
+            "prompt_tokens_before": self.run_meta.get("prompt_tokens_before", 0) + tokens_before,
+            "prompt_tokens_after": tokens_after,
+        })
+        self.logger.info("Packed %d file(s) into %d shard(s), ~%d -> ~%d prompt tokens.",
+                         len(parsed_diff), len(shards), self.run_meta["prompt_tokens_before"], tokens_after)
+        self.logger.info("Starting AI analysis with CrewAI on %d shard(s)...", len(shards))
+        partials: List[List[FileAnalysis] | None] = [None] * len(shards)
+        done = 0
+        self._update_progress("ANALYZING_DIFFS", {
+            "stage": "Analyzing PR with AI Crew",
+            "shards_done": done,
+            "shards_total": len(shards),
+            "progress": f"{done} of {len(shards)} shards done",
+        })
+
+        # Shards left per file, and the files that can be cached on their own: the issues of a file
+        # changed by several commits cannot be told apart per diff.
+        pending_parts = Counter(name for shard in shards for name in dict.fromkeys(file.name for file in shard.files))
+        occurrences = Counter(file_change.name for file_change in parsed_diff)
+        cache_keys = {
+            file_change.name: file_analysis_key(fingerprint)
+            for file_change, fingerprint in zip(parsed_diff, fingerprints) if occurrences[file_change.name] == 1
+        }
+        reported: Dict[str, List] = {}
+
+        def cache_files(names: List[str]):
+            entries = {
+                cache_keys[name]: FileAnalysis(name=name, issues=reported.get(name, [])).model_dump()
+                for name in names if name in cache_keys
+            }
+            if entries:
+                with stage_timer("cache_write", self.timings):
+                    self.result_cache.set_many(entries, self.file_cache_ttl)
+
+        # Files the packer left out of every shard are complete already.
+        cache_files([name for name in cache_keys if not pending_parts[name]])
+        failure = None
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(shards)))) as executor:
+            futures = {executor.submit(self._run_crew_analysis, shard): index for index, shard in enumerate(shards)}
+            for future in self._iter_completed(set(futures)):
+                try:
+                    partials[futures[future]] = future.result()
+                except BaseException as e:
+                    if failure is None:
+                        # Queued shards would only add load to a failing (e.g. rate limited) provider;
+                        # the running ones finish and are cached for the retry.
+                        failure = e
+                        executor.shutdown(wait=False, cancel_futures=True)
+                    continue
+                done += 1
+                completed = []
+                for file in partials[futures[future]]:
+                    reported.setdefault(file.name, []).extend(file.issues)
+                    pending_parts[file.name] -= 1
+                    if not pending_parts[file.name]:
+                        completed.append(file.name)
+                cache_files(completed)
+                # Files split across shards are streamed in parts; clients merge them by name.
+                for file in partials[futures[future]]:
+                    self._publish("file", file.model_dump())
+                self.logger.info("Shard %d/%d analysed.", futures[future] + 1, len(shards))
+                if failure is None:
+                    self._update_progress("ANALYZING_DIFFS", {
+                        "stage": "Analyzing PR with AI Crew",
+                        "shards_done": done,
+                        "shards_total": len(shards),
+                        "progress": f"{done} of {len(shards)} shards done",
+                    })
+        if failure is not None:
+            raise failure
+
+        self.logger.info("AI crew analysis completed successfully.")
+        # Files split across shards report their issues in several parts.
+        merged: Dict[str, List] = {}
+        for partial in partials:
+            for file in partial:
+                merged.setdefault(file.name, []).extend(file.issues)
+        # A file changed by several commits appears once per commit in the patch. The crew reports
+        # its issues by name, so they all go to its first occurrence. Issues reported for files
+        # outside the diff come last.
+        analyses = [FileAnalysis(name=file_change.name, issues=merged.pop(file_change.name, []))
+                    for file_change in parsed_diff]
+        return analyses + [FileAnalysis(name=name, issues=issues) for name, issues in merged.items()]
+
+    @staticmethod
+    def _iter_completed(pending: set) -> Iterator[Future]:
+        """
+        Yields futures from `pending` as they complete, skipping cancelled ones. Unlike
+        `as_completed`, it does not wait for futures cancelled by `shutdown(cancel_futures=True)`,
+        which never report completion.
+        """
+        while pending:
+            done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                if not future.cancelled():
+                    yield future
+            for future in [future for future in pending if future.cancelled()]:
+                pending.discard(future)
+
+    def _analyze_files(self, parsed_diff: List[CompactFile]) -> Result:
+        """
+        Reuses cached per-file analyses for files whose diff content was already reviewed,
+        sends only the remaining files to the crew and rebuilds the result in diff order.
+        Only code files are reviewed: triage drops binary, generated or vendored (the packer's
+        exclude globs), renamed-only, documentation and trivial (whitespace or version bump) files.
+        Without code files, the result is built without calling the crew.
+        """
+        with stage_timer("triage", self.timings):
+            parsed_diff, skipped = self.triage.split(parsed_diff)
+            syntax_issues = {file_change.name: self.triage.syntax_issues(file_change) for file_change in parsed_diff}
+        excluded = [file_change for files in skipped.values() for file_change in files]
+        if excluded:
+            self.logger.info("Not reviewing %d file(s): %s.", len(excluded),
+                             ", ".join(f"{len(files)} {category}" for category, files in skipped.items()))
+        self.run_meta.update({
+            "excluded_files": [file_change.name for file_change in excluded],
+            "triage": {category: len(files) for category, files in skipped.items()},
+            # What the excluded files would have cost, so the packing savings are complete.
+            "prompt_tokens_before": sum(estimate_tokens(render_prompt([file])) for file in excluded),
+            "prompt_tokens_after": 0,
+        })
+
+        with stage_timer("file_cache_read", self.timings):
+            fingerprints = [file_change.fingerprint() for file_change in parsed_diff]
+            cached_entries = self.result_cache.get_many([file_analysis_key(fingerprint) for fingerprint in fingerprints])
+        analyses: List[FileAnalysis | None] = []
+        for file_change, fingerprint, cached in zip(parsed_diff, fingerprints, cached_entries):
+            analysis = None
+            if cached:
+                try:
+                    analysis = FileAnalysis.model_validate(cached)
+                except Exception as e:
+                    self.logger.warning("Ignoring malformed cached file analysis %s: %s", fingerprint, e)
+            # The cached entry may come from a PR where the file had another name.
+            if analysis is not None:
+                analysis.name = file_change.name
+            analyses.append(analysis)
+
+        misses = [index for index, analysis in enumerate(analyses) if analysis is None]
+        for analysis in analyses:
+            if analysis is not None:
+                self._publish("file", analysis.model_dump())
+        self.run_meta.update({
+            "file_cache_hits": len(parsed_diff) - len(misses),
+            "file_cache_misses": len(misses),
+            # Like excluded files, cache hits count with what they would have cost and are not sent.
+            "prompt_tokens_before": self.run_meta["prompt_tokens_before"] + sum(
+                estimate_tokens(render_prompt([file_change]))
+                for file_change, analysis in zip(parsed_diff, analyses) if analysis is not None
+            ),
+        })
+        record_cache_lookup("file", self.run_meta["file_cache_hits"], len(misses))
+        self.logger.info("File analysis cache: %d hit(s), %d miss(es).", self.run_meta["file_cache_hits"], len(misses))
+
+        if misses:
+            with stage_timer("llm", self.timings):
+                fresh = self._run_sharded_analysis([parsed_diff[index] for index in misses],
+                                                   [fingerprints[index] for index in misses])
+            for index, analysis in zip(misses, fresh):
+                analyses[index] = analysis
+            analyses.extend(fresh[len(misses):])
+
+        # Found locally on every run, so they are neither cached nor sent to the crew.
+        for analysis in analyses:
+            if syntax_issues.get(analysis.name):
+                analysis.issues.extend(syntax_issues[analysis.name])
+                self._publish("file", FileAnalysis(name=analysis.name, issues=syntax_issues[analysis.name]).model_dump())
+        return Result.from_files(analyses)
+
+    def run(self, repo_url: str, pr_number: int, head_sha: str = None) -> dict[str, Any] | Result:
+        """
+        Runs the analysis for a PR. When the caller already resolved the head SHA (e.g. the API
+        while checking its cache), it is passed in and the metadata request is skipped.
+        """
+        try:
+            with stage_timer("total", self.timings):
+                return self._run(repo_url, pr_number, head_sha)
+        finally:
+            if self.task_id:
+                # Celery keeps only the return value of a finished task, so the run statistics are kept aside.
+                self.result_cache.set(task_run_key(self.task_id), self.run_meta, TASK_RUN_TTL_SECONDS)
+
+    def _run(self, repo_url: str, pr_number: int, head_sha: str = None) -> dict[str, Any] | Result:
+        if head_sha:
+            latest_sha = head_sha
+        else:
+            self._update_progress("INITIALIZING", {"stage": "Fetching PR metadata"})
+            self.logger.info("Fetching PR metadata")
+            with stage_timer("fetch_sha", self.timings):
+                latest_sha = self.github_service.get_pr_head_sha(repo_url, pr_number)
+        self.logger.info("Latest SHA: %s", latest_sha)
+        cache_key_result = analysis_key(repo_url, pr_number, latest_sha)
+        self._inflight_result_key = cache_key_result
 
         # --- Step 1: Check cache ---
-        cached_result = self.result_cache.get(cache_key_result)
+        with stage_timer("result_cache_read", self.timings):
+            cached_result = self.result_cache.get(cache_key_result)
+        record_cache_lookup("result", 1 if cached_result else 0, 0 if cached_result else 1)
         if cached_result:
-            self.logger.info(f"Cache hit for {cache_key_result}. Returning cached result.")
+            self.logger.info("Cache hit for %s. Returning cached result.", cache_key_result)
             try:
+                if self.task_id:
+                    self.inflight.release(cache_key_result, self.task_id)
+                self._publish("result", cached_result)
+                self.result_key = cache_key_result
                 return cached_result
             except Exception as e:
-                self.logger.warning(f"Failed to parse cached result: {str(e)}. Proceeding with fresh analysis.")
+                self.logger.warning("Failed to parse cached result: %s. Proceeding with fresh analysis.", e)
 
+        deferred = False
         try:
             # --- Step 2: Fresh analysis ---
-            patch_text = self.github_service.get_pr_patch(repo_url, pr_number)
-            parsed_diff = self.diff_parser.parse(patch_text)
+            self._update_progress("FETCHING_PATCH", {"stage": "Fetching PR patch"})
+            with stage_timer("fetch_patch", self.timings):
+                patch = self.github_service.download_pr_patch(repo_url, pr_number, max_bytes=self.max_patch_bytes)
+            # The parsed files point into the patch buffer, which is released once they are analysed.
+            with patch:
+                patch_sha = patch.head_sha
+                if patch_sha and patch_sha != latest_sha:
+                    # The PR moved between the SHA lookup and the patch download: key the
+                    # result by the commit the patch was actually built from.
+                    self.logger.warning("PR head moved from %s to %s; analysing %s.", latest_sha, patch_sha, patch_sha)
+                    cache_key_result = analysis_key(repo_url, pr_number, patch_sha)
+                self._ensure_latest(repo_url, pr_number, latest_sha, patch_sha)
+                with stage_timer("parse", self.timings):
+                    parsed_diff, truncation_reason = self.diff_parser.parse_limited(
+                        patch.buffer, max_files=self.max_patch_files, max_lines=self.max_patch_lines
+                    )
+                if patch.truncated:
+                    truncation_reason = f"patch larger than {self.max_patch_bytes} bytes"
+                self.run_meta.update({"patch_bytes": patch.size, "patch_spooled": patch.spooled})
+                if truncation_reason:
+                    self.logger.warning("Reviewing only the first %d file(s): %s.", len(parsed_diff), truncation_reason)
 
-            self._update_progress("ANALYZING_DIFFS", {"stage": "Analyzing PR with AI Crew"})
-            self.logger.info("Analyzing PR with AI Crew")
-            final_analysis_result = self._run_crew_analysis(parsed_diff)
-            self.logger.info(f"Final analysis result:\n{final_analysis_result}")
+                self.logger.info("Analyzing PR with AI Crew")
+                result = self._analyze_files(parsed_diff)
+            if truncation_reason:
+                result.summary.truncated = True
+                result.summary.truncation_reason = truncation_reason
+            final_analysis_result = result.model_dump()
+            self.logger.payload("Final analysis result:", final_analysis_result, task_id=self.task_id)
 
             # --- Step 3: Store in cache ---
-            self.result_cache.set(cache_key_result, final_analysis_result, 86400)
-            self.logger.info(f"Result cached under key: {cache_key_result}")
+            # The result was validated when it was built; the API serves these bytes as they are.
+            with stage_timer("cache_write", self.timings):
+                self.result_cache.set_raw_json(cache_key_result, orjson.dumps(final_analysis_result),
+                                               ANALYSIS_RESULT_TTL_SECONDS)
+                self.result_cache.announce_change(cache_key_result)
+            self.result_key = cache_key_result
+            self.logger.info("Result cached under key: %s", cache_key_result)
+            with stage_timer("index", self.timings):
+                self.result_index.record(repo_url, pr_number, patch_sha or latest_sha, final_analysis_result)
 
+            self._publish("result", final_analysis_result)
             return final_analysis_result
 
+        except AnalysisSuperseded as e:
+            self.logger.info("%s", e)
+            self._publish("superseded", {"error": str(e)})
+            raise
+
+        except RateLimited as e:
+            # Not a failure: the task is requeued and keeps its in-flight entry meanwhile.
+            self.logger.warning("Analysis deferred by a rate limit for %.0fs: %s", e.retry_after, e)
+            deferred = True
+            self._publish("progress", {"state": "RATE_LIMITED", "stage": str(e), "retry_after": e.retry_after})
+            raise
+
         except Exception as e:
-            self.logger.error(f"Analysis failed: {str(e)}")
+            self.logger.error("Analysis failed: %s", e, task_id=self.task_id)
+            self._publish("error", {"error": str(e)})
             raise e
+
+        finally:
+            if self.task_id:
+                if deferred:
+                    self.inflight.refresh(self._inflight_result_key, self.task_id)
+                else:
+                    self.inflight.release(self._inflight_result_key, self.task_id)
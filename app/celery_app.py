@@ -1,48 +1,119 @@
 import os
-from celery import Celery
-from app.analysis_pipeline import AnalysisPipeline
-
-# --- Celery App Configuration ---
-# DB 0: Message Broker
-# DB 1: Celery's own result backend (tracks task state and return values)
-celery_app = Celery(
-    "celery_app",
-    broker="redis://localhost:6379/0",
-    backend="redis://localhost:6379/1"
-)
-celery_app.conf.update(
-    task_track_started=True,
-    result_expires=3600,
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
-)
+import random
+import threading
+from celery.exceptions import Ignore
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
+from prometheus_client import start_http_server
+from app.analysis_pipeline import AnalysisPipeline, AnalysisSuperseded, PipelineResources
+from app.task_client import ANALYZE_PR_TASK, celery_app
+from services.github_services.get_pr import GitHubService
+from services.logging_services.logger import stop_logging
+from services.metrics_services.metrics import mark_process_dead, metrics_registry
+from services.redis_services.rate_limiter import RateLimited
+
+# Requeue policy of analyses held back by GitHub or LLM rate limits: exponential backoff from
+# RATE_LIMIT_RETRY_BASE_SECONDS, at least the wait the limit asked for, capped and jittered.
+# Keep the cap below INFLIGHT_TTL_SECONDS, so that waiting tasks keep their in-flight entry.
+RATE_LIMIT_MAX_RETRIES = int(os.environ.get("RATE_LIMIT_MAX_RETRIES", 8))
+RATE_LIMIT_RETRY_BASE_SECONDS = float(os.environ.get("RATE_LIMIT_RETRY_BASE_SECONDS", 15))
+RATE_LIMIT_RETRY_MAX_SECONDS = float(os.environ.get("RATE_LIMIT_RETRY_MAX_SECONDS", 600))
+
+# The worker registers its tasks on the producers' Celery app (see app/task_client.py).
+
+# --- Metrics ---
+# Prefork children write their samples to PROMETHEUS_MULTIPROC_DIR; the worker's main
+# process serves the aggregate when WORKER_METRICS_PORT is set (the API's /metrics shows
+# it as well when both run on one host and share the directory).
+@worker_init.connect
+def start_metrics_server(**_):
+    port = os.environ.get("WORKER_METRICS_PORT")
+    if port:
+        start_http_server(int(port), registry=metrics_registry())
+
+
+@worker_process_shutdown.connect
+def discard_process_metrics(pid=None, **_):
+    mark_process_dead(pid or os.getpid())
+
+
+@worker_process_shutdown.connect
+def flush_process_logs(**_):
+    # Prefork children exit without running atexit handlers; write the queued log records first.
+    stop_logging()
+
+
+# --- Worker Resources ---
+# Clients, caches, the crew and the logger are built once per worker process and shared by
+# all of its tasks. Prefork (and solo) workers build them in `worker_process_init`, before the
+# first task; thread and gevent pools run tasks in the main process, which builds them on the
+# first task. The GitHub connection pool is sized for the tasks the process runs at once.
+_resources = None
+_resources_lock = threading.Lock()
+_worker_concurrency = 1
+
+
+@worker_init.connect
+def record_worker_concurrency(sender=None, **_):
+    global _worker_concurrency
+    _worker_concurrency = getattr(sender, "concurrency", None) or 1
+
+
+def get_pipeline_resources() -> PipelineResources:
+    """Returns the resources of this worker process, building them on first use."""
+    global _resources
+    with _resources_lock:
+        # Rebuilt while Redis is unreachable, so that a worker started while it was down recovers.
+        if _resources is None or _resources.result_cache.redis_client is None:
+            github_token = os.environ.get("GITHUB_API_TOKEN")
+            if not github_token:
+                print("GITHUB_API_TOKEN environment variable not set. Can only analyse public repositories.")
+            _resources = PipelineResources(
+                github_token=github_token,
+                http_pool_size=max(GitHubService.HTTP_POOL_SIZE, _worker_concurrency),
+            )
+        return _resources
+
+
+@worker_process_init.connect
+def init_pipeline_resources(**_):
+    get_pipeline_resources()
+
 
 # --- Celery Task Definition ---
-@celery_app.task(bind=True, name="celery_app.analyze_pr")
-def analyze_pr_task(self, repo_url: str, pr_number: int):
+@celery_app.task(bind=True, name=ANALYZE_PR_TASK)
+def analyze_pr_task(self, repo_url: str, pr_number: int, head_sha: str = None):
     """
     A thin wrapper that executes the main analysis pipeline.
     The complex logic is now encapsulated in the AnalysisPipeline class.
     """
     try:
-        # --- Initialization within the worker ---
-        github_token = os.environ.get("GITHUB_API_TOKEN")
-        if not github_token:
-            print("GITHUB_API_TOKEN environment variable not set. Can only analyse public repositories.")
-
-        # Instantiate the main pipeline orchestrator.
+        # Instantiate the main pipeline orchestrator on the worker's shared resources.
         # We pass the task's `self.update_state` method so the pipeline
         # can report its progress back to Celery.
         pipeline = AnalysisPipeline(
-            github_token=github_token,
-            task_state_updater=self.update_state
+            resources=get_pipeline_resources(),
+            task_state_updater=self.update_state,
+            task_id=self.request.id,
         )
 
-        # Execute the pipeline and return its result.
-        # The return value is automatically stored in Celery's backend (DB 1).
-        res = pipeline.run(repo_url, pr_number)
-        return res
+        # Execute the pipeline. The return value is stored in Celery's backend (DB 1); the
+        # result itself is already in the result cache (DB 2), so only its key is returned.
+        res = pipeline.run(repo_url, pr_number, head_sha=head_sha)
+        if pipeline.result_cache.redis_client is None:
+            # The result cache is unreachable, so there is nothing to refer to.
+            return res
+        return {"result_key": pipeline.result_key}
+
+    except RateLimited as e:
+        # Requeue instead of failing; the retry keeps the task id and its priority.
+        backoff = max(e.retry_after, RATE_LIMIT_RETRY_BASE_SECONDS * 2 ** self.request.retries)
+        countdown = min(RATE_LIMIT_RETRY_MAX_SECONDS, backoff * random.uniform(1.0, 1.2))
+        raise self.retry(exc=e, countdown=countdown, max_retries=RATE_LIMIT_MAX_RETRIES)
+
+    except AnalysisSuperseded as e:
+        # A newer push made this analysis pointless; record why and skip the result.
+        self.update_state(state="SUPERSEDED", meta={"error": str(e)})
+        raise Ignore()
 
     except Exception as e:
         # Let Celery handle the failure state
@@ -1,98 +1,713 @@
-from typing import Union
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 
-from fastapi import FastAPI, HTTPException, Depends
-from celery.result import AsyncResult
+import orjson
+from celery import group
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from services.logging_services.logger import AppLogger
-from models.api_models import TaskCreationResponse, CachedResultResponse, AnalyzePrRequest, TaskStatusResponse, TaskResultModel
-from models.output_model import Result
-from services.github_services.get_pr import GitHubService
-from services.redis_services.redis_cache import RedisCacheService
-from app.celery_app import analyze_pr_task
+from models.api_models import TaskCreationResponse, CachedResultResponse, AnalyzePrRequest, TaskStatusResponse, TaskResultModel, WebhookResponse
+from models.api_models import BatchItemResponse, BatchAnalysisResponse, BatchStatusResponse
+from models.api_models import FileIssueCount, IndexedAnalysis, IndexedIssue, RepoAnalysesResponse, RepoIssuesResponse
+from services.github_services.async_get_pr import AsyncGitHubService, close_async_client
+from services.redis_services.async_redis_cache import AsyncRedisCacheService
+from services.redis_services.async_task_backend import AsyncTaskBackend
+from services.metrics_services.metrics import API_REQUEST_SECONDS, record_cache_lookup, render_metrics
+from services.redis_services.cache_keys import analysis_key, batch_key, repo_slug, task_run_key
+from services.redis_services.inflight_registry import AsyncInFlightRegistry
+from services.redis_services.rate_limiter import AsyncRateLimiter, RateLimited
+from services.redis_services.local_cache import CacheInvalidationListener, LocalCache, TieredCache
+from services.redis_services.pr_heads import AsyncPrHeadPointers
+from services.redis_services.result_index import AsyncResultIndex
+from services.redis_services.task_events import AsyncTaskEventHub, TERMINAL_EVENTS
+# Tasks are sent by name: the API never imports the worker, the pipeline or the AI stack.
+from app.task_client import (
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RESULT_BACKEND_URL, analysis_signature, revoke, send_analysis,
+)
 
 import os
+import uuid
 
-app = FastAPI(title="PR Analysis API")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    cache_invalidations.start()
+    yield
+    await cache_invalidations.close()
+    await close_async_client()
+    await task_event_hub.close()
+
+
+app = FastAPI(title="PR Analysis API", lifespan=lifespan)
 
 # --- Shared Services ---
 logger = AppLogger(name="PR Analysis API")
+task_backend = AsyncTaskBackend(RESULT_BACKEND_URL)
+# One pub/sub connection carries the events of every streamed task.
+task_event_hub = AsyncTaskEventHub(AsyncRedisCacheService(db=2))
+# Serialized results are kept in-process in front of Redis: per analysis key, dropped when a
+# worker announces a newer analysis under the key, and per task id, whose result never changes.
+RESULT_LRU_MAX_ENTRIES = int(os.environ.get("RESULT_LRU_MAX_ENTRIES", 1024))
+RESULT_LRU_TTL_SECONDS = float(os.environ.get("RESULT_LRU_TTL_SECONDS", 300))
+result_lru = LocalCache("result_local", RESULT_LRU_MAX_ENTRIES, RESULT_LRU_TTL_SECONDS)
+task_result_lru = LocalCache("task_result_local", RESULT_LRU_MAX_ENTRIES, RESULT_LRU_TTL_SECONDS)
+result_cache = TieredCache(AsyncRedisCacheService(db=2), result_lru)
+cache_invalidations = CacheInvalidationListener(AsyncRedisCacheService(db=2), [result_lru])
+# Per-repository indexes of the stored results, written by the workers.
+result_index = AsyncResultIndex(AsyncRedisCacheService(db=2))
+REPO_INDEX_MAX_PAGE_SIZE = 100
+REPO_INDEX_TOP_FILES = 10
+# GitHub requests take tokens from the limits the workers use for the same token, and quota
+# headers seen by the API pause the workers too.
+github_rate_limiter = AsyncRateLimiter(AsyncRedisCacheService(db=2))
+# Seconds between keep-alive comments on idle event streams; the task state is re-checked as well.
+STREAM_HEARTBEAT_SECONDS = float(os.environ.get("STREAM_HEARTBEAT_SECONDS", 15))
+# Heartbeats after which a stream of a task that is still unknown to the result backend and has
+# published nothing is closed: the id was never queued, or its queue entry was lost.
+STREAM_MAX_IDLE_HEARTBEATS = int(os.environ.get("STREAM_MAX_IDLE_HEARTBEATS", 40))
+
+# States after which a task will not write its result anymore.
+FINISHED_STATES = ("SUCCESS", "FAILURE", "REVOKED", "SUPERSEDED")
+# Pull request actions that change the head commit and are worth analysing ahead of demand.
+PREWARM_ACTIONS = ("opened", "synchronize", "reopened")
+# Batch analysis limits: PRs per call and concurrent head SHA lookups per call.
+BATCH_MAX_PRS = int(os.environ.get("BATCH_MAX_PRS", 200))
+BATCH_SHA_CONCURRENCY = int(os.environ.get("BATCH_SHA_CONCURRENCY", 10))
+BATCH_TTL_SECONDS = 86400
 
-def app_logger_service():
+# Dependencies are coroutines so that FastAPI does not hand them to the threadpool.
+async def app_logger_service():
     return logger
 
-def get_github_service():
+async def get_result_cache_service():
+    # Instances share the process-wide connection pool of the database.
+    return AsyncRedisCacheService(db=2)
+
+async def get_github_service(cache: AsyncRedisCacheService = Depends(get_result_cache_service)):
     token = os.environ.get("GITHUB_API_TOKEN")
     if not token:
         logger.warning("GITHUB_API_TOKEN environment variable not set")
-    return GitHubService(github_token=token)
+    # ETag validators are shared with the workers through the result cache database.
+    return AsyncGitHubService(github_token=token, etag_store=cache, rate_limiter=github_rate_limiter)
+
+@app.middleware("http")
+async def observe_request_duration(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template, not by path, so task ids do not create new series.
+    route = request.scope.get("route")
+    API_REQUEST_SECONDS.labels(
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=str(response.status_code),
+    ).observe(time.perf_counter() - start)
+    return response
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(_: Request, e: RateLimited):
+    # GitHub's quota for the token is used up; clients should come back once it is refilled.
+    return JSONResponse(status_code=429, content={"detail": str(e)},
+                        headers={"Retry-After": str(max(1, int(e.retry_after + 0.999)))})
+
+def _raw_json_object(fields: dict, name: str, value_json: bytes) -> bytes:
+    """
+    Serializes `fields` plus the member `name` as a JSON object, splicing the value in from
+    already serialized JSON instead of parsing, validating and serializing it again.
+    """
+    head = orjson.dumps(fields)[:-1] + (b"," if fields else b"")
+    return head + orjson.dumps(name) + b":" + value_json + b"}"
+
+def _raw_json_response(fields: dict, name: str, value_json: bytes) -> Response:
+    """Builds a JSON object response with a spliced-in member (see `_raw_json_object`)."""
+    return Response(content=_raw_json_object(fields, name, value_json), media_type="application/json")
+
+def _batch_response(response: BatchAnalysisResponse, cached: Dict[int, bytes]) -> Response:
+    """
+    Builds a batch response whose items at the indexes of `cached` carry those stored result
+    bytes as their `result`, the same way single cache hits are sent.
+    """
+    items = [
+        _raw_json_object(item.model_dump(mode="json", exclude={"result"}), "result", cached[index])
+        if index in cached else orjson.dumps(item.model_dump(mode="json"))
+        for index, item in enumerate(response.items)
+    ]
+    return _raw_json_response(response.model_dump(mode="json", exclude={"items"}), "items",
+                              b"[" + b",".join(items) + b"]")
 
-def get_result_cache_service():
-    return RedisCacheService(db=2)
 
 # --- API Endpoints ---
 @app.post("/analyze-pr", response_model=Union[TaskCreationResponse, CachedResultResponse])
-def start_or_get_analysis(
+async def start_or_get_analysis(
     request: AnalyzePrRequest,
-    cache: RedisCacheService = Depends(get_result_cache_service),
-    gh: GitHubService = Depends(get_github_service),
+    cache: AsyncRedisCacheService = Depends(get_result_cache_service),
+    gh: AsyncGitHubService = Depends(get_github_service),
     l: AppLogger = Depends(app_logger_service)
 ):
-    request_sha = gh.get_pr_head_sha(request.repo_url, request.pr_number)
-    cache_key = f"analysis:{request.repo_url}:{request.pr_number}:{request_sha}"
+    request_sha, updated_at = await gh.get_pr_head(request.repo_url, request.pr_number)
+    cache_key = analysis_key(request.repo_url, request.pr_number, request_sha)
 
-    cached_json = cache.get(cache_key)
-    if cached_json:
-        try:
-            parsed_result = Result.model_validate(cached_json)
-            l.info("Found cached analysis result")
-            return CachedResultResponse(
-                message=f"Cached result found for {request.repo_url}:{request.pr_number}:{request_sha}",
-                cached=True,
-                result=parsed_result
-            )
-        except Exception as e:
-            l.critical(f"Failed to parse cached result: {str(e)}")
+    result_json = await result_cache.get(cache_key)
+    record_cache_lookup("result", 1 if result_json else 0, 0 if result_json else 1)
+    if result_json:
+        l.info("Found cached analysis result")
+        # Same body as CachedResultResponse, around the bytes the worker validated and stored.
+        return _raw_json_response(
+            {"cached": True, "message": f"Cached result found for {request.repo_url}:{request.pr_number}:{request_sha}"},
+            "result", result_json,
+        )
+
+    task_id, started = await _enqueue_analysis(
+        cache, request.repo_url, request.pr_number, request_sha, updated_at, l, PRIORITY_INTERACTIVE
+    )
+    if not started:
+        return TaskCreationResponse(
+            message="Analysis is already in progress.",
+            task_id=task_id
+        )
 
-    task = analyze_pr_task.delay(request.repo_url, request.pr_number)
     return TaskCreationResponse(
         message="Analysis has been started in the background.",
-        task_id=task.id
+        task_id=task_id
     )
 
 
+@app.post("/analyze-prs", response_model=BatchAnalysisResponse)
+async def start_or_get_batch_analysis(
+    requests: List[AnalyzePrRequest],
+    cache: AsyncRedisCacheService = Depends(get_result_cache_service),
+    gh: AsyncGitHubService = Depends(get_github_service),
+    l: AppLogger = Depends(app_logger_service)
+):
+    """
+    Returns cached results of many PRs at once and starts the missing analyses as one Celery group.
+    """
+    if len(requests) > BATCH_MAX_PRS:
+        raise HTTPException(status_code=422, detail=f"At most {BATCH_MAX_PRS} PRs can be analysed per call.")
+
+    semaphore = asyncio.Semaphore(BATCH_SHA_CONCURRENCY)
+
+    async def resolve(request: AnalyzePrRequest) -> Union[Tuple[str, Optional[str]], Exception]:
+        async with semaphore:
+            try:
+                return await gh.get_pr_head(request.repo_url, request.pr_number)
+            except Exception as e:
+                return e
+
+    heads = await asyncio.gather(*(resolve(request) for request in requests))
+
+    items: List[BatchItemResponse] = []
+    resolved: List[Tuple[int, str]] = []
+    # When GitHub last updated each resolved PR, which orders its head pointer.
+    updated_ats: Dict[int, Optional[str]] = {}
+    for request, head in zip(requests, heads):
+        item = BatchItemResponse(repo_url=request.repo_url, pr_number=request.pr_number, status="FAILED")
+        if isinstance(head, Exception):
+            item.error = f"Could not resolve the PR head: {head}"
+        else:
+            item.head_sha, updated_ats[len(items)] = head
+            resolved.append((len(items), analysis_key(request.repo_url, request.pr_number, item.head_sha)))
+        items.append(item)
+
+    # One MGET for every cache key of the batch that is not held in-process.
+    cached_values = await result_cache.get_many([key for _, key in resolved])
+    hits = sum(1 for value in cached_values if value)
+    record_cache_lookup("result", hits, len(cached_values) - hits)
+
+    # Hits are sent as the bytes the worker validated and stored, like single cache hits.
+    cached: Dict[int, bytes] = {}
+    misses: List[int] = []
+    for (index, _), cached_json in zip(resolved, cached_values):
+        if cached_json:
+            items[index].status = "CACHED"
+            cached[index] = cached_json
+        else:
+            misses.append(index)
+
+    claims = await asyncio.gather(*(
+        _claim_analysis(cache, items[index].repo_url, items[index].pr_number, items[index].head_sha,
+                        updated_ats[index], l)
+        for index in misses
+    ))
+
+    signatures = []
+    started = []
+    task_ids = []
+    for index, (task_id, claimed) in zip(misses, claims):
+        item = items[index]
+        item.task_id = task_id
+        task_ids.append(task_id)
+        if claimed:
+            item.status = "TASK_STARTED"
+            signatures.append(
+                analysis_signature(item.repo_url, item.pr_number, item.head_sha, task_id, PRIORITY_BACKGROUND)
+            )
+            started.append((item.repo_url, item.pr_number, item.head_sha, task_id))
+        else:
+            item.status = "IN_PROGRESS"
+
+    if not task_ids:
+        return _batch_response(BatchAnalysisResponse(message="All results were found in the cache.", items=items),
+                               cached)
+
+    if signatures:
+        try:
+            group_result = await run_in_threadpool(group(signatures).apply_async)
+        except Exception:
+            await _release_claims(cache, started, l)
+            raise
+        group_id = group_result.id
+    else:
+        # Every miss is already being computed; the batch only tracks those tasks.
+        group_id = str(uuid.uuid4())
+    # Analyses started by other requests count towards the batch progress as well.
+    await cache.set(batch_key(group_id), {"task_ids": task_ids}, BATCH_TTL_SECONDS)
+
+    l.info("Batch %s: %d cached, %d started, %d already in progress",
+           group_id, len(requests) - len(task_ids), len(signatures), len(task_ids) - len(signatures))
+    return _batch_response(BatchAnalysisResponse(
+        group_id=group_id,
+        message=f"{len(signatures)} analyses have been started in the background.",
+        items=items
+    ), cached)
+
+
+@app.post("/webhooks/github", response_model=WebhookResponse, status_code=202)
+async def github_webhook(
+    request: Request,
+    x_github_event: str = Header(...),
+    x_hub_signature_256: Optional[str] = Header(None),
+    cache: AsyncRedisCacheService = Depends(get_result_cache_service),
+    l: AppLogger = Depends(app_logger_service)
+):
+    """
+    Receives GitHub webhook deliveries and starts analyses of new PR heads before anyone asks for them.
+    """
+    body = await request.body()
+    _verify_webhook_signature(body, x_hub_signature_256)
+
+    if x_github_event == "ping":
+        return WebhookResponse(status="PONG", message="Webhook is configured.")
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Webhook payload is not valid JSON.")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Webhook payload is not a JSON object.")
+    action = payload.get("action")
+    if x_github_event != "pull_request" or action not in PREWARM_ACTIONS:
+        return WebhookResponse(status="IGNORED", message=f"Event {x_github_event}/{action} does not need an analysis.")
+
+    # The payload already carries the head SHA, so no GitHub round trip is needed.
+    repo_url, pr_number, head_sha, updated_at = _pull_request_head(payload)
+    cache_key = analysis_key(repo_url, pr_number, head_sha)
+
+    if await cache.exists(cache_key):
+        return WebhookResponse(status="CACHED", message=f"Analysis of {head_sha} is already cached.")
+
+    task_id, started = await _enqueue_analysis(
+        cache, repo_url, pr_number, head_sha, updated_at, l, PRIORITY_BACKGROUND
+    )
+    if not started:
+        return WebhookResponse(status="IN_PROGRESS", message="Analysis is already in progress.", task_id=task_id)
+
+    l.info("Pre-warming analysis of %s#%s at %s as task %s", repo_url, pr_number, head_sha, task_id)
+    return WebhookResponse(status="TASK_STARTED", message="Analysis has been started in the background.", task_id=task_id)
+
+
+def _verify_webhook_signature(body: bytes, signature: Optional[str]):
+    """Checks the X-Hub-Signature-256 header against the HMAC of the raw body."""
+    secret = os.environ.get("GITHUB_WEBHOOK_SECRET")
+    if not secret:
+        raise HTTPException(status_code=503, detail="Webhook secret is not configured.")
+    expected = "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    # Compared as bytes: compare_digest rejects str arguments with non-ASCII characters.
+    if not signature or not hmac.compare_digest(expected.encode(), signature.encode()):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature.")
+
+
+def _pull_request_head(payload: dict) -> Tuple[str, int, str, Optional[str]]:
+    """Reads the repository URL, PR number, head SHA and update time of a pull_request delivery."""
+    try:
+        repo_url = payload["repository"]["html_url"]
+        pr_number = payload["pull_request"]["number"]
+        head_sha = payload["pull_request"]["head"]["sha"]
+    except (KeyError, TypeError):
+        repo_url = pr_number = head_sha = None
+    if not isinstance(repo_url, str) or type(pr_number) is not int or not isinstance(head_sha, str):
+        raise HTTPException(status_code=400,
+                            detail="Pull request payload lacks the repository URL, PR number or head SHA.")
+    return repo_url, pr_number, head_sha, payload["pull_request"].get("updated_at")
+
+
+async def _enqueue_analysis(
+    cache: AsyncRedisCacheService,
+    repo_url: str,
+    pr_number: int,
+    head_sha: str,
+    updated_at: Optional[str],
+    l: AppLogger,
+    priority: int
+) -> Tuple[str, bool]:
+    """
+    Starts an analysis of the given PR head unless one is already running.
+
+    Args:
+        cache: The result cache, which also holds the in-flight registry and PR head pointers.
+        repo_url: The repository URL.
+        pr_number: The pull request number.
+        head_sha: The head commit to analyse.
+        updated_at: When GitHub last updated the PR, which orders its heads; None if unknown.
+        l: The request logger.
+        priority: The broker priority of the task (PRIORITY_INTERACTIVE or PRIORITY_BACKGROUND).
+
+    Returns:
+        The id of the task computing the result and whether it was started by this call.
+    """
+    task_id, claimed = await _claim_analysis(cache, repo_url, pr_number, head_sha, updated_at, l)
+    if not claimed:
+        return task_id, False
+
+    # The worker reuses the SHA resolved here instead of fetching the PR metadata again.
+    # Publishing to the broker is blocking, so it runs on the threadpool.
+    try:
+        task = await run_in_threadpool(
+            send_analysis, repo_url, pr_number, head_sha, task_id, priority
+        )
+    except Exception:
+        await _release_claims(cache, [(repo_url, pr_number, head_sha, task_id)], l)
+        raise
+    return task.id, True
+
+
+async def _release_claims(cache: AsyncRedisCacheService, claims: List[Tuple[str, int, str, str]], l: AppLogger):
+    """
+    Releases in-flight claims whose tasks could not be published. A task id that never reached the
+    broker reads as PENDING, so its entry would otherwise be returned to every request until it expires.
+    """
+    registry = AsyncInFlightRegistry(cache)
+    for repo_url, pr_number, head_sha, task_id in claims:
+        l.warning("Could not queue the analysis of %s#%s at %s; releasing task %s",
+                  repo_url, pr_number, head_sha, task_id)
+        await registry.release(analysis_key(repo_url, pr_number, head_sha), task_id)
+
+
+async def _claim_analysis(
+    cache: AsyncRedisCacheService,
+    repo_url: str,
+    pr_number: int,
+    head_sha: str,
+    updated_at: Optional[str],
+    l: AppLogger
+) -> Tuple[str, bool]:
+    """
+    Claims the analysis of a PR head in the in-flight registry. When claimed, the caller must start
+    the task under the returned id; otherwise the id is the one of the task already running.
+    """
+    cache_key = analysis_key(repo_url, pr_number, head_sha)
+
+    # Concurrent requests for the same PR head share one task.
+    task_id, claimed = await AsyncInFlightRegistry(cache).claim(cache_key, is_stale=_is_task_finished)
+    if not claimed:
+        l.info("Analysis for %s already in progress as task %s", cache_key, task_id)
+        return task_id, False
+
+    await _supersede_previous_head(cache, repo_url, pr_number, head_sha, updated_at, task_id, l)
+    return task_id, True
+
+
+async def _supersede_previous_head(
+    cache: AsyncRedisCacheService,
+    repo_url: str,
+    pr_number: int,
+    head_sha: str,
+    updated_at: Optional[str],
+    task_id: str,
+    l: AppLogger
+):
+    """
+    Points the PR at its new head and revokes a still-queued analysis of an older head.
+    A running analysis of an older head notices the new pointer and stops before the AI run.
+
+    A late or repeated delivery of an older head leaves the pointer alone, so its own analysis
+    is the one that stops as superseded.
+    """
+    moved, previous_sha, previous_task_id = await AsyncPrHeadPointers(cache).advance(
+        repo_url, pr_number, head_sha, task_id, updated_at
+    )
+    if not moved:
+        if previous_sha and previous_sha != head_sha:
+            l.info("Head %s of %s#%s is older than the known head %s", head_sha, repo_url, pr_number, previous_sha)
+        return
+
+    if not previous_sha or previous_sha == head_sha or not previous_task_id:
+        return
+    if await _is_task_finished(previous_task_id):
+        return
+    l.info("Revoking analysis %s of superseded head %s", previous_task_id, previous_sha)
+    await run_in_threadpool(revoke, previous_task_id)
+
+
+async def _is_task_finished(task_id: str) -> bool:
+    """An in-flight task that already finished (e.g. failed or was revoked) will not write the result."""
+    meta = await task_backend.get_task_meta(task_id)
+    return meta["status"] in FINISHED_STATES
+
+
 @app.get("/status/{task_id}", response_model=TaskStatusResponse)
-def get_task_status(task_id: str):
+async def get_task_status(task_id: str, cache: AsyncRedisCacheService = Depends(get_result_cache_service)):
     """
-    Retrieves the current status of a background task, including custom progress states.
+    Retrieves the current status of a background task, including custom progress states
+    and the run statistics (stage timings, cache and token counts). Failed, revoked, superseded
+    and retrying tasks also report their `error`.
     """
-    task_result = AsyncResult(task_id, app=analyze_pr_task.app)
-    if not task_result.state:
+    meta = await task_backend.get_task_meta(task_id)
+    if not meta.get("status"):
         raise HTTPException(status_code=404, detail="Task ID not found.")
 
+    if meta["status"] in FINISHED_STATES or meta["status"] == "RETRY":
+        # The backend holds the result (or the exception) of these tasks; their statistics are stored aside.
+        run_meta = await cache.get(task_run_key(task_id))
+        if meta["status"] != "SUCCESS":
+            run_meta = {**(run_meta or {}), "error": _task_error(meta)}
+    else:
+        run_meta = meta["result"] if isinstance(meta["result"], dict) else None
+
     return TaskStatusResponse(
         task_id=task_id,
-        status=task_result.state,
+        status=meta["status"],
+        meta=run_meta,
+    )
+
+
+@app.get("/stream/{task_id}")
+async def stream_task_events(task_id: str, last_event_id: Optional[str] = Header(None)):
+    """
+    Streams the events of a task as Server-Sent Events: `progress` on every stage change, `file`
+    for every file analysis as soon as it is ready, and finally `result` (or `error`/`superseded`),
+    after which the stream closes. Reconnecting clients resume after the `Last-Event-ID` they saw.
+    A task that stays unknown for STREAM_MAX_IDLE_HEARTBEATS heartbeats ends with an `error` event.
+    """
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    return StreamingResponse(
+        _task_event_stream(task_id, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(event: str, data, event_id: int = None) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+async def _task_event_stream(task_id: str, after: int) -> AsyncIterator[str]:
+    last_seq = after
+    async with task_event_hub.subscription(task_id) as queue:
+        # Subscribed before replaying, so nothing published in between is lost;
+        # events seen in both are dropped by their sequence number.
+        for seq, event, data in await task_event_hub.replay(task_id):
+            if seq <= last_seq:
+                continue
+            last_seq = seq
+            yield _sse(event, data, seq)
+            if event in TERMINAL_EVENTS:
+                return
+
+        check_state = True
+        idle_heartbeats = 0
+        while True:
+            if check_state:
+                # Covers tasks that finished before we subscribed and whose log expired,
+                # or that failed before publishing anything.
+                meta = await task_backend.get_task_meta(task_id)
+                final = await _final_event(task_id, meta)
+                if final:
+                    while not queue.empty():
+                        seq, event, data = queue.get_nowait()
+                        if seq > last_seq:
+                            last_seq = seq
+                            yield _sse(event, data, seq)
+                            if event in TERMINAL_EVENTS:
+                                return
+                    yield _sse(*final)
+                    return
+                if meta["status"] == "PENDING" and idle_heartbeats >= STREAM_MAX_IDLE_HEARTBEATS:
+                    yield _sse("error", {"error": "Task ID not found."})
+                    return
+            try:
+                seq, event, data = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                check_state = True
+                idle_heartbeats += 1
+                continue
+            check_state = False
+            idle_heartbeats = 0
+            if seq > last_seq:
+                last_seq = seq
+                yield _sse(event, data, seq)
+                if event in TERMINAL_EVENTS:
+                    return
+
+
+async def _final_event(task_id: str, meta: dict) -> Optional[Tuple[str, dict]]:
+    """Builds the terminal event of a finished task from its backend meta, or None if it is still running."""
+    if meta["status"] not in FINISHED_STATES:
+        return None
+    if meta["status"] == "SUCCESS":
+        results_json = await _task_result_json(task_id, meta)
+        if results_json is None:
+            return "error", {"error": "The result has expired."}
+        return "result", orjson.loads(results_json)
+    return ("superseded" if meta["status"] == "SUPERSEDED" else "error"), {"error": _task_error(meta)}
+
+
+async def _task_result_json(task_id: str, meta: dict) -> Optional[bytes]:
+    """
+    Returns the result of a successful task as JSON bytes, or None if it expired from the result
+    cache. Workers return the result cache key of the result rather than a copy of it.
+    """
+    results_json = task_result_lru.get(task_id)
+    if results_json is not None:
+        return results_json
+    result = meta["result"]
+    if isinstance(result, dict) and set(result) == {"result_key"}:
+        results_json = await result_cache.get(result["result_key"])
+    else:
+        # Returned in full by workers without a reachable result cache, or before results were referenced.
+        results_json = orjson.dumps(result)
+    if results_json is not None:
+        task_result_lru.set(task_id, results_json)
+    return results_json
+
+
+def _task_error(meta: dict) -> str:
+    """Extracts the error message of a failed task from its backend meta."""
+    error_info = meta["result"] if isinstance(meta["result"], dict) else {"exc_message": meta["result"]}
+    error = error_info.get("error") or error_info.get("exc_message") or "Unknown error"
+    if isinstance(error, list):
+        error = " ".join(str(part) for part in error)
+    return error
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Exposes API and worker metrics in the Prometheus text format.
+    """
+    # Aggregating multi-process metrics reads files, so it runs on the threadpool.
+    body, content_type = await run_in_threadpool(render_metrics)
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/batch/{group_id}", response_model=BatchStatusResponse)
+async def get_batch_status(group_id: str, cache: AsyncRedisCacheService = Depends(get_result_cache_service)):
+    """
+    Retrieves the aggregate progress of a batch started by `POST /analyze-prs`.
+    """
+    batch = await cache.get(batch_key(group_id))
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch ID not found.")
+
+    metas = await task_backend.get_many_task_meta(batch["task_ids"])
+    statuses = [meta["status"] for meta in metas]
+    return BatchStatusResponse(
+        group_id=group_id,
+        total=len(statuses),
+        completed=sum(status in FINISHED_STATES for status in statuses),
+        succeeded=statuses.count("SUCCESS"),
+        failed=sum(status in FINISHED_STATES and status != "SUCCESS" for status in statuses),
+        tasks=[TaskStatusResponse(task_id=task_id, status=status) for task_id, status in zip(batch["task_ids"], statuses)],
     )
 
 
 @app.get("/result/{task_id}", response_model=TaskResultModel)
-def get_task_result(task_id: str):
+async def get_task_result(task_id: str):
     """
     Retrieves the final result of a completed and successful task.
     """
-    task_result = AsyncResult(task_id, app=analyze_pr_task.app)
+    results_json = task_result_lru.get(task_id)
+    if results_json is None:
+        meta = await task_backend.get_task_meta(task_id)
 
-    if not task_result.ready():
-        raise HTTPException(status_code=404, detail="Task is not yet complete or does not exist.")
+        if meta["status"] not in FINISHED_STATES:
+            raise HTTPException(status_code=404, detail="Task is not yet complete or does not exist.")
 
-    if task_result.failed():
-        error_info = task_result.info if isinstance(task_result.info, dict) else {'error': str(task_result.info)}
-        raise HTTPException(status_code=500, detail=f"Task failed: {error_info.get('error', 'Unknown error')}")
+        if meta["status"] != "SUCCESS":
+            raise HTTPException(status_code=500, detail=f"Task failed: {_task_error(meta)}")
 
-    parsed_results = Result.model_validate(task_result.get())
+        # The worker validated the result before storing it, so its bytes are sent as they are.
+        results_json = await _task_result_json(task_id, meta)
+        if results_json is None:
+            raise HTTPException(status_code=404, detail="The result of the task has expired.")
 
-    return TaskResultModel(
-        task_id=task_id,
-        status=task_result.state,
-        results=parsed_results,
+    return _raw_json_response({"task_id": task_id, "status": "SUCCESS"}, "results", results_json)
+
+
+@app.get("/repos/{owner}/{repo}/analyses", response_model=RepoAnalysesResponse)
+async def list_repo_analyses(
+    owner: str,
+    repo: str,
+    latest: bool = False,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=REPO_INDEX_MAX_PAGE_SIZE),
+):
+    """
+    Lists a repository's analyses newest first, or with `latest` only the latest analysis of each
+    PR. `since` and `until` bound the Unix time at which analyses finished; to page, pass back the
+    `until` of the first page with the returned `next_offset`.
+    """
+    repo_id = repo_slug(f"{owner}/{repo}")
+    since, until = result_index.window(since, until)
+    if latest:
+        # Entries of PRs that left the window are skipped, so the page may be short but not the last.
+        items, scanned = await result_index.latest_analyses(repo_id, since, until, offset, limit)
+    else:
+        items = await result_index.analyses(repo_id, since, until, offset, limit)
+        scanned = len(items)
+    return RepoAnalysesResponse(
+        repo=repo_id,
+        items=[IndexedAnalysis.model_validate(item) for item in items],
+        until=until,
+        next_offset=offset + scanned if scanned == limit else None,
     )
 
+
+@app.get("/repos/{owner}/{repo}/issues", response_model=RepoIssuesResponse)
+async def list_repo_issues(
+    owner: str,
+    repo: str,
+    issue_type: Optional[str] = Query(None, alias="type"),
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=REPO_INDEX_MAX_PAGE_SIZE),
+):
+    """
+    Lists the issues reported in a repository's analyses newest first, of one `type` if given,
+    paged like `GET /repos/{owner}/{repo}/analyses`. The response also counts the issues of the
+    latest analysis of each PR by type and for the files with the most issues.
+    """
+    repo_id = repo_slug(f"{owner}/{repo}")
+    since, until = result_index.window(since, until)
+    items = await result_index.issues(repo_id, issue_type, since, until, offset, limit)
+    issue_types, top_files = await result_index.issue_counts(repo_id, REPO_INDEX_TOP_FILES)
+    return RepoIssuesResponse(
+        repo=repo_id,
+        type=issue_type.strip().lower() if issue_type else None,
+        items=[IndexedIssue.model_validate(item) for item in items],
+        until=until,
+        next_offset=offset + limit if len(items) == limit else None,
+        issue_types=issue_types,
+        top_files=[FileIssueCount(file=name, issues=count) for name, count in top_files],
+    )
@@ -0,0 +1,63 @@
+"""
+The Celery application as seen by task producers.
+
+The API only enqueues analyses, so it sends tasks by name through this module and never
+imports the worker code (`app.celery_app`), the analysis pipeline or the AI stack.
+"""
+import os
+from typing import Optional
+
+from celery import Celery
+from celery.canvas import Signature
+from celery.result import AsyncResult
+
+# --- Celery App Configuration ---
+# DB 0: Message Broker
+# DB 1: Celery's own result backend (tracks task state and return values)
+BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0")
+RESULT_BACKEND_URL = os.environ.get("CELERY_RESULT_BACKEND", "redis://localhost:6379/1")
+celery_app = Celery(
+    "celery_app",
+    broker=BROKER_URL,
+    backend=RESULT_BACKEND_URL
+)
+celery_app.conf.update(
+    task_track_started=True,
+    result_expires=3600,
+    task_serializer="json",
+    accept_content=["json"],
+    result_serializer="json",
+    # Redis emulates message priorities with one list per step; lower numbers are consumed first.
+    broker_transport_options={"priority_steps": list(range(10))},
+    # Reserve one task at a time, so that queued interactive analyses are not stuck behind
+    # background work already prefetched by a worker.
+    worker_prefetch_multiplier=1,
+)
+
+# Analyses someone waits for go ahead of pre-warming by webhooks and batches.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 6
+
+# Registered name of `app.celery_app.analyze_pr_task`.
+ANALYZE_PR_TASK = "celery_app.analyze_pr"
+
+
+def analysis_signature(repo_url: str, pr_number: int, head_sha: Optional[str], task_id: str,
+                       priority: int = PRIORITY_BACKGROUND) -> Signature:
+    """Describes an analysis task call, e.g. as a member of a group."""
+    return celery_app.signature(
+        ANALYZE_PR_TASK, args=(repo_url, pr_number, head_sha), task_id=task_id, priority=priority
+    )
+
+
+def send_analysis(repo_url: str, pr_number: int, head_sha: Optional[str], task_id: str,
+                  priority: int = PRIORITY_INTERACTIVE) -> AsyncResult:
+    """Enqueues an analysis under the given task id. Publishing blocks on the broker."""
+    return celery_app.send_task(
+        ANALYZE_PR_TASK, args=(repo_url, pr_number, head_sha), task_id=task_id, priority=priority
+    )
+
+
+def revoke(task_id: str):
+    """Tells the workers to skip a queued task."""
+    celery_app.control.revoke(task_id)
@@ -0,0 +1,83 @@
+"""
+Checks the API process against its startup budget: import time of `app.main`, peak RSS after
+the import, and that none of the AI stack (crewai, litellm, ...) is loaded.
+
+Import times come from `python -X importtime` in a fresh interpreter. The process exits with
+status 1 when a budget is exceeded, so the check can gate CI.
+
+Usage:
+    python -m benchmarks.bench_api_startup --max-import-ms 2500 --max-rss-mb 120
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+
+# Modules that only the Celery worker needs.
+FORBIDDEN_MODULES = ("crewai", "litellm", "openai", "chromadb", "instructor", "tiktoken", "app.analysis_pipeline")
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "import_seconds": elapsed,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+    "forbidden": [name for name in %r if name in sys.modules],
+}))
+""" % (FORBIDDEN_MODULES,)
+
+_IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure() -> dict:
+    """Imports the API in a fresh interpreter and collects its import profile."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE], check=True, capture_output=True, text=True,
+    )
+    probe = json.loads(process.stdout.strip().splitlines()[-1])
+
+    # Cumulative time of the top-level packages (no indentation beyond the first level).
+    top_level = []
+    for line in process.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match and len(match.group(3)) == 1:
+            top_level.append((int(match.group(2)), match.group(4)))
+    top_level.sort(reverse=True)
+
+    return {
+        "import_ms": round(probe["import_seconds"] * 1000, 1),
+        "peak_rss_mb": round(probe["peak_rss_mb"], 1),
+        "modules_loaded": probe["modules"],
+        "forbidden_modules_loaded": probe["forbidden"],
+        "slowest_top_level_imports_ms": {name: round(micros / 1000, 1) for micros, name in top_level[:10]},
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--max-import-ms", type=float, default=2500)
+    arg_parser.add_argument("--max-rss-mb", type=float, default=120)
+    arg_parser.add_argument("--report-only", action="store_true", help="Do not fail when a budget is exceeded.")
+    args = arg_parser.parse_args()
+
+    result = measure()
+    violations = []
+    if result["import_ms"] > args.max_import_ms:
+        violations.append(f"import took {result['import_ms']} ms (budget {args.max_import_ms} ms)")
+    if result["peak_rss_mb"] > args.max_rss_mb:
+        violations.append(f"peak RSS is {result['peak_rss_mb']} MB (budget {args.max_rss_mb} MB)")
+    if result["forbidden_modules_loaded"]:
+        violations.append(f"the API loads worker-only modules: {result['forbidden_modules_loaded']}")
+    result["budget_violations"] = violations
+
+    print(json.dumps(result, indent=2))
+    if violations and not args.report_only:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
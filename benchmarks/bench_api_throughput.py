@@ -0,0 +1,153 @@
+"""
+Measures `/analyze-pr` throughput of the FastAPI app against a local fake GitHub API and a
+local Redis stand-in, with results pre-seeded in the cache so every request is a hit.
+With `--no-local-cache` the in-process result LRU is disabled, so every hit is read from Redis.
+
+Usage:
+    python -m benchmarks.bench_api_throughput --clients 300 --requests 6000
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+import orjson
+
+from benchmarks.fake_github import FakeGitHub
+from benchmarks.fake_redis import FakeRedis
+from models.output_model import FileAnalysis, Issue, Result
+
+REPO_URL = "https://github.com/bench/repo"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _sample_result(files: int = 20, issues: int = 5) -> dict:
+    analyses = [
+        FileAnalysis(name=f"src/file_{index}.py", issues=[
+            Issue(type="style", line=line, description="Synthetic issue.", suggestion="Synthetic fix.")
+            for line in range(issues)
+        ])
+        for index in range(files)
+    ]
+    return Result.from_files(analyses).model_dump()
+
+
+def seed_cache(github: FakeGitHub, redis_port: int, prs: int):
+    """Stores a result for the current head of every benchmark PR."""
+    from services.redis_services.cache_keys import analysis_key
+    from services.redis_services.redis_cache import RedisCacheService
+
+    cache = RedisCacheService(host="127.0.0.1", port=redis_port, db=2)
+    # Stored as the worker stores it: the canonical JSON bytes of the result.
+    result_json = orjson.dumps(_sample_result())
+    for number in range(1, prs + 1):
+        cache.set_raw_json(analysis_key(REPO_URL, number, github.head_sha(number)), result_json, 3600)
+
+
+async def _run_clients(base_url: str, clients: int, total: int, prs: int) -> list[float]:
+    latencies: list[float] = []
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for index in range(total):
+        queue.put_nowait(index % prs + 1)
+
+    async def client(http: httpx.AsyncClient):
+        while not queue.empty():
+            number = queue.get_nowait()
+            start = time.perf_counter()
+            response = await http.post("/analyze-pr", json={"repo_url": REPO_URL, "pr_number": number})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        await asyncio.gather(*(client(http) for _ in range(clients)))
+    return latencies
+
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("API process exited during startup.")
+        try:
+            httpx.get(f"{url}/docs", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("API did not start in time.")
+
+
+def measure(clients: int, requests: int, prs: int, github_latency: float, local_cache: bool = True) -> dict:
+    """Starts the API in a subprocess and drives `requests` cached `/analyze-pr` calls through it."""
+    github = FakeGitHub(latency=github_latency).start()
+    redis_server = FakeRedis().start()
+    seed_cache(github, redis_server.port, prs)
+
+    port = _free_port()
+    redis_url = f"redis://127.0.0.1:{redis_server.port}"
+    env = {
+        **os.environ,
+        "GITHUB_API_URL": github.url,
+        "GITHUB_API_TOKEN": os.environ.get("GITHUB_API_TOKEN", "bench-token"),
+        "REDIS_HOST": "127.0.0.1",
+        "REDIS_PORT": str(redis_server.port),
+        "CELERY_BROKER_URL": f"{redis_url}/0",
+        "CELERY_RESULT_BACKEND": f"{redis_url}/1",
+    }
+    if not local_cache:
+        env["RESULT_LRU_MAX_ENTRIES"] = "0"
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning",
+         "--timeout-keep-alive", "120"],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        _wait_until_up(base_url, api)
+        start = time.perf_counter()
+        latencies = asyncio.run(_run_clients(base_url, clients, requests, prs))
+        elapsed = time.perf_counter() - start
+    finally:
+        api.terminate()
+        api.wait()
+        github.stop()
+        redis_server.stop()
+
+    latencies.sort()
+    return {
+        "clients": clients,
+        "local_cache": local_cache,
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "latency_p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "latency_p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        "github_requests": dict(github.stats),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--clients", type=int, default=300)
+    arg_parser.add_argument("--requests", type=int, default=6000)
+    arg_parser.add_argument("--prs", type=int, default=50)
+    arg_parser.add_argument("--github-latency", type=float, default=0.02, help="Seconds per fake GitHub response.")
+    arg_parser.add_argument("--no-local-cache", action="store_true", help="Disable the in-process result LRU.")
+    args = arg_parser.parse_args()
+
+    print(json.dumps(measure(args.clients, args.requests, args.prs, args.github_latency,
+                             local_cache=not args.no_local_cache), indent=2))
+
+
+if __name__ == "__main__":
+    main()
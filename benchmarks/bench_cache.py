@@ -0,0 +1,70 @@
+"""
+Measures `RedisCacheService` latency for hits, misses, writes and batched reads.
+
+Runs against the in-memory Redis stand-in unless `--redis-host`/`--redis-port` point at a
+real server; numbers against the stand-in include its own Python overhead.
+
+Usage:
+    python -m benchmarks.bench_cache --iterations 2000
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import Callable
+
+from benchmarks.bench_api_throughput import _sample_result
+from benchmarks.fake_redis import FakeRedis
+
+
+def _timed(operation: Callable[[int], object], iterations: int) -> dict:
+    latencies = []
+    for index in range(iterations):
+        start = time.perf_counter()
+        operation(index)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "p50_us": round(statistics.median(latencies) * 1e6, 1),
+        "p99_us": round(latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1e6, 1),
+    }
+
+
+def measure(host: str, port: int, iterations: int, batch: int) -> dict:
+    """Times single-key reads and writes and `batch`-key MGETs of a typical analysis result."""
+    from services.redis_services.redis_cache import RedisCacheService
+
+    cache = RedisCacheService(host=host, port=port, db=2)
+    value = _sample_result()
+    keys = [f"bench:cache:{index}" for index in range(max(iterations, batch))]
+
+    return {
+        "value_bytes": len(cache.codec.encode(value)),
+        "set": _timed(lambda index: cache.set(keys[index], value, 600), iterations),
+        "get_hit": _timed(lambda index: cache.get(keys[index]), iterations),
+        "get_miss": _timed(lambda index: cache.get(f"bench:cache:missing:{index}"), iterations),
+        f"get_many_{batch}": _timed(lambda index: cache.get_many(keys[:batch]), max(1, iterations // batch)),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--iterations", type=int, default=2000)
+    arg_parser.add_argument("--batch", type=int, default=50, help="Keys per MGET.")
+    arg_parser.add_argument("--redis-host", help="Use a real Redis server instead of the stand-in.")
+    arg_parser.add_argument("--redis-port", type=int, default=6379)
+    args = arg_parser.parse_args()
+
+    if args.redis_host:
+        print(json.dumps(measure(args.redis_host, args.redis_port, args.iterations, args.batch), indent=2))
+        return
+
+    redis_server = FakeRedis().start()
+    try:
+        print(json.dumps(measure("127.0.0.1", redis_server.port, args.iterations, args.batch), indent=2))
+    finally:
+        redis_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compares parse time and peak RSS of `DiffParser` and `StreamingDiffParser`.
+
+Each parser runs in a fresh subprocess so that peak RSS is not shared between them.
+
+Usage:
+    python -m benchmarks.bench_diff_parser --files 200 --hunks 20 --lines 50
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.synthetic import make_patch
+
+
+def _peak_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(parser: str, files: int, hunks: int, lines: int) -> dict:
+    """Parses a synthetic patch with one parser and renders it to prompt text."""
+    patch = make_patch(files, hunks, lines)
+    baseline_kb = _peak_rss_kb()
+
+    start = time.perf_counter()
+    if parser == "dict":
+        from services.github_services.diff_parser import DiffParser
+        parsed = DiffParser().parse(patch)
+        parse_seconds = time.perf_counter() - start
+        prompt = str(parsed)
+    else:
+        from services.github_services.streaming_diff_parser import StreamingDiffParser, render_prompt
+        parsed = StreamingDiffParser().parse(patch.encode())
+        parse_seconds = time.perf_counter() - start
+        prompt = render_prompt(parsed)
+    total_seconds = time.perf_counter() - start
+
+    return {
+        "parser": parser,
+        "patch_bytes": len(patch),
+        "diff_lines": files * hunks * lines,
+        "parse_seconds": round(parse_seconds, 4),
+        "parse_and_render_seconds": round(total_seconds, 4),
+        "prompt_chars": len(prompt),
+        "peak_rss_delta_mb": round((_peak_rss_kb() - baseline_kb) / 1024, 1),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--files", type=int, default=200)
+    arg_parser.add_argument("--hunks", type=int, default=20)
+    arg_parser.add_argument("--lines", type=int, default=50)
+    arg_parser.add_argument("--parser", choices=["dict", "streaming"], help="Run a single parser in-process.")
+    args = arg_parser.parse_args()
+
+    if args.parser:
+        print(json.dumps(measure(args.parser, args.files, args.hunks, args.lines)))
+        return
+
+    results = []
+    for parser in ("dict", "streaming"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_diff_parser", "--parser", parser,
+             "--files", str(args.files), "--hunks", str(args.hunks), "--lines", str(args.lines)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
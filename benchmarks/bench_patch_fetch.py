@@ -0,0 +1,107 @@
+"""
+Compares peak RSS and time of fetching and parsing a large patch from the fake GitHub API,
+buffered as one string (a plain `requests` GET, as patches were fetched before streaming) or
+streamed and spooled to a memory-mapped temporary file (`download_pr_patch`).
+
+Each mode runs in a fresh subprocess, against a fake API served by the parent process, so that
+neither peak RSS nor the served patch is shared with the measured code. Besides peak RSS, the
+anonymous RSS after parsing is reported: pages of the memory-mapped file count towards RSS
+while touched, but they are page cache that the kernel can reclaim, unlike a patch string.
+
+Usage:
+    python -m benchmarks.bench_patch_fetch --files 2000 --hunks 20 --lines 50
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.fake_github import FakeGitHub
+from benchmarks.synthetic import make_patch
+
+REPO_URL = "https://github.com/bench/repo"
+
+
+def _status_kb(field: str) -> int:
+    # getrusage's peak RSS survives exec, so the child would report the parent's; /proc does not.
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _fetch_patch_text(service, pr_number: int) -> str:
+    import requests
+
+    response = requests.get(service._pr_api_url(REPO_URL, pr_number),
+                            headers={"Accept": "application/vnd.github.v3.patch"})
+    response.raise_for_status()
+    return response.text
+
+
+def measure(mode: str) -> dict:
+    """Fetches and parses PR #1 of the fake API at GITHUB_API_URL in the given mode."""
+    from services.github_services.get_pr import GitHubService
+    from services.github_services.streaming_diff_parser import StreamingDiffParser
+
+    service = GitHubService(github_token="bench-token")
+    baseline_kb, baseline_anon_kb = _status_kb("VmHWM"), _status_kb("RssAnon")
+    start = time.perf_counter()
+    if mode == "text":
+        patch_text = _fetch_patch_text(service, 1)
+        parsed = StreamingDiffParser().parse(patch_text)
+        patch_bytes, spooled = len(patch_text), False
+    else:
+        patch = service.download_pr_patch(REPO_URL, 1, max_bytes=2 ** 40)
+        parsed = StreamingDiffParser().parse(patch.buffer)
+        patch_bytes, spooled = patch.size, patch.spooled
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "patch_bytes": patch_bytes,
+        "files_parsed": len(parsed),
+        "spooled": spooled,
+        "fetch_and_parse_seconds": round(elapsed, 4),
+        "peak_rss_delta_mb": round((_status_kb("VmHWM") - baseline_kb) / 1024, 1),
+        "anon_rss_delta_mb": round((_status_kb("RssAnon") - baseline_anon_kb) / 1024, 1),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--files", type=int, default=2000)
+    arg_parser.add_argument("--hunks", type=int, default=20)
+    arg_parser.add_argument("--lines", type=int, default=50)
+    arg_parser.add_argument("--spool-threshold", type=int, default=8 * 1024 * 1024)
+    arg_parser.add_argument("--mode", choices=["text", "spooled"], help="Run a single mode in-process.")
+    args = arg_parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.mode)))
+        return
+
+    github = FakeGitHub(patch_factory=lambda number: make_patch(args.files, args.hunks, args.lines)).start()
+    github.patch_bytes(1)
+    results = []
+    try:
+        for mode in ("text", "spooled"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_patch_fetch", "--mode", mode],
+                check=True, capture_output=True, text=True, env={
+                    **os.environ,
+                    "GITHUB_API_URL": github.url,
+                    "PATCH_SPOOL_THRESHOLD_BYTES": str(args.spool_threshold),
+                },
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        github.stop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
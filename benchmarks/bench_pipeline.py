@@ -0,0 +1,98 @@
+"""
+Measures end-to-end `AnalysisPipeline.run` latency against a local fake GitHub API, the
+in-memory Redis stand-in and a fake crew with configurable latency.
+
+For every corpus size three runs are timed: a cold run, a run for the same head (served
+from the result cache) and a run for a new head with the same diff (served from the
+per-file analysis cache).
+
+Usage:
+    python -m benchmarks.bench_pipeline --sizes 10x5x20 50x10x40 --llm-latency 0.5
+"""
+import argparse
+import json
+import os
+import time
+from typing import List, Tuple
+
+from benchmarks.fake_github import FakeGitHub
+from benchmarks.fake_llm import FakeCrew
+from benchmarks.fake_redis import FakeRedis
+from benchmarks.synthetic import make_patch
+
+REPO_URL = "https://github.com/bench/repo"
+
+
+def parse_size(value: str) -> Tuple[int, int, int]:
+    """Parses a `files x hunks x lines` corpus size such as `10x5x20`."""
+    files, hunks, lines = (int(part) for part in value.lower().split("x"))
+    return files, hunks, lines
+
+
+def _corpus(sizes: List[Tuple[int, int, int]]):
+    """
+    Serves two PRs per size: an odd number with the synthetic patch and the next even number
+    with the same diff under another head SHA, as after a rebase.
+    """
+    def patch_factory(number: int) -> str:
+        files, hunks, lines = sizes[(number - 1) // 2]
+        patch = make_patch(files, hunks, lines)
+        if number % 2 == 0:
+            head_sha = f"{number:040x}"
+            patch = f"From {head_sha}" + patch[len("From ") + 40:]
+        return patch
+    return patch_factory
+
+
+def measure(sizes: List[Tuple[int, int, int]], llm_latency: float, seconds_per_1k_tokens: float) -> List[dict]:
+    github = FakeGitHub(patch_factory=_corpus(sizes)).start()
+    redis_server = FakeRedis().start()
+    # The services read their endpoints from the environment when first imported.
+    os.environ.update({
+        "GITHUB_API_URL": github.url,
+        "REDIS_HOST": "127.0.0.1",
+        "REDIS_PORT": str(redis_server.port),
+    })
+    from app.analysis_pipeline import AnalysisPipeline
+
+    results = []
+    try:
+        for index, (files, hunks, lines) in enumerate(sizes):
+            number = index * 2 + 1
+            crew = FakeCrew(latency=llm_latency, seconds_per_1k_tokens=seconds_per_1k_tokens)
+            timings = {}
+            for run, pr_number in (("cold", number), ("result_cache_hit", number), ("file_cache_hit", number + 1)):
+                pipeline = AnalysisPipeline(github_token="bench-token", crew=crew)
+                start = time.perf_counter()
+                pipeline.run(REPO_URL, pr_number)
+                timings[f"{run}_seconds"] = round(time.perf_counter() - start, 4)
+                if run == "cold":
+                    timings["prompt_tokens_before"] = pipeline.run_meta.get("prompt_tokens_before")
+                    timings["prompt_tokens_after"] = pipeline.run_meta.get("prompt_tokens_after")
+                    timings["cold_stage_seconds"] = dict(pipeline.timings)
+            results.append({
+                "size": f"{files}x{hunks}x{lines}",
+                "diff_lines": files * hunks * lines,
+                **timings,
+                "llm_calls": crew.calls,
+            })
+    finally:
+        github.stop()
+        redis_server.stop()
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--sizes", nargs="+", default=["10x5x20", "50x10x40"],
+                            help="Corpus sizes as files x hunks x lines.")
+    arg_parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per fake crew call.")
+    arg_parser.add_argument("--llm-seconds-per-1k-tokens", type=float, default=0.0)
+    args = arg_parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes]
+    print(json.dumps(measure(sizes, args.llm_latency, args.llm_seconds_per_1k_tokens), indent=2))
+
+
+if __name__ == "__main__":
+    main()
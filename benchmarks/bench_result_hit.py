@@ -0,0 +1,93 @@
+"""
+Measures the API's cost of answering a result cache hit, from the stored bytes to the response
+body: decoded, validated into `Result` and serialized again through `response_model` (before),
+against the stored JSON bytes sent as they are (after).
+
+Both routes run in one FastAPI app driven in-process through ASGI, with the stored value held
+in memory, so Redis and network latency are left out.
+
+Usage:
+    python -m benchmarks.bench_result_hit --sizes 20x5 100x10 300x20 --iterations 500
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Union
+
+import httpx
+import orjson
+from fastapi import FastAPI
+
+from benchmarks.bench_api_throughput import _sample_result
+from models.api_models import CachedResultResponse, TaskCreationResponse
+from models.output_model import Result
+from services.redis_services.codecs import default_codec
+
+
+def _build_app(stored: bytes) -> FastAPI:
+    from app.main import _raw_json_response
+
+    codec = default_codec()
+    app = FastAPI()
+
+    @app.get("/before", response_model=Union[TaskCreationResponse, CachedResultResponse])
+    async def before():
+        return CachedResultResponse(message="Cached result found.", cached=True,
+                                    result=Result.model_validate(codec.decode(stored)))
+
+    @app.get("/after", response_model=Union[TaskCreationResponse, CachedResultResponse])
+    async def after():
+        return _raw_json_response({"cached": True, "message": "Cached result found."}, "result",
+                                  codec.decode_json(stored))
+
+    return app
+
+
+async def _time_route(http: httpx.AsyncClient, path: str, iterations: int) -> dict:
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = await http.get(path)
+        latencies.append(time.perf_counter() - start)
+    response.raise_for_status()
+    latencies.sort()
+    return {
+        "p50_us": round(statistics.median(latencies) * 1e6, 1),
+        "p99_us": round(latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1e6, 1),
+        "body_bytes": len(response.content),
+    }
+
+
+async def measure_size(files: int, issues: int, iterations: int) -> dict:
+    """Times both routes for a result of `files` files with `issues` issues each."""
+    stored = default_codec().encode_json(orjson.dumps(_sample_result(files, issues)))
+    transport = httpx.ASGITransport(app=_build_app(stored))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        before_body = (await http.get("/before")).json()
+        after_body = (await http.get("/after")).json()
+        assert before_body == after_body, "Both routes must return the same document."
+        result = {"size": f"{files}x{issues}", "stored_bytes": len(stored)}
+        for route in ("before", "after"):
+            result[route] = await _time_route(http, f"/{route}", iterations)
+    result["speedup_p50"] = round(result["before"]["p50_us"] / result["after"]["p50_us"], 2)
+    return result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--sizes", nargs="+", default=["20x5", "100x10", "300x20"],
+                            help="FILESxISSUES of the cached results.")
+    arg_parser.add_argument("--iterations", type=int, default=500)
+    args = arg_parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        files, issues = (int(part) for part in size.split("x"))
+        results.append(asyncio.run(measure_size(files, issues, args.iterations)))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
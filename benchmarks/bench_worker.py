@@ -0,0 +1,80 @@
+"""
+Measures worker throughput on short, cache-hit analyses, with the pipeline dependencies built
+per task (as before) and shared by the worker process (`PipelineResources`).
+
+Tasks run on a thread pool like a Celery `--pool threads` worker; with `--concurrency 1` they
+run one after another like a prefork child. Besides tasks per second, the number of TCP
+connections opened to the fake GitHub API shows how much connection (and, against
+api.github.com, TLS handshake) reuse the shared session gives.
+
+Usage:
+    python -m benchmarks.bench_worker --tasks 500 --concurrency 8
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_github import FakeGitHub
+from benchmarks.fake_llm import FakeCrew
+from benchmarks.fake_redis import FakeRedis
+
+REPO_URL = "https://github.com/bench/repo"
+
+
+def measure(tasks: int, concurrency: int, prs: int) -> dict:
+    github = FakeGitHub().start()
+    redis_server = FakeRedis().start()
+    # The services read their endpoints from the environment when first imported.
+    os.environ.update({
+        "GITHUB_API_URL": github.url,
+        "REDIS_HOST": "127.0.0.1",
+        "REDIS_PORT": str(redis_server.port),
+    })
+    from app.analysis_pipeline import AnalysisPipeline, PipelineResources
+
+    crew = FakeCrew(latency=0.0)
+    shared = PipelineResources(github_token="bench-token", crew=crew, http_pool_size=concurrency)
+    results = {}
+    try:
+        # Warm the result cache, so every measured task is a metadata request plus a cache hit.
+        for pr_number in range(1, prs + 1):
+            AnalysisPipeline(resources=shared).run(REPO_URL, pr_number)
+
+        for mode in ("per_task", "shared"):
+            github.stats.update({name: 0 for name in github.stats})
+
+            def task(index: int):
+                resources = shared if mode == "shared" else None
+                # No task id: the Redis stand-in has no scripting for the in-flight registry and events.
+                pipeline = AnalysisPipeline(github_token="bench-token", crew=crew, resources=resources)
+                pipeline.run(REPO_URL, index % prs + 1)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(task, range(tasks)))
+            elapsed = time.perf_counter() - start
+            results[mode] = {
+                "tasks_per_second": round(tasks / elapsed, 1),
+                "mean_task_ms": round(elapsed / tasks * concurrency * 1000, 2),
+                "github_connections": github.stats["connections"],
+                "github_requests": github.stats["metadata"] + github.stats["not_modified"],
+            }
+    finally:
+        github.stop()
+        redis_server.stop()
+    return {"tasks": tasks, "concurrency": concurrency, **results}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--tasks", type=int, default=500)
+    arg_parser.add_argument("--concurrency", type=int, default=8, help="Worker threads, as in `--pool threads -c N`.")
+    arg_parser.add_argument("--prs", type=int, default=20, help="Distinct PRs the tasks cycle through.")
+    args = arg_parser.parse_args()
+    print(json.dumps(measure(args.tasks, args.concurrency, args.prs), indent=2))
+
+
+if __name__ == "__main__":
+    main()
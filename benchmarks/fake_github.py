@@ -0,0 +1,137 @@
+"""
+A local stand-in for the GitHub pulls API, serving synthetic patches.
+
+`GET /repos/{owner}/{repo}/pulls/{number}` answers with PR metadata JSON, or with the patch
+when the `application/vnd.github.v3.patch` media type is requested. Metadata responses
+carry an ETag and honour `If-None-Match`. Request and connection counts are available at `GET /_stats`
+and can be reset with `DELETE /_stats`.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict
+
+from benchmarks.synthetic import make_patch
+
+_PULL_PATH = re.compile(r"^/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/pulls/(?P<number>\d+)$")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Accept bursts of hundreds of concurrent connections.
+    request_queue_size = 1024
+
+
+class FakeGitHub:
+    """
+    Runs the fake API on a background thread.
+
+    Args:
+        patch_factory: Builds the patch served for a PR number; defaults to a small synthetic patch.
+        latency: Seconds to sleep before answering each request.
+    """
+    def __init__(self, patch_factory: Callable[[int], str] = None, latency: float = 0.0, port: int = 0):
+        self.patch_factory = patch_factory or (lambda number: make_patch(files=5, hunks=2, lines=10, seed=number))
+        self.latency = latency
+        self.stats: Dict[str, int] = {"connections": 0, "metadata": 0, "not_modified": 0, "patch": 0}
+        self._patches: Dict[int, str] = {}
+        self._encoded: Dict[int, bytes] = {}
+        self._updated_at: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", port), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "FakeGitHub":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def patch(self, number: int) -> str:
+        with self._lock:
+            if number not in self._patches:
+                self._patches[number] = self.patch_factory(number)
+                self._updated_at[number] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            return self._patches[number]
+
+    def patch_bytes(self, number: int) -> bytes:
+        """The encoded patch, kept so that serving it does not copy it per request."""
+        patch = self.patch(number)
+        with self._lock:
+            if number not in self._encoded:
+                self._encoded[number] = patch.encode()
+            return self._encoded[number]
+
+    def head_sha(self, number: int) -> str:
+        match = re.findall(r"^From ([0-9a-f]{40}) ", self.patch(number), re.MULTILINE)
+        return match[-1] if match else hashlib.sha1(str(number).encode()).hexdigest()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                fake._count("connections")
+
+            def do_GET(self):
+                if self.path == "/_stats":
+                    with fake._lock:
+                        return self._send(200, json.dumps(fake.stats).encode(), "application/json")
+                match = _PULL_PATH.match(self.path)
+                if not match:
+                    return self._send(404, b'{"message": "Not Found"}', "application/json")
+                if fake.latency:
+                    threading.Event().wait(fake.latency)
+
+                number = int(match.group("number"))
+                if "patch" in self.headers.get("Accept", ""):
+                    fake._count("patch")
+                    return self._send(200, fake.patch_bytes(number), "text/x-patch")
+
+                sha = fake.head_sha(number)
+                etag = f'"{sha}"'
+                if self.headers.get("If-None-Match") == etag:
+                    fake._count("not_modified")
+                    return self._send(304, b"", None, {"ETag": etag})
+                fake._count("metadata")
+                body = json.dumps({"number": number, "head": {"sha": sha},
+                                   "updated_at": fake._updated_at[number]}).encode()
+                return self._send(200, body, "application/json", {"ETag": etag})
+
+            def do_DELETE(self):
+                if self.path == "/_stats":
+                    with fake._lock:
+                        for name in fake.stats:
+                            fake.stats[name] = 0
+                return self._send(204, b"", None)
+
+            def _send(self, status: int, body: bytes, content_type: str = None, headers: Dict[str, str] = None):
+                self.send_response(status)
+                if content_type:
+                    self.send_header("Content-Type", content_type)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
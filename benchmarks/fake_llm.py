@@ -0,0 +1,62 @@
+"""
+A deterministic stand-in for the AI crew, for benchmarks without an LLM.
+
+`FakeCrew` has the interface `AnalysisPipeline` uses (`copy()` and `kickoff(inputs=...)`):
+it reads the file names and added lines from the rendered prompt and reports one issue on
+the first added line of every file, after sleeping for a configurable latency.
+"""
+import json
+import re
+import time
+
+_FILE_LINE = re.compile(r"^File: (?P<name>.+) \([^)]*\)$", re.MULTILINE)
+_ADDED_LINE = re.compile(r"^\+\s*(?P<line>\d+) \|", re.MULTILINE)
+
+
+class FakeOutput:
+    """Mimics the `raw` attribute of a crew's output."""
+
+    def __init__(self, raw: str):
+        self.raw = raw
+
+
+class FakeCrew:
+    """
+    Args:
+        latency: Seconds every call takes regardless of its size.
+        seconds_per_1k_tokens: Extra seconds per 1,000 estimated prompt tokens (4 characters each).
+    """
+    def __init__(self, latency: float = 0.0, seconds_per_1k_tokens: float = 0.0):
+        self.latency = latency
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+        self.calls = 0
+        self.prompt_chars = 0
+
+    def copy(self) -> "FakeCrew":
+        # Calls are counted on the shared instance, so copies are the instance itself.
+        return self
+
+    def kickoff(self, inputs: dict) -> FakeOutput:
+        prompt = inputs["code"]
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        time.sleep(self.latency + self.seconds_per_1k_tokens * len(prompt) / 4000)
+
+        files = []
+        matches = list(_FILE_LINE.finditer(prompt))
+        for index, match in enumerate(matches):
+            end = matches[index + 1].start() if index + 1 < len(matches) else len(prompt)
+            added = _ADDED_LINE.search(prompt, match.end(), end)
+            issues = [] if added is None else [{
+                "type": "style",
+                "line": int(added.group("line")),
+                "description": "Synthetic issue reported by the fake crew.",
+                "suggestion": "Synthetic suggestion.",
+            }]
+            files.append({"name": match.group("name"), "issues": issues})
+
+        total_issues = sum(len(file["issues"]) for file in files)
+        return FakeOutput(json.dumps({
+            "files": files,
+            "summary": {"total_files": len(files), "total_issues": total_issues, "critical_issues": 0},
+        }))
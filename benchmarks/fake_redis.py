@@ -0,0 +1,156 @@
+"""
+A minimal in-memory Redis stand-in speaking RESP2, for benchmarks without a Redis server.
+
+Supports the commands used on the API's request path: HELLO, PING, SELECT, CLIENT, GET,
+SET (EX/PX/NX), MGET, DEL, EXISTS and EXPIRE, plus SUBSCRIBE, UNSUBSCRIBE and PUBLISH for cache
+invalidations. Anything else is answered with an error.
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class FakeRedis:
+    """Runs the stand-in on a background thread with its own event loop."""
+
+    def __init__(self, port: int = 0):
+        self._port = port
+        self._dbs: Dict[int, Dict[bytes, tuple[bytes, Optional[float]]]] = {}
+        # Channel -> writers of the connections subscribed to it, with the push prefix they expect.
+        self._subscribers: Dict[bytes, Dict[asyncio.StreamWriter, bytes]] = {}
+        self._loop = asyncio.new_event_loop()
+        self._server = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    def start(self) -> "FakeRedis":
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(asyncio.start_server(self._serve, "127.0.0.1", self._port))
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        db = 0
+        # RESP3 clients (negotiated with HELLO 3) expect "_" instead of "$-1" for nulls.
+        null = b"$-1\r\n"
+        # Pub/sub messages are arrays in RESP2 and push types in RESP3.
+        push = b"*"
+        channels = set()
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if command is None:
+                    break
+                name = command[0].upper()
+                if name == b"SELECT":
+                    db = int(command[1])
+                    writer.write(b"+OK\r\n")
+                elif name in (b"SUBSCRIBE", b"UNSUBSCRIBE"):
+                    for channel in command[1:] or list(channels):
+                        if name == b"SUBSCRIBE":
+                            channels.add(channel)
+                            self._subscribers.setdefault(channel, {})[writer] = push
+                        else:
+                            channels.discard(channel)
+                            self._subscribers.get(channel, {}).pop(writer, None)
+                        writer.write(push + b"3\r\n" + _bulk(name.lower(), null) + _bulk(channel, null)
+                                     + b":%d\r\n" % len(channels))
+                elif name == b"PUBLISH":
+                    receivers = self._subscribers.get(command[1], {})
+                    for receiver, receiver_push in list(receivers.items()):
+                        receiver.write(receiver_push + b"3\r\n" + _bulk(b"message", null)
+                                       + _bulk(command[1], null) + _bulk(command[2], null))
+                    writer.write(b":%d\r\n" % len(receivers))
+                else:
+                    if name == b"HELLO" and command[1:2] == [b"3"]:
+                        null = b"_\r\n"
+                        push = b">"
+                    writer.write(self._execute(self._dbs.setdefault(db, {}), name, command[1:], null))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in channels:
+                self._subscribers.get(channel, {}).pop(writer, None)
+            writer.close()
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        header = await reader.readline()
+        if not header:
+            return None
+        if not header.startswith(b"*"):
+            return header.split()
+        args = []
+        for _ in range(int(header[1:])):
+            length = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    def _execute(self, store: Dict[bytes, tuple[bytes, Optional[float]]], name: bytes, args: List[bytes],
+                 null: bytes) -> bytes:
+        now = time.monotonic()
+
+        def lookup(key: bytes) -> Optional[bytes]:
+            entry = store.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= now:
+                del store[key]
+                return None
+            return entry[0]
+
+        if name == b"HELLO":
+            protocol = int(args[0]) if args else 2
+            if protocol == 3:
+                return b"%3\r\n$6\r\nserver\r\n$5\r\nredis\r\n$7\r\nversion\r\n$5\r\n7.0.0\r\n$5\r\nproto\r\n:3\r\n"
+            return b"*6\r\n$6\r\nserver\r\n$5\r\nredis\r\n$7\r\nversion\r\n$5\r\n7.0.0\r\n$5\r\nproto\r\n:2\r\n"
+        if name == b"PING":
+            return b"+PONG\r\n"
+        if name == b"CLIENT":
+            return b"+OK\r\n"
+        if name == b"GET":
+            return _bulk(lookup(args[0]), null)
+        if name == b"MGET":
+            return b"*%d\r\n" % len(args) + b"".join(_bulk(lookup(key), null) for key in args)
+        if name == b"EXISTS":
+            return b":%d\r\n" % sum(lookup(key) is not None for key in args)
+        if name == b"DEL":
+            return b":%d\r\n" % sum(store.pop(key, None) is not None for key in args)
+        if name == b"EXPIRE":
+            value = lookup(args[0])
+            if value is None:
+                return b":0\r\n"
+            store[args[0]] = (value, now + int(args[1]))
+            return b":1\r\n"
+        if name == b"SET":
+            key, value, options = args[0], args[1], [option.upper() for option in args[2:]]
+            expires_at = None
+            if b"EX" in options:
+                expires_at = now + int(args[2 + options.index(b"EX") + 1])
+            if b"PX" in options:
+                expires_at = now + int(args[2 + options.index(b"PX") + 1]) / 1000
+            if b"NX" in options and lookup(key) is not None:
+                return null
+            store[key] = (value, expires_at)
+            return b"+OK\r\n"
+        return b"-ERR unknown command '%s'\r\n" % name
+
+
+def _bulk(value: Optional[bytes], null: bytes) -> bytes:
+    if value is None:
+        return null
+    return b"$%d\r\n%s\r\n" % (len(value), value)
@@ -0,0 +1,127 @@
+"""
+Runs the benchmark suite and writes the results as one JSON document.
+
+Every benchmark runs in its own subprocess so that environment variables, imported modules
+and peak RSS do not leak between them. With `--baseline`, numeric results are compared to a
+previous run (e.g. of the parent commit) and relative changes are printed.
+
+Usage:
+    python -m benchmarks.run_all --output bench-results.json
+    python -m benchmarks.run_all --quick --output new.json --baseline old.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+# (name, module, arguments) of every benchmark, in full and quick variants.
+SUITE = {
+    "full": [
+        ("api_startup", "benchmarks.bench_api_startup", ["--report-only"]),
+        ("parse_dict", "benchmarks.bench_diff_parser", ["--parser", "dict", "--files", "200", "--hunks", "20", "--lines", "50"]),
+        ("parse_streaming", "benchmarks.bench_diff_parser", ["--parser", "streaming", "--files", "200", "--hunks", "20", "--lines", "50"]),
+        ("patch_fetch", "benchmarks.bench_patch_fetch", ["--files", "1000", "--hunks", "20", "--lines", "50"]),
+        ("cache", "benchmarks.bench_cache", ["--iterations", "2000"]),
+        ("result_hit", "benchmarks.bench_result_hit", ["--sizes", "20x5", "100x10", "300x20", "--iterations", "500"]),
+        ("worker", "benchmarks.bench_worker", ["--tasks", "1000", "--concurrency", "8"]),
+        ("api_throughput", "benchmarks.bench_api_throughput", ["--clients", "300", "--requests", "6000"]),
+        ("api_throughput_no_local_cache", "benchmarks.bench_api_throughput", ["--clients", "300", "--requests", "6000", "--no-local-cache"]),
+        ("pipeline", "benchmarks.bench_pipeline", ["--sizes", "10x5x20", "50x10x40", "200x10x40", "--llm-latency", "0.5"]),
+    ],
+    "quick": [
+        ("api_startup", "benchmarks.bench_api_startup", ["--report-only"]),
+        ("parse_dict", "benchmarks.bench_diff_parser", ["--parser", "dict", "--files", "50", "--hunks", "10", "--lines", "40"]),
+        ("parse_streaming", "benchmarks.bench_diff_parser", ["--parser", "streaming", "--files", "50", "--hunks", "10", "--lines", "40"]),
+        ("patch_fetch", "benchmarks.bench_patch_fetch", ["--files", "200", "--hunks", "10", "--lines", "40",
+                                                         "--spool-threshold", "1048576"]),
+        ("cache", "benchmarks.bench_cache", ["--iterations", "500"]),
+        ("result_hit", "benchmarks.bench_result_hit", ["--sizes", "20x5", "100x10", "--iterations", "200"]),
+        ("worker", "benchmarks.bench_worker", ["--tasks", "200", "--concurrency", "4"]),
+        ("api_throughput", "benchmarks.bench_api_throughput", ["--clients", "50", "--requests", "1000"]),
+        ("api_throughput_no_local_cache", "benchmarks.bench_api_throughput", ["--clients", "50", "--requests", "1000", "--no-local-cache"]),
+        ("pipeline", "benchmarks.bench_pipeline", ["--sizes", "10x5x20", "50x10x40", "--llm-latency", "0.05"]),
+    ],
+}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _run(module: str, arguments: List[str]) -> Any:
+    """Runs a benchmark module and parses the JSON document it prints last."""
+    output = subprocess.run(
+        [sys.executable, "-m", module, *arguments], check=True, capture_output=True, text=True,
+    ).stdout
+    # Benchmarks print a single JSON document, possibly after log lines of the code under test.
+    start = max(output.rfind("\n{"), output.rfind("\n["))
+    return json.loads(output[start + 1:] if start >= 0 else output)
+
+
+def _flatten(value: Any, prefix: str = "") -> Dict[str, float]:
+    """Flattens nested results into `a.b.c` paths of their numeric leaves."""
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = ((str(item.get("size") or item.get("parser") or item.get("mode") or index) if isinstance(item, dict) else str(index), item)
+                 for index, item in enumerate(value))
+    else:
+        return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+    flat: Dict[str, float] = {}
+    for key, item in items:
+        flat.update(_flatten(item, f"{prefix}.{key}" if prefix else key))
+    return flat
+
+
+def compare(current: dict, baseline: dict) -> List[str]:
+    """Lists the relative change of every numeric result present in both runs."""
+    new, old = _flatten(current["results"]), _flatten(baseline["results"])
+    lines = []
+    for path in sorted(new.keys() & old.keys()):
+        if old[path]:
+            lines.append(f"{path}: {old[path]} -> {new[path]} ({(new[path] - old[path]) / old[path]:+.1%})")
+    return lines
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--output", default="bench-results.json")
+    arg_parser.add_argument("--quick", action="store_true", help="Smaller corpora and fewer requests.")
+    arg_parser.add_argument("--only", nargs="+", help="Names of the benchmarks to run.")
+    arg_parser.add_argument("--baseline", help="A previous output file to compare against.")
+    args = arg_parser.parse_args()
+
+    document = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "suite": "quick" if args.quick else "full",
+        "results": {},
+    }
+    for name, module, arguments in SUITE[document["suite"]]:
+        if args.only and name not in args.only:
+            continue
+        print(f"Running {name}...", file=sys.stderr)
+        start = time.perf_counter()
+        document["results"][name] = _run(module, arguments)
+        print(f"  done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    with open(args.output, "w") as output:
+        json.dump(document, output, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            for line in compare(document, json.load(baseline)):
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Generates synthetic PR patches of controlled size for the benchmarks.
+"""
+import hashlib
+import random
+
+
+def make_patch(files: int = 10, hunks: int = 5, lines: int = 20, seed: int = 0) -> str:
+    """
+    Builds a `git format-patch` style patch with `files` changed files, each holding `hunks`
+    hunks of `lines` diff lines (a mix of context, added and removed lines). The commit SHA
+    is derived from the arguments, so the same arguments always describe the same PR head.
+    """
+    rng = random.Random(seed)
+    head_sha = hashlib.sha1(f"{files}:{hunks}:{lines}:{seed}".encode()).hexdigest()
+    parts = [
+        f"From {head_sha} Mon Sep 17 00:00:00 2001\n",
+        "From: Bench <bench@example.com>\n",
+        "Subject: [PATCH] Synthetic change\n",
+        "\n",
+        "---\n",
+    ]
+    for file_index in range(files):
+        path = f"src/module_{file_index}/file_{file_index}.py"
+        parts.append(f"diff --git a/{path} b/{path}\n")
+        parts.append(f"index 1111111..2222222 100644\n--- a/{path}\n+++ b/{path}\n")
+        source_no = target_no = 1
+        for _ in range(hunks):
+            source_no += 10
+            target_no += 10
+            body = []
+            source_count = target_count = 0
+            for line_index in range(lines):
+                kind = rng.choice(" +-")
+                text = f"value_{line_index} = compute({rng.randint(0, 10_000)})  # synthetic line\n"
+                body.append(kind + text)
+                if kind != "+":
+                    source_count += 1
+                if kind != "-":
+                    target_count += 1
+            parts.append(f"@@ -{source_no},{source_count} +{target_no},{target_count} @@ def function_{source_no}():\n")
+            parts.extend(body)
+            source_no += source_count
+            target_no += target_count
+    parts.append("-- \n2.43.0\n\n")
+    return "".join(parts)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from models.output_model import Result
-from typing import Any,Dict,Optional
+from typing import Any,Dict,List,Optional
 
 
 class AnalyzePrRequest(BaseModel):
@@ -15,8 +15,8 @@ class TaskCreationResponse(BaseModel):
 class TaskStatusResponse(BaseModel):
     task_id: str
     status: str
-    # The 'info' field contains our custom state metadata
-    # meta: Optional[Dict[str, Any]] = None
+    # Progress and run statistics reported by the pipeline (stage, timings, cache and token counts)
+    meta: Optional[Dict[str, Any]] = None
 
 class TaskResultModel(BaseModel):
     task_id: str
@@ -26,4 +26,74 @@ class TaskResultModel(BaseModel):
 class CachedResultResponse(BaseModel):
     cached: bool
     message: str
-    result: Result
\ No newline at end of file
+    result: Result
+
+class WebhookResponse(BaseModel):
+    status: str
+    message: str
+    task_id: Optional[str] = None
+
+class BatchItemResponse(BaseModel):
+    repo_url: str
+    pr_number: int
+    head_sha: Optional[str] = None
+    # CACHED, TASK_STARTED, IN_PROGRESS or FAILED (the head SHA could not be resolved)
+    status: str
+    task_id: Optional[str] = None
+    result: Optional[Result] = None
+    error: Optional[str] = None
+
+class BatchAnalysisResponse(BaseModel):
+    group_id: Optional[str] = None
+    message: str
+    items: List[BatchItemResponse]
+
+class BatchStatusResponse(BaseModel):
+    group_id: str
+    total: int
+    completed: int
+    succeeded: int
+    failed: int
+    tasks: List[TaskStatusResponse]
+
+class IndexedAnalysis(BaseModel):
+    pr_number: int
+    head_sha: str
+    # Unix time at which the analysis finished
+    analyzed_at: float
+    total_files: int
+    total_issues: int
+    critical_issues: int
+    truncated: bool = False
+    issue_types: Dict[str, int] = {}
+
+class RepoAnalysesResponse(BaseModel):
+    repo: str
+    items: List[IndexedAnalysis]
+    # Pass both back to fetch the next page; next_offset is None on the last page
+    until: float
+    next_offset: Optional[int] = None
+
+class IndexedIssue(BaseModel):
+    pr_number: int
+    head_sha: str
+    file: str
+    line: int
+    type: str
+    description: str
+    suggestion: str
+    analyzed_at: float
+
+class FileIssueCount(BaseModel):
+    file: str
+    issues: int
+
+class RepoIssuesResponse(BaseModel):
+    repo: str
+    type: Optional[str] = None
+    items: List[IndexedIssue]
+    until: float
+    next_offset: Optional[int] = None
+    # Counts over the latest analysis of each PR, independent of the page and filters
+    issue_types: Dict[str, int] = {}
+    top_files: List[FileIssueCount] = []
@@ -1,5 +1,11 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Iterable, List, Optional
+
+
+# Issue types the crew is asked to choose from (see `build_code_analysis_task`).
+ISSUE_TYPES = ("critical", "security", "bug", "performance", "style", "best-practice")
+# Issue types counted towards Summary.critical_issues when a summary is rebuilt locally.
+CRITICAL_ISSUE_TYPES = frozenset({"critical", "security"})
 
 
 class Issue(BaseModel):
@@ -7,7 +13,7 @@ class Issue(BaseModel):
     A class to represent an issue found in a file.
 
     Attributes:
-        type (str): The type of issue (e.g., 'bug', 'style').
+        type (str): The type of issue, one of ISSUE_TYPES (e.g., 'bug', 'style').
         line (int): The line number where the issue is located.
         description (str): A brief description of the issue.
         suggestion (str): A suggested fix for the issue.
@@ -37,11 +43,27 @@ class Summary(BaseModel):
     Attributes:
         total_files (int): The total number of files analyzed.
         total_issues (int): The total number of issues found across all files.
-        critical_issues (int): The number of critical issues found.
+        critical_issues (int): The number of issues of a type in CRITICAL_ISSUE_TYPES.
+        truncated (bool): Whether only the leading files of an oversized patch were reviewed.
+        truncation_reason (Optional[str]): Which limit the patch exceeded, if truncated.
     """
     total_files: int
     total_issues: int
     critical_issues: int
+    truncated: bool = False
+    truncation_reason: Optional[str] = None
+
+    @classmethod
+    def from_files(cls, files: List["FileAnalysis"]) -> "Summary":
+        """
+        Recomputes the summary totals from a list of file analyses.
+        """
+        issues = [issue for file in files for issue in file.issues]
+        return cls(
+            total_files=len(files),
+            total_issues=len(issues),
+            critical_issues=sum(1 for issue in issues if issue.type.lower() in CRITICAL_ISSUE_TYPES),
+        )
 
 
 class Result(BaseModel):
@@ -54,3 +76,23 @@ class Result(BaseModel):
     """
     files: List[FileAnalysis]
     summary: Summary
+
+    @classmethod
+    def from_files(cls, files: Iterable[FileAnalysis]) -> "Result":
+        """
+        Builds a result from file analyses, recomputing the summary.
+
+        Files keep the order in which they first appear, issues for a file that is
+        listed several times are concatenated and sorted by line.
+        """
+        merged: dict[str, FileAnalysis] = {}
+        for file in files:
+            if file.name in merged:
+                merged[file.name].issues.extend(file.issues)
+            else:
+                merged[file.name] = FileAnalysis(name=file.name, issues=list(file.issues))
+
+        merged_files = list(merged.values())
+        for file in merged_files:
+            file.issues.sort(key=lambda issue: issue.line)
+        return cls(files=merged_files, summary=Summary.from_files(merged_files))
@@ -1,22 +1,26 @@
 from crewai import Agent, LLM
 from models.output_model import Result
+from services.ai_services.model_router import PRO, TIER_MODELS
 
-code_review_agent = Agent(
-    role="Senior Code Quality Analyst",
-    goal=(
-        "Ensure all submitted code adheres to the highest standards by identifying style inconsistencies, "
-        "detecting bugs, recommending performance optimizations, and promoting best practices throughout the "
-        "development process."
-    ),
-    backstory=(
-        "Once a celebrated senior code quality analyst, you became known for relentless attention to detail and a passion "
-        "for elevating software standards. Throughout your career, you witnessed firsthand how overlooked bugs, "
-        "inconsistent styles, and neglected best practices could jeopardize entire projects. Driven by a desire to prevent "
-        "such setbacks, you made it your mission to scrutinize every codebase, hunting for issues before they escalate."
-    ),
-    # Use Pydantic custom object to format the result in required manner
-    llm=LLM(
-        model="gemini/gemini-2.5-pro",
-        response_format=Result,
+
+def build_code_review_agent(model: str = TIER_MODELS[PRO]) -> Agent:
+    """Creates the code review agent together with the LLM client of `model`."""
+    return Agent(
+        role="Senior Code Quality Analyst",
+        goal=(
+            "Ensure all submitted code adheres to the highest standards by identifying style inconsistencies, "
+            "detecting bugs, recommending performance optimizations, and promoting best practices throughout the "
+            "development process."
+        ),
+        backstory=(
+            "Once a celebrated senior code quality analyst, you became known for relentless attention to detail and a passion "
+            "for elevating software standards. Throughout your career, you witnessed firsthand how overlooked bugs, "
+            "inconsistent styles, and neglected best practices could jeopardize entire projects. Driven by a desire to prevent "
+            "such setbacks, you made it your mission to scrutinize every codebase, hunting for issues before they escalate."
+        ),
+        # Use Pydantic custom object to format the result in required manner
+        llm=LLM(
+            model=model,
+            response_format=Result,
+        )
     )
-)
@@ -1,11 +1,22 @@
+from functools import lru_cache
+
 from crewai import  Crew
-from services.ai_services.agent import code_review_agent
-from services.ai_services.task import code_analysis_task
+from services.ai_services.agent import build_code_review_agent
+from services.ai_services.model_router import PRO, TIER_MODELS
+from services.ai_services.task import build_code_analysis_task
+
 
-crew = Crew(
-    #Specify the agents available in the crew
-    agents=[code_review_agent],
+@lru_cache(maxsize=None)
+def get_crew(tier: str = PRO) -> Crew:
+    """
+    Builds the code review crew of a model tier on first use and returns the same instance
+    afterwards, so the agent, LLM client and task are created once per worker process.
+    """
+    code_review_agent = build_code_review_agent(TIER_MODELS[tier])
+    return Crew(
+        #Specify the agents available in the crew
+        agents=[code_review_agent],
 
-    #Specify the tasks the crew completes
-    tasks=[code_analysis_task],
-)
\ No newline at end of file
+        #Specify the tasks the crew completes
+        tasks=[build_code_analysis_task(code_review_agent)],
+    )
@@ -0,0 +1,85 @@
+import os
+import re
+from fnmatch import fnmatch
+from typing import List, Sequence, Tuple
+
+from services.github_services.streaming_diff_parser import ADDED, CompactFile
+
+# Model tiers: a fast, cheap model for small and simple shards, the pro model for the rest and
+# as the fallback when the fast model's output does not validate. Without a pro model the pro
+# tier runs the fast model, which then reviews every shard.
+FAST, PRO = "fast", "pro"
+TIER_MODELS = {FAST: os.environ.get("LLM_MODEL_FAST", "gemini/gemini-2.5-flash")}
+TIER_MODELS[PRO] = os.environ.get("LLM_MODEL_PRO", "gemini/gemini-2.5-pro") or TIER_MODELS[FAST]
+
+# Paths where a missed issue is expensive: authentication, secrets, payments, schema changes and CI.
+DEFAULT_PRO_PATH_GLOBS = (
+    "*auth*", "*security*", "*crypto*", "*password*", "*secret*", "*permission*", "*payment*", "*billing*",
+    "*migrations/*", "*.sql", "Dockerfile", "*/Dockerfile", ".github/workflows/*",
+)
+# Languages where subtle memory or quoting bugs are common.
+DEFAULT_PRO_EXTENSIONS = (".c", ".h", ".cc", ".cpp", ".hpp", ".rs", ".sh")
+
+# Added lines that branch, as a cheap measure of the control-flow complexity of a change.
+_BRANCH = re.compile(r"\b(?:if|elif|else|for|while|switch|case|catch|except|try|match)\b|&&|\|\|")
+
+
+def _configured(name: str, default: Sequence[str]) -> Tuple[str, ...]:
+    configured = os.environ.get(name)
+    if configured is None:
+        return tuple(default)
+    return tuple(item.strip() for item in configured.split(",") if item.strip())
+
+
+class ModelRouter:
+    """
+    Chooses the model tier for a shard of files. A shard goes to the fast model only if it is
+    small and simple on every signal: changed lines, files, branching added lines, touched paths
+    and languages. Path globs and extensions are matched case-insensitively. With a single model
+    (LLM_MODEL_FAST or LLM_MODEL_PRO empty) everything goes to the pro tier.
+
+    Args:
+        max_changed_lines: Added plus removed lines of a fast shard (ROUTING_FAST_MAX_CHANGED_LINES).
+        max_files: Files of a fast shard (ROUTING_FAST_MAX_FILES).
+        max_branches: Added lines with branching keywords or operators (ROUTING_FAST_MAX_BRANCHES).
+        pro_path_globs: Paths always reviewed by the pro model (ROUTING_PRO_PATH_GLOBS, comma-separated).
+        pro_extensions: File extensions always reviewed by the pro model (ROUTING_PRO_EXTENSIONS).
+    """
+    def __init__(self, max_changed_lines: int = None, max_files: int = None, max_branches: int = None,
+                 pro_path_globs: Sequence[str] = None, pro_extensions: Sequence[str] = None):
+        self.max_changed_lines = max_changed_lines or int(os.environ.get("ROUTING_FAST_MAX_CHANGED_LINES", 200))
+        self.max_files = max_files or int(os.environ.get("ROUTING_FAST_MAX_FILES", 5))
+        self.max_branches = max_branches or int(os.environ.get("ROUTING_FAST_MAX_BRANCHES", 15))
+        if pro_path_globs is None:
+            pro_path_globs = _configured("ROUTING_PRO_PATH_GLOBS", DEFAULT_PRO_PATH_GLOBS)
+        if pro_extensions is None:
+            pro_extensions = _configured("ROUTING_PRO_EXTENSIONS", DEFAULT_PRO_EXTENSIONS)
+        # File names are lowercased before matching, so are the patterns.
+        self.pro_path_globs = tuple(pattern.lower() for pattern in pro_path_globs)
+        self.pro_extensions = tuple(extension.lower() for extension in pro_extensions)
+        self.enabled = bool(TIER_MODELS[FAST]) and TIER_MODELS[FAST] != TIER_MODELS[PRO]
+
+    def route(self, files: List[CompactFile]) -> Tuple[str, str]:
+        """
+        Chooses the tier for the files of one crew call.
+
+        Returns:
+            The tier and the signal that decided it (e.g. `changed_lines`, or `small` for the fast tier).
+        """
+        if not self.enabled:
+            return PRO, "no_fast_model"
+        if len(files) > self.max_files:
+            return PRO, "files"
+        if any(file.name.lower().endswith(self.pro_extensions) for file in files):
+            return PRO, "language"
+        if any(fnmatch(file.name.lower(), pattern) for file in files for pattern in self.pro_path_globs):
+            return PRO, "path"
+        if sum(file.added + file.removed for file in files) > self.max_changed_lines:
+            return PRO, "changed_lines"
+        branches = sum(
+            1 for file in files for _, kind, _, _, _, content in file.iter_lines()
+            if kind == ADDED and _BRANCH.search(content)
+        )
+        if branches > self.max_branches:
+            return PRO, "branches"
+        return FAST, "small"
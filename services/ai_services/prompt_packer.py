@@ -0,0 +1,172 @@
+import os
+from fnmatch import fnmatch
+from typing import List, Sequence
+
+from services.github_services.streaming_diff_parser import CompactFile, CompactHunk, render_prompt
+
+# Paths whose diffs are noise for a code review: lockfiles, minified or generated
+# artifacts, vendored dependencies and test snapshots. Patterns without a slash match the file
+# name in any directory; patterns with one match the path from the repository root, segment by
+# segment, where `**` stands for any number of directories. Build output (`dist/`) and vendored
+# packages (`vendor/`, `third_party/`) are only recognized at the root, since directories of
+# these names deeper in a tree often hold source; `node_modules` is vendored wherever it is.
+DEFAULT_EXCLUDE_GLOBS = (
+    "*.lock", "package-lock.json", "pnpm-lock.yaml", "go.sum",
+    "*.min.js", "*.min.css", "*.map", "*.bundle.js",
+    "*_pb2.py", "*_pb2_grpc.py", "*.pb.go", "*.generated.*",
+    "vendor/**", "third_party/**", "**/node_modules/**",
+    "dist/**",
+    "*.snap", "**/__snapshots__/**",
+)
+
+# Rough size of a token for code and English text, used to estimate prompt sizes
+# without calling the model's tokenizer.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of tokens of a prompt text."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class PromptBatch:
+    """
+    The files sent to the crew in one call, together with their rendered prompt.
+    A file that does not fit into one call is split into several parts with the same name.
+    """
+    __slots__ = ("files", "prompt", "tokens")
+
+    def __init__(self, files: List[CompactFile], prompt: str, tokens: int):
+        self.files = files
+        self.prompt = prompt
+        self.tokens = tokens
+
+
+class PromptPacker:
+    """
+    Prepares changed files for the AI crew: drops noise paths, trims context lines and
+    packs the files into batches that stay under a per-call token budget.
+
+    Args:
+        token_budget: Estimated prompt tokens per crew call (PROMPT_TOKEN_BUDGET).
+        context_radius: Unchanged lines kept around each change (PROMPT_CONTEXT_RADIUS).
+        exclude_globs: Path patterns that are not sent to the crew (PROMPT_EXCLUDE_GLOBS,
+            comma-separated; an empty value disables exclusion).
+        max_files: The maximum number of files per call (ANALYSIS_SHARD_SIZE).
+    """
+    def __init__(self, token_budget: int = None, context_radius: int = None,
+                 exclude_globs: Sequence[str] = None, max_files: int = None):
+        self.token_budget = token_budget or int(os.environ.get("PROMPT_TOKEN_BUDGET", 16000))
+        if context_radius is None:
+            context_radius = int(os.environ.get("PROMPT_CONTEXT_RADIUS", 3))
+        self.context_radius = context_radius
+        if exclude_globs is None:
+            configured = os.environ.get("PROMPT_EXCLUDE_GLOBS")
+            exclude_globs = DEFAULT_EXCLUDE_GLOBS if configured is None else [
+                pattern.strip() for pattern in configured.split(",") if pattern.strip()
+            ]
+        self.exclude_globs = tuple(exclude_globs)
+        self.max_files = max_files or int(os.environ.get("ANALYSIS_SHARD_SIZE", 10))
+
+    def is_excluded(self, file: CompactFile) -> bool:
+        """Whether the file matches one of the exclude globs."""
+        return any(_matches_glob(file.name, pattern) for pattern in self.exclude_globs)
+
+    def pack(self, files: List[CompactFile]) -> List[PromptBatch]:
+        """
+        Packs files, in diff order, into batches of at most `max_files` files whose estimated
+        prompt size stays under `token_budget`. Files larger than the budget are split at hunk
+        boundaries (or, for single huge hunks, into line windows) and sent in batches of their own.
+        """
+        batches: List[PromptBatch] = []
+        current: List[CompactFile] = []
+        current_prompts: List[str] = []
+        current_tokens = 0
+
+        def flush():
+            nonlocal current, current_prompts, current_tokens
+            if current:
+                batches.append(PromptBatch(current, "".join(current_prompts), current_tokens))
+            current, current_prompts, current_tokens = [], [], 0
+
+        for file in files:
+            prompt = render_prompt([file], self.context_radius)
+            tokens = estimate_tokens(prompt)
+            if tokens > self.token_budget:
+                flush()
+                for part in self._split(file):
+                    part_prompt = render_prompt([part], self.context_radius)
+                    batches.append(PromptBatch([part], part_prompt, estimate_tokens(part_prompt)))
+                continue
+            if current and (current_tokens + tokens > self.token_budget or len(current) >= self.max_files):
+                flush()
+            current.append(file)
+            current_prompts.append(prompt)
+            current_tokens += tokens
+        flush()
+        return batches
+
+    def _split(self, file: CompactFile) -> List[CompactFile]:
+        """Splits an oversized file into parts that each fit into the token budget."""
+        parts: List[CompactFile] = []
+        hunks: List[CompactHunk] = []
+        tokens = 0
+        for hunk in file.hunks:
+            for piece in self._split_hunk(file, hunk):
+                piece_tokens = estimate_tokens(render_prompt([_with_hunks(file, [piece])], self.context_radius))
+                if hunks and tokens + piece_tokens > self.token_budget:
+                    parts.append(_with_hunks(file, hunks))
+                    hunks, tokens = [], 0
+                hunks.append(piece)
+                tokens += piece_tokens
+        if hunks:
+            parts.append(_with_hunks(file, hunks))
+        return parts
+
+    def _split_hunk(self, file: CompactFile, hunk: CompactHunk) -> List[CompactHunk]:
+        """Cuts a hunk that alone exceeds the budget into consecutive windows of lines."""
+        tokens = estimate_tokens(render_prompt([_with_hunks(file, [hunk])], self.context_radius))
+        if tokens <= self.token_budget or len(hunk) < 2:
+            return [hunk]
+        window = max(1, len(hunk) * self.token_budget // tokens)
+        return [_slice_hunk(hunk, start, min(start + window, len(hunk))) for start in range(0, len(hunk), window)]
+
+
+def _with_hunks(file: CompactFile, hunks: List[CompactHunk]) -> CompactFile:
+    """Returns a view of `file` holding only the given hunks."""
+    part = CompactFile(file._buffer, file.source_file, file.target_file)
+    part.is_binary_file = file.is_binary_file
+    part.hunks = hunks
+    return part
+
+
+def _slice_hunk(hunk: CompactHunk, start: int, end: int) -> CompactHunk:
+    """Returns the lines [start, end) of a hunk as a hunk of its own, with a matching header."""
+    source_nos = [number for number in hunk.source_nos[start:end] if number]
+    target_nos = [number for number in hunk.target_nos[start:end] if number]
+    piece = CompactHunk(
+        hunk.header,
+        source_nos[0] if source_nos else hunk.source_start, len(source_nos),
+        target_nos[0] if target_nos else hunk.target_start, len(target_nos),
+    )
+    piece.kinds = hunk.kinds[start:end]
+    piece.source_nos = hunk.source_nos[start:end]
+    piece.target_nos = hunk.target_nos[start:end]
+    piece.starts = hunk.starts[start:end]
+    piece.ends = hunk.ends[start:end]
+    return piece
+
+
+def _matches_glob(path: str, pattern: str) -> bool:
+    """Matches a path against an exclude glob (see DEFAULT_EXCLUDE_GLOBS); `*` never crosses a slash."""
+    if "/" not in pattern:
+        return fnmatch(path.rsplit("/", 1)[-1], pattern)
+    return _matches_segments(path.split("/"), pattern.split("/"))
+
+
+def _matches_segments(parts: List[str], patterns: List[str]) -> bool:
+    if not patterns:
+        return not parts
+    if patterns[0] == "**":
+        return any(_matches_segments(parts[start:], patterns[1:]) for start in range(len(parts) + 1))
+    return bool(parts) and fnmatch(parts[0], patterns[0]) and _matches_segments(parts[1:], patterns[1:])
@@ -1,13 +1,21 @@
-from crewai import Task
-from services.ai_services.agent import code_review_agent
+from crewai import Agent, Task
 
+from models.output_model import ISSUE_TYPES
 
-# Define a task to analyze submitted code
-code_analysis_task = Task(
-    description="Analyse submitted Github Pull Request diffs converted to JSON for all possible issues.",
-    expected_output=(
-        "Analyse diffs for code style and formatting issues, potential bugs or errors, "
-        "performance improvements and best practices. Here are the json converted diffs: {code}"
-    ),
-    agent=code_review_agent,
-)
\ No newline at end of file
+
+def build_code_analysis_task(agent: Agent) -> Task:
+    """Creates the task that analyses the submitted code with the given agent."""
+    return Task(
+        description="Analyse submitted Github Pull Request diffs for all possible issues.",
+        expected_output=(
+            "Analyse diffs for code style and formatting issues, potential bugs or errors, "
+            "performance improvements and best practices. Each file starts with a 'File:' line and each hunk "
+            "with its '@@' header. Every diff line shows its sign ('+' added, '-' removed, ' ' context), its line "
+            "number (in the new file for added and context lines, in the old file for removed lines), '|' and "
+            "the code. A '...' line stands for unchanged lines left out of the diff. Report issues by file path "
+            "and line number. Set each issue's type to one of: " + ", ".join(ISSUE_TYPES) + ". Use 'critical' only "
+            "for issues that break the application or lose data, and 'security' for vulnerabilities; the summary's "
+            "critical_issues counts these two types. Here are the diffs: {code}"
+        ),
+        agent=agent,
+    )
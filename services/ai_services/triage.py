@@ -0,0 +1,138 @@
+import ast
+import os
+import re
+from fnmatch import fnmatch
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from models.output_model import Issue
+from services.github_services.streaming_diff_parser import ADDED, MARKER, REMOVED, CompactFile, CompactHunk
+
+# Triage categories. Only "code" files are sent to the crew.
+CODE, TRIVIAL, DOCS, RENAME, BINARY, GENERATED = "code", "trivial", "docs", "rename", "binary", "generated"
+
+# Documentation, reviewed by people rather than by the code review crew. Files are recognized by
+# their own name only, never by their directory, so that source files under docs/ are still reviewed.
+DOCS_EXTENSIONS = (".md", ".markdown", ".rst", ".adoc", ".asciidoc", ".txt")
+DOCS_NAMES = ("README", "LICENSE", "LICENCE", "COPYING", "NOTICE", "CHANGELOG", "AUTHORS", "CODEOWNERS")
+# Dependency manifests, in which changes that only move version numbers are trivial.
+MANIFEST_GLOBS = (
+    "requirements*.txt", "*/requirements*.txt", "constraints*.txt", "*/constraints*.txt",
+    "pyproject.toml", "*/pyproject.toml", "setup.cfg", "*/setup.cfg", "Pipfile", "*/Pipfile",
+    "package.json", "*/package.json", "Cargo.toml", "*/Cargo.toml", "go.mod", "*/go.mod",
+    "Gemfile", "*/Gemfile", "pom.xml", "*/pom.xml", "build.gradle", "*/build.gradle", "*.csproj",
+    ".github/workflows/*.yml", ".github/workflows/*.yaml", ".pre-commit-config.yaml", "Dockerfile", "*/Dockerfile",
+    "CMakeLists.txt", "*/CMakeLists.txt",
+)
+# Files where indentation is meaningful, so only trailing whitespace changes are trivial. Elsewhere
+# re-indenting is trivial too; whitespace within a line is always compared (strings, shell arguments).
+INDENTATION_SENSITIVE_GLOBS = ("*.py", "*.pyi", "*.yml", "*.yaml", "Makefile", "*/Makefile", "*.mk")
+
+_VERSION = re.compile(r"v?\d+(?:\.\d+)+(?:[-.+]?[0-9A-Za-z]+)*")
+
+
+class FileTriage:
+    """
+    Classifies changed files before the crew is called, so that it only reviews code:
+
+    - `binary` and `generated` files (the packer's exclude globs) have no reviewable diff;
+    - `rename`: renamed or mode-changed without content changes;
+    - `docs`: documentation and licence files;
+    - `trivial`: indentation or trailing whitespace changes, or manifests whose changes only move version numbers;
+    - `code`: everything else.
+
+    New Python files are also parsed with `ast`, which reports syntax errors without the crew.
+
+    Args:
+        is_generated: Whether a file is generated or vendored (`PromptPacker.is_excluded`).
+        docs_extensions: File extensions of documentation.
+        docs_names: Extension-less file names of documentation, such as README or LICENSE.
+        manifest_globs: Paths where version-only changes are trivial.
+    """
+    def __init__(self, is_generated: Callable[[CompactFile], bool] = None,
+                 docs_extensions: Sequence[str] = DOCS_EXTENSIONS, docs_names: Sequence[str] = DOCS_NAMES,
+                 manifest_globs: Sequence[str] = MANIFEST_GLOBS):
+        self.is_generated = is_generated or (lambda file: False)
+        self.docs_extensions = tuple(extension.lower() for extension in docs_extensions)
+        self.docs_names = frozenset(name.upper() for name in docs_names)
+        self.manifest_globs = tuple(manifest_globs)
+        self.enabled = os.environ.get("ANALYSIS_TRIAGE", "1") != "0"
+
+    def classify(self, file: CompactFile) -> str:
+        """Returns the triage category of a file."""
+        if file.is_binary_file:
+            return BINARY
+        if self.is_generated(file):
+            return GENERATED
+        if not self.enabled:
+            return CODE
+        if not any(kind in (ADDED, REMOVED) for hunk in file.hunks for kind in hunk.kinds):
+            return RENAME if file.is_renamed_file else TRIVIAL
+        normalize = str.rstrip if _matches(file.name, INDENTATION_SENSITIVE_GLOBS) else str.strip
+        if _matches(file.name, self.manifest_globs):
+            return TRIVIAL if self._only_changes(file, lambda line: _VERSION.sub("0", normalize(line))) else CODE
+        if self.is_docs(file.name):
+            return DOCS
+        return TRIVIAL if self._only_changes(file, normalize) else CODE
+
+    def is_docs(self, name: str) -> bool:
+        """Whether a path names a documentation file, judged by its file name alone."""
+        basename = name.rsplit("/", 1)[-1]
+        return basename.lower().endswith(self.docs_extensions) or basename.upper() in self.docs_names
+
+    def split(self, files: List[CompactFile]) -> Tuple[List[CompactFile], Dict[str, List[CompactFile]]]:
+        """Splits files into the code files to review and the others by category, preserving order."""
+        code: List[CompactFile] = []
+        skipped: Dict[str, List[CompactFile]] = {}
+        for file in files:
+            category = self.classify(file)
+            if category == CODE:
+                code.append(file)
+            else:
+                skipped.setdefault(category, []).append(file)
+        return code, skipped
+
+    def syntax_issues(self, file: CompactFile) -> List[Issue]:
+        """Parses a new Python file and reports its syntax error, if any. Other files are not checked."""
+        if not self.enabled or not file.is_new_file or not file.name.endswith(".py"):
+            return []
+        lines, target_nos = [], []
+        for _, kind, _, _, target_no, content in file.iter_lines():
+            if kind == ADDED:
+                lines.append(content)
+                target_nos.append(target_no)
+        try:
+            ast.parse("".join(lines), filename=file.name)
+        except SyntaxError as e:
+            index = min(max((e.lineno or 1) - 1, 0), len(target_nos) - 1)
+            return [Issue(
+                type="bug",
+                line=target_nos[index] if target_nos else 1,
+                description=f"Syntax error: {e.msg}.",
+                suggestion="Fix the syntax so that the module can be imported.",
+            )]
+        except ValueError:
+            # e.g. null bytes: not Python source the review could say more about.
+            return []
+        return []
+
+    @staticmethod
+    def _only_changes(file: CompactFile, normalize: Callable[[str], str]) -> bool:
+        """
+        Whether every hunk reads the same before and after once normalized (blank lines ignored).
+        Unchanged lines are compared as well, so moving a line is a change.
+        """
+        before: Dict[CompactHunk, List[str]] = {}
+        after: Dict[CompactHunk, List[str]] = {}
+        for hunk, kind, _, _, _, content in file.iter_lines():
+            line = normalize(content)
+            if kind == MARKER or not line.strip():
+                continue
+            if kind != ADDED:
+                before.setdefault(hunk, []).append(line)
+            if kind != REMOVED:
+                after.setdefault(hunk, []).append(line)
+        return all(before.get(hunk, []) == after.get(hunk, []) for hunk in file.hunks)
+
+
+def _matches(name: str, patterns: Sequence[str]) -> bool:
+    return any(fnmatch(name, pattern) for pattern in patterns)
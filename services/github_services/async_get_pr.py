@@ -0,0 +1,132 @@
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from services.github_services.get_pr import GitHubService, github_rate_limit_name
+from services.metrics_services.metrics import record_github_response
+from services.redis_services.cache_keys import github_etag_key
+from services.redis_services.rate_limiter import RateLimited
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide pooled HTTP client used for GitHub, creating it on first use.
+    The pool size is set by GITHUB_MAX_CONNECTIONS.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        max_connections = int(os.environ.get("GITHUB_MAX_CONNECTIONS", 50))
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(30.0),
+        )
+    return _client
+
+
+async def close_async_client():
+    """Closes the process-wide HTTP client, e.g. on application shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class AsyncGitHubService:
+    """
+    Asyncio counterpart of `GitHubService`, built on the shared pooled HTTP client.
+    """
+    def __init__(self, github_token: str = None, etag_store=None, client: httpx.AsyncClient = None,
+                 rate_limiter=None):
+        """
+        Initializes the service with an optional GitHub token.
+
+        Args:
+            github_token: A GitHub personal access token for authentication.
+            etag_store: An optional shared async store with `get`/`set` (e.g. AsyncRedisCacheService)
+                holding the ETag/Last-Modified validators of previous responses.
+            client: The HTTP client to use; defaults to the process-wide pooled client.
+            rate_limiter: An optional AsyncRateLimiter; requests share the token's limit with the
+                workers, and quota headers and rate limit responses pause it for all of them.
+        """
+        self._client = client or get_async_client()
+        self._headers = {
+            "Accept": "application/vnd.github.v3.patch",
+            "X-GitHub-Api-Version": "2022-11-28"
+        }
+        if github_token:
+            self._headers["Authorization"] = f"token {github_token}"
+        self._etag_store = etag_store
+        self._local_etags: Dict[str, Dict[str, Any]] = {}
+        self._rate_limiter = rate_limiter
+        self._rate_limit_name = github_rate_limit_name(github_token)
+
+    async def get_pr_head(self, repo_url: str, pr_number: int) -> Tuple[str, Optional[str]]:
+        """
+        Fetches only the metadata for a PR to get the head commit SHA and when the PR was last
+        updated, conditionally on the validators of the previous response (see `GitHubService.get_pr_head_sha`).
+
+        Returns:
+            The head SHA and the `updated_at` time of the PR; None if an unchanged PR was
+            resolved from a validator stored without it.
+        """
+        api_url = self._pr_api_url(repo_url, pr_number)
+        entry = await self._get_etag_entry(api_url)
+
+        headers = {**self._headers, "Accept": "application/vnd.github+json"}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = await self._get("metadata", api_url, headers=headers)
+        if response.status_code == 304 and entry:
+            return entry["sha"], entry.get("updated_at")
+        response.raise_for_status()
+
+        metadata = response.json()
+        sha, updated_at = metadata["head"]["sha"], metadata.get("updated_at")
+        await self._set_etag_entry(api_url, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "sha": sha,
+            "updated_at": updated_at,
+        })
+        return sha, updated_at
+
+    async def _get(self, endpoint: str, api_url: str, headers: Dict[str, str]) -> httpx.Response:
+        """Sends a GET request within the shared rate limit and records the response."""
+        if self._rate_limiter is not None:
+            await self._rate_limiter.acquire(
+                self._rate_limit_name, GitHubService.REQUESTS_PER_SECOND, GitHubService.REQUESTS_BURST
+            )
+        response = await self._client.get(api_url, headers=headers)
+        record_github_response(endpoint, response.status_code, response.headers)
+        delay, pause = GitHubService.rate_limit_delays(response.status_code, response.headers, lambda: response.text)
+        if self._rate_limiter is not None:
+            await self._rate_limiter.pause(self._rate_limit_name, pause)
+        if delay:
+            raise RateLimited(f"GitHub rate limit exceeded ({response.status_code}).", retry_after=delay)
+        return response
+
+    def _pr_api_url(self, repo_url: str, pr_number: int) -> str:
+        parts = repo_url.strip("/").split("/")
+        if len(parts) < 2:
+            raise ValueError("Invalid repo_url format.")
+        return f"{GitHubService.BASE_URL}/repos/{parts[-2]}/{parts[-1]}/pulls/{pr_number}"
+
+    async def _get_etag_entry(self, api_url: str) -> Optional[Dict[str, Any]]:
+        if self._etag_store is not None:
+            return await self._etag_store.get(github_etag_key(api_url))
+        return self._local_etags.get(api_url)
+
+    async def _set_etag_entry(self, api_url: str, entry: Dict[str, Any]):
+        if not entry["etag"] and not entry["last_modified"]:
+            return
+        if self._etag_store is not None:
+            await self._etag_store.set(github_etag_key(api_url), entry, GitHubService.ETAG_TTL_SECONDS)
+        else:
+            self._local_etags[api_url] = entry
@@ -68,4 +68,11 @@ class DiffParser:
         elif line.is_removed:
             return "removed"
         else:
-            return "context"
\ No newline at end of file
+            return "context"
+
+    @staticmethod
+    def normalize_path(path: str) -> str:
+        """Strips the a/ or b/ prefix that git adds to diff paths."""
+        if path.startswith(("a/", "b/")):
+            return path[2:]
+        return path
@@ -1,20 +1,64 @@
+import hashlib
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from services.github_services.patch_download import DownloadedPatch, spool_patch
+from services.metrics_services.metrics import record_github_response
+from services.redis_services.cache_keys import github_etag_key
+from services.redis_services.rate_limiter import RateLimited
+
+
+def github_rate_limit_name(github_token: Optional[str]) -> str:
+    """Names the shared rate limit of a token; GitHub limits each token separately."""
+    # The token itself never leaves the process.
+    token_id = hashlib.sha256(github_token.encode()).hexdigest()[:16] if github_token else "anonymous"
+    return f"github:{token_id}"
 
 
 class GitHubService:
     """
     Handles fetching data from the GitHub API.
     """
-    BASE_URL = "https://api.github.com"
+    BASE_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+    # Validators of conditional requests are kept for a day; GitHub answers a matching
+    # If-None-Match with 304 Not Modified, which does not count against the rate limit.
+    ETAG_TTL_SECONDS = 86400
+    # Keep-alive connections kept per host; requests beyond it open (and drop) extra connections.
+    HTTP_POOL_SIZE = int(os.environ.get("GITHUB_HTTP_POOL_SIZE", 10))
+    # Requests per second (and burst) across all workers sharing a token, which keeps bursts
+    # below GitHub's secondary rate limits; the primary quota is tracked from response headers.
+    REQUESTS_PER_SECOND = float(os.environ.get("GITHUB_REQUESTS_PER_SECOND", 10))
+    REQUESTS_BURST = float(os.environ.get("GITHUB_REQUESTS_BURST", 20))
+    # Requests of the hourly quota left untouched; below it, workers wait for the quota reset.
+    RATE_LIMIT_RESERVE = int(os.environ.get("GITHUB_RATE_LIMIT_RESERVE", 10))
+    # GitHub asks to wait at least a minute after a secondary rate limit without Retry-After.
+    SECONDARY_RATE_LIMIT_BACKOFF_SECONDS = 60
 
-    def __init__(self, github_token: str = None):
+    def __init__(self, github_token: str = None, etag_store=None, pool_size: int = None, rate_limiter=None):
         """
         Initializes the service with an optional GitHub token.
 
+        The session is only configured here and never modified afterwards, so one service can
+        be shared by the threads (or greenlets) of a worker; its connection pool is thread-safe.
+
         Args:
             github_token: A GitHub personal access token for authentication.
+            etag_store: An optional shared store with `get`/`set` (e.g. RedisCacheService) holding
+                the ETag/Last-Modified validators of previous responses. Without one, validators
+                are only kept in memory for the lifetime of the service.
+            pool_size: Keep-alive connections per host; should be at least the number of threads
+                using the service at once. Defaults to GITHUB_HTTP_POOL_SIZE.
+            rate_limiter: An optional RateLimiter shared by all workers using the same token. Requests
+                take tokens from it, and quota headers and rate limit responses pause it.
         """
         self._session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=pool_size or self.HTTP_POOL_SIZE)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
         self._session.headers.update({
             "Accept": "application/vnd.github.v3.patch",
             "X-GitHub-Api-Version": "2022-11-28"
@@ -23,55 +67,157 @@ class GitHubService:
             self._session.headers.update({"Authorization": f"token {github_token}"})
         else:
             print("Warning: No GitHub token provided. Access is limited to public repositories.")
+        self._etag_store = etag_store
+        self._local_etags: Dict[str, Dict[str, Any]] = {}
+        self._rate_limiter = rate_limiter
+        self._rate_limit_name = github_rate_limit_name(github_token)
 
     def get_pr_head_sha(self, repo_url: str, pr_number: int) -> str:
         """
         Fetches only the metadata for a PR to get the head commit SHA.
+
+        The request is conditional on the validators of the previous response, so an
+        unchanged PR is answered with 304 and resolved from the ETag store.
         """
         print(f"Fetching HEAD SHA for PR #{pr_number}...")
-        owner, repo = self._parse_repo_url(repo_url)
-        api_url = f"{self.BASE_URL}/repos/{owner}/{repo}/pulls/{pr_number}"
+        api_url = self._pr_api_url(repo_url, pr_number)
+        entry = self._get_etag_entry(api_url)
 
         # We need standard JSON, not a patch, for this call
         headers = {"Accept": "application/vnd.github+json"}
-        response = self._session.get(api_url, headers=headers)
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = self._get("metadata", api_url, headers=headers)
+        if response.status_code == 304 and entry:
+            return entry["sha"]
         response.raise_for_status()
-        return response.json()["head"]["sha"]
 
+        metadata = response.json()
+        sha = metadata["head"]["sha"]
+        # The entry is shared with the API, which orders PR heads by `updated_at`.
+        self._set_etag_entry(api_url, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "sha": sha,
+            "updated_at": metadata.get("updated_at"),
+        })
+        return sha
 
-    def get_pr_patch(self, repo_url: str, pr_number: int) -> str:
+    def download_pr_patch(self, repo_url: str, pr_number: int, max_bytes: int = None) -> DownloadedPatch:
         """
-        Fetches the raw patch/diff for a specific Pull Request.
+        Streams the raw patch of a Pull Request into memory, or into a temporary file once it
+        grows past PATCH_SPOOL_THRESHOLD_BYTES, instead of buffering it as one string.
 
         Args:
             repo_url: The full URL of the GitHub repository.
             pr_number: The number of the pull request.
+            max_bytes: Bytes to download at most (PATCH_MAX_BYTES by default); a larger patch is
+                cut after its last complete file (or the first file's last complete hunk) and flagged as truncated.
 
         Returns:
-            The raw text of the diff/patch file.
+            The downloaded patch, to be closed by the caller.
 
         Raises:
             ValueError: If the repo_url format is invalid.
             requests.exceptions.HTTPError: If the API request fails.
+            RateLimited: If GitHub's rate limits do not allow the request now.
         """
-        print(f"Fetching patch for PR #{pr_number} from {repo_url}...")
-        try:
-            parts = repo_url.strip("/").split("/")
-            owner, repo = parts[-2], parts[-1]
-        except IndexError:
-            raise ValueError("Invalid repo_url format. Expected 'https://github.com/owner/repo'")
+        print(f"Streaming patch for PR #{pr_number} from {repo_url}...")
+        api_url = self._pr_api_url(repo_url, pr_number)
 
-        api_url = f"{self.BASE_URL}/repos/{owner}/{repo}/pulls/{pr_number}"
+        with self._get("patch", api_url, stream=True) as response:
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as e:
+                print(f"Error fetching patch from GitHub: {e}")
+                print(f"Response Body: {e.response.text}")
+                raise
+            patch = spool_patch(response.iter_content(chunk_size=256 * 1024), max_bytes=max_bytes)
+        print(f"Successfully fetched patch file ({patch.size} bytes{', spooled to disk' if patch.spooled else ''}"
+              f"{', truncated' if patch.truncated else ''}).")
+        return patch
 
+    def _get(self, endpoint: str, api_url: str, headers: Dict[str, str] = None,
+             stream: bool = False) -> requests.Response:
+        """Sends a GET request within the shared rate limit and records the response."""
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire(self._rate_limit_name, self.REQUESTS_PER_SECOND, self.REQUESTS_BURST)
+        response = self._session.get(api_url, headers=headers, stream=stream)
+        record_github_response(endpoint, response.status_code, response.headers)
         try:
-            response = self._session.get(api_url)
-            response.raise_for_status()  # Raises an exception for bad status codes
-            print("Successfully fetched patch file.")
-            return response.text
-        except requests.exceptions.HTTPError as e:
-            print(f"Error fetching patch from GitHub: {e}")
-            print(f"Response Body: {e.response.text}")
+            self._check_rate_limit(response)
+        except RateLimited:
+            response.close()
             raise
+        return response
+
+    def _check_rate_limit(self, response: requests.Response):
+        """
+        Pauses the shared rate limit when the quota is (nearly) used up, and raises RateLimited
+        when GitHub rejected the request for exceeding a primary or secondary rate limit.
+        """
+        delay, pause = self.rate_limit_delays(response.status_code, response.headers, lambda: response.text)
+        self._pause(pause)
+        if delay:
+            raise RateLimited(f"GitHub rate limit exceeded ({response.status_code}).", retry_after=delay)
+
+    @classmethod
+    def rate_limit_delays(cls, status_code: int, headers, text: Callable[[], str]) -> Tuple[int, int]:
+        """
+        Reads GitHub's rate limit headers of a response.
+
+        Args:
+            status_code: The status of the response.
+            headers: Its headers.
+            text: Returns its body, which is only read for a 403 without rate limit headers.
+
+        Returns:
+            The seconds to wait before retrying a rejected request (0 if it was not rejected for
+            its rate), and the seconds for which the shared limit is paused.
+        """
+        remaining = headers.get("X-RateLimit-Remaining", "")
+        reset = headers.get("X-RateLimit-Reset", "")
+        until_reset = max(1, int(reset) - int(time.time())) if reset.isdigit() else 0
+        quota_pause = until_reset if remaining.isdigit() and int(remaining) <= cls.RATE_LIMIT_RESERVE else 0
+
+        retry_after = headers.get("Retry-After", "")
+        if status_code not in (403, 429):
+            delay = 0
+        elif retry_after.isdigit():
+            delay = int(retry_after)
+        elif remaining == "0" and until_reset:
+            delay = until_reset
+        elif status_code == 429 or "rate limit" in text().lower():
+            delay = cls.SECONDARY_RATE_LIMIT_BACKOFF_SECONDS
+        else:
+            # A plain 403 (e.g. missing permissions) is left to raise_for_status.
+            delay = 0
+        return delay, max(delay, quota_pause)
+
+    def _pause(self, seconds: int):
+        if self._rate_limiter is not None:
+            self._rate_limiter.pause(self._rate_limit_name, seconds)
+
+    def _pr_api_url(self, repo_url: str, pr_number: int) -> str:
+        owner, repo = self._parse_repo_url(repo_url)
+        return f"{self.BASE_URL}/repos/{owner}/{repo}/pulls/{pr_number}"
+
+    def _get_etag_entry(self, api_url: str) -> Optional[Dict[str, Any]]:
+        if self._etag_store is not None:
+            return self._etag_store.get(github_etag_key(api_url))
+        return self._local_etags.get(api_url)
+
+    def _set_etag_entry(self, api_url: str, entry: Dict[str, Any]):
+        if not entry["etag"] and not entry["last_modified"]:
+            return
+        if self._etag_store is not None:
+            self._etag_store.set(github_etag_key(api_url), entry, self.ETAG_TTL_SECONDS)
+        else:
+            self._local_etags[api_url] = entry
 
     def _parse_repo_url(self, repo_url: str) -> tuple[str, str]:
         """Helper to extract owner/repo from URL."""
@@ -80,4 +226,3 @@ class GitHubService:
             return parts[-2], parts[-1]
         except IndexError:
             raise ValueError("Invalid repo_url format.")
-
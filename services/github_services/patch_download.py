@@ -0,0 +1,126 @@
+"""
+Downloading PR patches without holding them as one string.
+
+The response body is read in chunks and kept in memory up to a threshold; larger patches
+are spooled to an anonymous temporary file, which `StreamingDiffParser` then reads through a
+read-only memory map. Downloads stop at a byte cap, cut back to the last complete file; when the
+first file alone exceeds the cap, its complete hunks are kept.
+"""
+import mmap
+import os
+import re
+import tempfile
+from typing import BinaryIO, Iterable, Optional, Union
+
+PATCH_SPOOL_THRESHOLD_BYTES = int(os.environ.get("PATCH_SPOOL_THRESHOLD_BYTES", 8 * 1024 * 1024))
+PATCH_MAX_BYTES = int(os.environ.get("PATCH_MAX_BYTES", 64 * 1024 * 1024))
+
+# Every commit of a patch series starts with "From <sha> <date>"; the last one is the PR head.
+_COMMIT_HEADER = re.compile(rb"^From ([0-9a-f]{40}) ", re.MULTILINE)
+_FILE_HEADER = b"\ndiff --git "
+_HUNK_HEADER = b"\n@@ "
+
+
+class DownloadedPatch:
+    """
+    A downloaded patch. Close it (or use it as a context manager) once the parsed files are
+    no longer needed, since they point into its buffer.
+
+    Attributes:
+        buffer: The patch bytes, in memory or as a memory map of the spooled file.
+        size: The number of bytes kept.
+        spooled: Whether the patch was spooled to a temporary file.
+        truncated: Whether the patch exceeded the byte cap and was cut after its last complete file
+            (or, if the first file alone exceeded it, after the first file's last complete hunk).
+        head_sha: The SHA of the last commit of the patch; None if it has none or was truncated,
+            since the header of the last commit may have been cut off.
+    """
+    def __init__(self, buffer: Union[bytearray, mmap.mmap], spooled: bool, truncated: bool,
+                 file: Optional[BinaryIO] = None):
+        self.buffer = buffer
+        self.size = len(buffer)
+        self.spooled = spooled
+        self.truncated = truncated
+        self._file = file
+        commits = [] if truncated else _COMMIT_HEADER.findall(buffer)
+        self.head_sha = commits[-1].decode() if commits else None
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self) -> "DownloadedPatch":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def spool_patch(chunks: Iterable[bytes], max_bytes: int = None, spool_threshold: int = None) -> DownloadedPatch:
+    """
+    Collects a patch from chunks of its body.
+
+    Args:
+        chunks: The body, e.g. `response.iter_content(...)` of a streamed request.
+        max_bytes: The byte cap; defaults to PATCH_MAX_BYTES.
+        spool_threshold: Size above which the patch goes to a temporary file; defaults to
+            PATCH_SPOOL_THRESHOLD_BYTES.
+
+    Returns:
+        The downloaded patch.
+    """
+    max_bytes = max_bytes or PATCH_MAX_BYTES
+    spool_threshold = spool_threshold or PATCH_SPOOL_THRESHOLD_BYTES
+    memory = bytearray()
+    file: Optional[BinaryIO] = None
+    size = 0
+    truncated = False
+
+    for chunk in chunks:
+        if size + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - size]
+            truncated = True
+        if file is None and size + len(chunk) > spool_threshold:
+            file = tempfile.TemporaryFile()
+            file.write(memory)
+            memory = bytearray()
+        if file is not None:
+            file.write(chunk)
+        else:
+            memory += chunk
+        size += len(chunk)
+        if truncated:
+            break
+
+    if file is None:
+        if truncated:
+            del memory[_last_file_boundary(memory):]
+        return DownloadedPatch(memory, spooled=False, truncated=truncated)
+
+    file.flush()
+    buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if truncated:
+        cut = _last_file_boundary(buffer)
+        buffer.close()
+        file.truncate(cut)
+        if not cut:
+            file.close()
+            return DownloadedPatch(bytearray(), spooled=False, truncated=True)
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return DownloadedPatch(buffer, spooled=True, truncated=truncated, file=file)
+
+
+def _last_file_boundary(buffer: Union[bytearray, mmap.mmap]) -> int:
+    """
+    Offset of the last `diff --git` header, where a cut leaves only complete files. If that is the
+    header of the first file, the offset of its last hunk header, so that the file keeps its complete hunks.
+    """
+    last = buffer.rfind(_FILE_HEADER) + 1
+    starts_with_file = buffer[:len(_FILE_HEADER) - 1] == _FILE_HEADER[1:]
+    first = 0 if starts_with_file else buffer.find(_FILE_HEADER) + 1
+    if last > first or not (last or starts_with_file):
+        return last
+    hunk = buffer.rfind(_HUNK_HEADER, first)
+    return hunk + 1 if hunk != -1 else first
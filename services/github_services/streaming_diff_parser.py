@@ -0,0 +1,412 @@
+import hashlib
+import mmap
+import re
+from array import array
+from typing import Any, Iterable, Iterator, List, Optional, Union
+
+from services.github_services.diff_parser import DiffParser
+
+# The patch buffer: the decoded text, the raw bytes, or a memory map of them.
+PatchBuffer = Union[str, bytes, bytearray, memoryview, mmap.mmap]
+
+DEV_NULL = "/dev/null"
+
+# Line kinds stored in CompactHunk.kinds.
+CONTEXT, ADDED, REMOVED, MARKER, EMPTY = 0, 1, 2, 3, 4
+_LINE_TYPES = {CONTEXT: "context", ADDED: "added", REMOVED: "removed", MARKER: "context", EMPTY: "context"}
+_PROMPT_SIGNS = {CONTEXT: " ", ADDED: "+", REMOVED: "-", MARKER: "\\", EMPTY: " "}
+
+_RE_GIT_HEADER = re.compile(r"^diff --git (?P<source>a/[^\t\n]+) (?P<target>b/[^\t\n]+)")
+_RE_GIT_HEADER_NO_PREFIX = re.compile(r"^diff --git (?P<source>[^\t\n]+) (?P<target>[^\t\n]+)")
+_RE_SOURCE_FILE = re.compile(r"^--- (?P<filename>[^\t\n]+)")
+_RE_TARGET_FILE = re.compile(r"^\+\+\+ (?P<filename>[^\t\n]+)")
+_RE_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@[ ]?(.*)")
+_RE_BINARY = re.compile(r"^Binary files? (?P<source>[^\t]+?)(?: and (?P<target>[^\t]+?))? (differ|has changed)")
+
+
+class CompactHunk:
+    """
+    A hunk whose lines are stored column-wise in arrays.
+
+    Line contents are not copied: `starts`/`ends` are offsets into the patch buffer the
+    hunk was parsed from. Line numbers are 0 where a line has none (e.g. added lines
+    have no source line).
+    """
+    __slots__ = ("header", "source_start", "source_length", "target_start", "target_length",
+                 "kinds", "source_nos", "target_nos", "starts", "ends")
+
+    def __init__(self, header: str, source_start: int, source_length: int, target_start: int, target_length: int):
+        self.header = header
+        self.source_start = source_start
+        self.source_length = source_length
+        self.target_start = target_start
+        self.target_length = target_length
+        self.kinds = array("b")
+        self.source_nos = array("l")
+        self.target_nos = array("l")
+        self.starts = array("q")
+        self.ends = array("q")
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def _append(self, kind: int, source_no: int, target_no: int, start: int, end: int):
+        self.kinds.append(kind)
+        self.source_nos.append(source_no)
+        self.target_nos.append(target_no)
+        self.starts.append(start)
+        self.ends.append(end)
+
+
+class CompactFile:
+    """
+    A changed file of a patch, holding its hunks in compact form and a reference to the
+    patch buffer that their line contents are sliced from.
+    """
+    __slots__ = ("source_file", "target_file", "is_binary_file", "hunks", "_buffer")
+
+    def __init__(self, buffer: PatchBuffer, source_file: str, target_file: str):
+        self._buffer = buffer
+        self.source_file = source_file
+        self.target_file = target_file
+        self.is_binary_file = False
+        self.hunks: List[CompactHunk] = []
+
+    @property
+    def is_new_file(self) -> bool:
+        if self.source_file == DEV_NULL:
+            return True
+        return len(self.hunks) == 1 and self.hunks[0].source_start == 0 and self.hunks[0].source_length == 0
+
+    @property
+    def is_deleted_file(self) -> bool:
+        if self.target_file == DEV_NULL:
+            return True
+        return len(self.hunks) == 1 and self.hunks[0].target_start == 0 and self.hunks[0].target_length == 0
+
+    @property
+    def is_renamed_file(self) -> bool:
+        return (self.source_file != DEV_NULL and self.target_file != DEV_NULL
+                and self.source_file[2:] != self.target_file[2:])
+
+    @property
+    def name(self) -> str:
+        """The repository-relative path of the file, without the a/ or b/ prefix."""
+        return DiffParser.normalize_path(self.source_file if self.is_deleted_file else self.target_file)
+
+    @property
+    def added(self) -> int:
+        return sum(hunk.kinds.count(ADDED) for hunk in self.hunks)
+
+    @property
+    def removed(self) -> int:
+        return sum(hunk.kinds.count(REMOVED) for hunk in self.hunks)
+
+    def content(self, hunk: CompactHunk, index: int) -> str:
+        """Returns the content of a hunk line, including its line break."""
+        value = self._buffer[hunk.starts[index]:hunk.ends[index]]
+        return value if isinstance(value, str) else bytes(value).decode("utf-8", "replace")
+
+    def iter_lines(self) -> Iterator[tuple[CompactHunk, int, str, Optional[int], Optional[int], str]]:
+        """Yields (hunk, kind, type, source line, target line, content) for every line of the file."""
+        for hunk in self.hunks:
+            for index in range(len(hunk)):
+                kind = hunk.kinds[index]
+                yield (hunk, kind, _LINE_TYPES[kind], hunk.source_nos[index] or None,
+                       hunk.target_nos[index] or None, self.content(hunk, index))
+
+    def fingerprint(self) -> str:
+        """
+        Hashes the normalized diff content of the file: its paths, change flags and every line's
+        type, line numbers and content. Hunk section headers are left out as they are only context
+        hints, so identical changes hash identically across pushes.
+        """
+        digest = hashlib.sha256()
+        for part in (self.source_file, self.target_file, self.is_new_file, self.is_deleted_file, self.is_renamed_file):
+            digest.update(f"{part}\0".encode())
+        for hunk in self.hunks:
+            digest.update(b"@@\0")
+            for index in range(len(hunk)):
+                content = self.content(hunk, index).rstrip("\r\n")
+                digest.update(
+                    f"{_LINE_TYPES[hunk.kinds[index]]}\0{hunk.source_nos[index] or None}\0"
+                    f"{hunk.target_nos[index] or None}\0{content}\0".encode()
+                )
+        return digest.hexdigest()
+
+
+class StreamingDiffParser:
+    """
+    Parses unified diff text lazily into compact per-file structures.
+
+    Unlike `DiffParser`, no `PatchSet` or per-line objects are built: files are yielded
+    one at a time and each line costs a few array slots plus offsets into the patch buffer.
+    The file semantics (renames, new/deleted files, binary files, no-newline markers)
+    follow `unidiff`, which `DiffParser` is built on.
+    """
+    def parse(self, patch: PatchBuffer) -> List[CompactFile]:
+        """Parses the whole patch, skipping binary files."""
+        files = list(self.iter_files(patch))
+        print(f"Parsed {len(files)} changed file(s).")
+        return files
+
+    def parse_limited(self, patch: PatchBuffer, max_files: int = None,
+                      max_lines: int = None) -> tuple[List[CompactFile], Optional[str]]:
+        """
+        Parses the leading files of a patch that fit within a file and a diff line cap. Parsing
+        stops at the first file beyond them, so the rest of a huge patch is never parsed. The
+        first file is always kept, even if it alone exceeds the line cap.
+
+        Returns:
+            The files kept, and why the remaining files were left out (None if none were).
+        """
+        files: List[CompactFile] = []
+        lines = 0
+        reason = None
+        for file in self.iter_files(patch):
+            file_lines = sum(len(hunk) for hunk in file.hunks)
+            if max_files is not None and len(files) >= max_files:
+                reason = f"more than {max_files} changed files"
+            elif max_lines is not None and files and lines + file_lines > max_lines:
+                reason = f"more than {max_lines} diff lines"
+            if reason:
+                break
+            files.append(file)
+            lines += file_lines
+        print(f"Parsed {len(files)} changed file(s){f', stopped at {reason}' if reason else ''}.")
+        return files, reason
+
+    def iter_files(self, patch: PatchBuffer) -> Iterator[CompactFile]:
+        """
+        Yields the changed, non-binary files of a patch as soon as they are complete.
+
+        Args:
+            patch: The raw patch as text, bytes or a memory-mapped file.
+        """
+        is_text = isinstance(patch, str)
+        newline = "\n" if is_text else b"\n"
+        size = len(patch)
+        pos = 0
+
+        current: Optional[CompactFile] = None
+        pending: Optional[CompactFile] = None
+        source_file = None
+        info_open = False
+
+        def lines():
+            nonlocal pos
+            while pos < size:
+                end = patch.find(newline, pos)
+                end = size if end == -1 else end + 1
+                start, pos = pos, end
+                yield start, end
+
+        line_iter = lines()
+        for start, end in line_iter:
+            line = self._decode(patch[start:end], is_text)
+
+            header = _RE_GIT_HEADER.match(line) or _RE_GIT_HEADER_NO_PREFIX.match(line)
+            if header:
+                if pending is not None and not pending.is_binary_file:
+                    yield pending
+                current = pending = CompactFile(patch, header.group("source"), header.group("target"))
+                info_open = True
+                continue
+
+            if line.startswith(("new file mode ", "deleted file mode ")):
+                if current is None:
+                    raise ValueError(f"Unexpected file mode found: {line}")
+                if line.startswith("new"):
+                    current.source_file = DEV_NULL
+                else:
+                    current.target_file = DEV_NULL
+                continue
+
+            match = _RE_SOURCE_FILE.match(line)
+            if match:
+                source_file = match.group("filename")
+                # Keep the current file when its git header announced the same source (renames).
+                if current is not None and current.source_file != source_file:
+                    current = None
+                continue
+
+            match = _RE_TARGET_FILE.match(line)
+            if match:
+                if current is None:
+                    if pending is not None and not pending.is_binary_file:
+                        yield pending
+                    current = pending = CompactFile(patch, source_file, match.group("filename"))
+                    info_open = False
+                elif current.target_file != match.group("filename"):
+                    raise ValueError(f"Target without source: {line}")
+                continue
+
+            match = _RE_HUNK_HEADER.match(line)
+            if match:
+                info_open = False
+                if current is None:
+                    raise ValueError(f"Unexpected hunk found: {line}")
+                self._parse_hunk(current, match, line_iter, patch, is_text)
+                continue
+
+            if line.startswith("\\ No newline at end of file"):
+                if current is None or not current.hunks:
+                    raise ValueError(f"Unexpected marker: {line}")
+                current.hunks[-1]._append(MARKER, 0, 0, start + 1, end)
+                continue
+
+            if line == "\n" and current is not None and current.hunks:
+                current.hunks[-1]._append(EMPTY, 0, 0, start, end)
+                continue
+
+            # Anything else is patch metadata, which closes the current file.
+            if not info_open:
+                current = None
+                info_open = True
+
+            match = _RE_BINARY.match(line)
+            if match:
+                if current is not None:
+                    current.is_binary_file = True
+                else:
+                    if pending is not None and not pending.is_binary_file:
+                        yield pending
+                    pending = CompactFile(patch, match.group("source"), match.group("target"))
+                    pending.is_binary_file = True
+                current = None
+                info_open = False
+                continue
+
+            if line == "GIT binary patch\n" and current is not None:
+                current.is_binary_file = True
+                current = None
+                info_open = False
+
+        if pending is not None and not pending.is_binary_file:
+            yield pending
+
+    def _parse_hunk(self, file: CompactFile, header: re.Match, line_iter: Iterator[tuple[int, int]],
+                    patch: PatchBuffer, is_text: bool):
+        """Consumes the body lines of a hunk, as many as its header announces."""
+        source_start, source_length, target_start, target_length, section = header.groups()
+        hunk = CompactHunk(
+            section,
+            int(source_start), int(source_length) if source_length is not None else 1,
+            int(target_start), int(target_length) if target_length is not None else 1,
+        )
+        source_no, target_no = hunk.source_start, hunk.target_start
+        source_end, target_end = source_no + hunk.source_length, target_no + hunk.target_length
+        plus, minus, space, backslash = ("+", "-", " ", "\\") if is_text else (b"+", b"-", b" ", b"\\")
+
+        for start, end in line_iter:
+            sign = patch[start:start + 1]
+            if sign == plus:
+                hunk._append(ADDED, 0, target_no, start + 1, end)
+                target_no += 1
+            elif sign == minus:
+                hunk._append(REMOVED, source_no, 0, start + 1, end)
+                source_no += 1
+            elif sign == space:
+                hunk._append(CONTEXT, source_no, target_no, start + 1, end)
+                source_no += 1
+                target_no += 1
+            elif sign == backslash:
+                hunk._append(MARKER, 0, 0, start + 1, end)
+            elif self._decode(patch[start:end], is_text) in ("\n", "\r\n"):
+                # An empty line inside a hunk is a context line whose leading space was stripped.
+                hunk._append(CONTEXT, source_no, target_no, start, end)
+                source_no += 1
+                target_no += 1
+            else:
+                raise ValueError(f"Hunk diff line expected: {self._decode(patch[start:end], is_text)}")
+
+            if source_no > source_end or target_no > target_end:
+                raise ValueError("Hunk is longer than expected")
+            if source_no == source_end and target_no == target_end:
+                break
+
+        if source_no < source_end or target_no < target_end:
+            raise ValueError("Hunk is shorter than expected")
+        file.hunks.append(hunk)
+
+    @staticmethod
+    def _decode(value: Any, is_text: bool) -> str:
+        return value if is_text else bytes(value).decode("utf-8", "replace")
+
+
+def render_prompt(files: Iterable[CompactFile], context_radius: Optional[int] = None) -> str:
+    """
+    Renders parsed files straight into the compact prompt format of the code analysis task.
+
+    Each file starts with a `File:` line, each hunk with its `@@` header, followed by one
+    line per diff line: the diff sign, the line number (new file for added and context
+    lines, old file for removed lines) and the content.
+
+    Args:
+        files: The files to render.
+        context_radius: When set, only context lines at most this many lines away from an
+            added or removed line are kept; each run of dropped lines becomes a `...` line.
+    """
+    parts: List[str] = []
+    for file in files:
+        if file.is_new_file:
+            status = "new file"
+        elif file.is_deleted_file:
+            status = "deleted"
+        elif file.is_renamed_file:
+            status = f"renamed from {DiffParser.normalize_path(file.source_file)}"
+        else:
+            status = "modified"
+        parts.append(f"File: {file.name} ({status})\n")
+
+        for hunk in file.hunks:
+            parts.append(
+                f"@@ -{hunk.source_start},{hunk.source_length} +{hunk.target_start},{hunk.target_length} @@"
+                f" {hunk.header}".rstrip() + "\n"
+            )
+            kept = _kept_lines(hunk, context_radius) if context_radius is not None else None
+            skipped = 0
+            for index in range(len(hunk)):
+                if kept is not None and not kept[index]:
+                    skipped += 1
+                    continue
+                if skipped:
+                    parts.append(f" {'...':>6} | ({skipped} unchanged lines)\n")
+                    skipped = 0
+                kind = hunk.kinds[index]
+                number = hunk.source_nos[index] if kind == REMOVED else hunk.target_nos[index]
+                content = file.content(hunk, index)
+                if not content.endswith("\n"):
+                    content += "\n"
+                parts.append(f"{_PROMPT_SIGNS[kind]}{number or '':>6} | {content}")
+            if skipped:
+                parts.append(f" {'...':>6} | ({skipped} unchanged lines)\n")
+        parts.append("\n")
+    return "".join(parts)
+
+
+def _kept_lines(hunk: CompactHunk, radius: int) -> List[bool]:
+    """
+    Marks the lines of a hunk that are within `radius` lines of an added or removed line.
+    No-newline markers follow the line they belong to.
+    """
+    count = len(hunk)
+    distance = [count + radius + 1] * count
+    last = None
+    for index in range(count):
+        if hunk.kinds[index] in (ADDED, REMOVED):
+            last = index
+        if last is not None:
+            distance[index] = index - last
+    last = None
+    for index in range(count - 1, -1, -1):
+        if hunk.kinds[index] in (ADDED, REMOVED):
+            last = index
+        if last is not None:
+            distance[index] = min(distance[index], last - index)
+
+    kept = [d <= radius for d in distance]
+    for index in range(1, count):
+        if hunk.kinds[index] == MARKER:
+            kept[index] = kept[index - 1]
+    return kept
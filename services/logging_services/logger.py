@@ -1,47 +1,178 @@
+"""
+Application logging that stays off the hot path.
+
+`AppLogger` only puts records on an in-memory queue; a `QueueListener` thread per logger
+formats them and writes them to the console and a rotating file. Messages use `%`-style
+arguments, so nothing is formatted for disabled levels and formatting happens on the listener
+thread. Records are written as JSON lines (LOG_FORMAT=text restores the plain format).
+Arguments must not be mutated after the call, since they are formatted later.
+
+Large payloads (raw LLM output, full results) go through `AppLogger.payload`, which logs only a
+sample of them (LOG_PAYLOAD_SAMPLE_RATE) and cuts them to LOG_PAYLOAD_MAX_CHARS.
+"""
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, List
+
+import orjson
+
+from services.metrics_services.metrics import LOG_RECORDS_DROPPED
+
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+# Records waiting for the listener; beyond this, new records are dropped rather than blocking the caller.
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get("LOG_PAYLOAD_SAMPLE_RATE", 0.01))
+LOG_PAYLOAD_MAX_CHARS = int(os.environ.get("LOG_PAYLOAD_MAX_CHARS", 4096))
+
+# Attributes every LogRecord has; anything else was passed as a structured field.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line, with its structured fields as top-level keys."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """Enqueues records as they are, dropping them when the queue is full."""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is left to the listener thread.
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(logger=record.name).inc()
+
+
+class _Truncated:
+    """A payload that is serialized and cut to `max_chars` only when the record is formatted."""
+    def __init__(self, payload: Any, max_chars: int):
+        self.payload = payload
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        text = self.payload if isinstance(self.payload, str) else orjson.dumps(self.payload, default=str).decode()
+        if len(text) <= self.max_chars:
+            return text
+        return f"{text[:self.max_chars]}... [{len(text) - self.max_chars} more characters]"
+
+
+# One queue and listener per logger name, shared by all AppLogger instances of the process.
+_listeners: Dict[str, QueueListener] = {}
+_queue_handlers: Dict[str, _NonBlockingQueueHandler] = {}
+_listeners_lock = threading.Lock()
+
+
+def _start_listener(name: str, handlers: List[logging.Handler]):
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    _queue_handlers[name].queue = log_queue
+    _listeners[name] = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listeners[name].start()
+
+
+def _restart_listeners_after_fork():
+    # The listener threads do not survive a fork (e.g. into Celery prefork children), and their
+    # queues may have been locked mid-operation, so the child starts over with new ones.
+    global _listeners_lock
+    _listeners_lock = threading.Lock()
+    for name, listener in list(_listeners.items()):
+        _start_listener(name, list(listener.handlers))
+
+
+def stop_logging():
+    """Writes every queued record and stops the listener threads, e.g. when a process exits."""
+    with _listeners_lock:
+        for listener in _listeners.values():
+            if listener._thread is not None:
+                listener.stop()
+
+
+os.register_at_fork(after_in_child=_restart_listeners_after_fork)
+atexit.register(stop_logging)
+
 
 class AppLogger:
-    def __init__(self, name: str, log_dir: str = "logs", log_level=logging.DEBUG):
-        os.makedirs(log_dir, exist_ok=True)
+    """
+    A named application logger writing through a background thread.
 
+    Args:
+        name: The logger name; records also go to `<log_dir>/<name>.log`.
+        log_dir: Directory of the rotating log files.
+        log_level: Lowest level written to the file; the console gets INFO and above.
+    """
+    def __init__(self, name: str, log_dir: str = "logs", log_level=logging.DEBUG):
         self.logger = logging.getLogger(name)
         self.logger.setLevel(log_level)
+        self.logger.propagate = False
+
+        with _listeners_lock:
+            if name not in _listeners:
+                os.makedirs(log_dir, exist_ok=True)
+                if LOG_FORMAT == "text":
+                    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+                else:
+                    formatter = JsonFormatter()
+
+                # Console handler
+                ch = logging.StreamHandler()
+                ch.setLevel(logging.INFO)
+                ch.setFormatter(formatter)
 
-        if not self.logger.handlers:
-            formatter = logging.Formatter(
-                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-            )
+                # Rotating file handler
+                fh = RotatingFileHandler(
+                    os.path.join(log_dir, f"{name}.log"),
+                    maxBytes=5 * 1024 * 1024,
+                    backupCount=3
+                )
+                fh.setLevel(log_level)
+                fh.setFormatter(formatter)
 
-            # Console handler
-            ch = logging.StreamHandler()
-            ch.setLevel(logging.INFO)
-            ch.setFormatter(formatter)
+                _queue_handlers[name] = _NonBlockingQueueHandler(None)
+                _start_listener(name, [ch, fh])
+                self.logger.addHandler(_queue_handlers[name])
 
-            # Rotating file handler
-            fh = RotatingFileHandler(
-                os.path.join(log_dir, f"{name}.log"),
-                maxBytes=5 * 1024 * 1024,
-                backupCount=3
-            )
-            fh.setLevel(log_level)
-            fh.setFormatter(formatter)
+    def info(self, msg: str, *args, **fields):
+        self.logger.info(msg, *args, extra=fields)
 
-            self.logger.addHandler(ch)
-            self.logger.addHandler(fh)
+    def warning(self, msg: str, *args, **fields):
+        self.logger.warning(msg, *args, extra=fields)
 
-    def info(self, msg: str):
-        self.logger.info(msg)
+    def error(self, msg: str, *args, **fields):
+        self.logger.error(msg, *args, extra=fields)
 
-    def warning(self, msg: str):
-        self.logger.warning(msg)
+    def critical(self, msg: str, *args, **fields):
+        self.logger.critical(msg, *args, extra=fields)
 
-    def error(self, msg: str):
-        self.logger.error(msg)
+    def debug(self, msg: str, *args, **fields):
+        self.logger.debug(msg, *args, extra=fields)
 
-    def critical(self, msg: str):
-        self.logger.critical(msg)
+    def payload(self, msg: str, payload: Any, **fields):
+        """
+        Logs a large payload at DEBUG level for a sample of the calls, cut to LOG_PAYLOAD_MAX_CHARS.
 
-    def debug(self, msg: str):
-        self.logger.debug(msg)
+        Args:
+            msg: Describes the payload; it is followed by the payload text.
+            payload: A string, or a JSON-serializable object.
+        """
+        if not self.logger.isEnabledFor(logging.DEBUG) or random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+            return
+        self.logger.debug("%s\n%s", msg, _Truncated(payload, LOG_PAYLOAD_MAX_CHARS), extra=fields)
@@ -0,0 +1,126 @@
+"""
+Prometheus metrics shared by the API and the Celery workers.
+
+With several processes (uvicorn workers, Celery prefork children) set PROMETHEUS_MULTIPROC_DIR
+to a directory shared by all of them on the host: every process then writes its samples there
+and `render_metrics` aggregates them.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Mapping, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+_TOKEN_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 20000, 50000, 100000)
+
+STAGE_SECONDS = Histogram(
+    "pr_analysis_stage_seconds", "Duration of the analysis pipeline stages.", ["stage"], buckets=_LATENCY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "pr_analysis_cache_requests_total", "Cache lookups by cache and outcome.", ["cache", "outcome"],
+)
+LOCAL_CACHE_EVICTIONS = Counter(
+    "pr_analysis_local_cache_evictions_total", "Entries dropped from in-process caches, by cache and reason.",
+    ["cache", "reason"],
+)
+LOCAL_CACHE_ENTRIES = Gauge(
+    "pr_analysis_local_cache_entries", "Entries held by in-process caches.", ["cache"], multiprocess_mode="livesum",
+)
+LLM_CALL_SECONDS = Histogram(
+    "pr_analysis_llm_call_seconds", "Duration of a single AI crew call, by model tier.", ["tier"],
+    buckets=_LATENCY_BUCKETS,
+)
+LLM_ROUTES = Counter(
+    "pr_analysis_llm_routes_total", "Crew calls by model tier and the signal that chose it.", ["tier", "reason"],
+)
+LLM_FALLBACKS = Counter(
+    "pr_analysis_llm_fallbacks_total", "Shards retried on the pro model after the tier's output failed validation.",
+    ["tier"],
+)
+LLM_TOKENS = Histogram(
+    "pr_analysis_llm_tokens", "Tokens per AI crew call (estimated when the crew reports no usage).",
+    ["kind"], buckets=_TOKEN_BUCKETS,
+)
+GITHUB_REQUESTS = Counter(
+    "github_requests_total", "GitHub API requests by endpoint and status code.", ["endpoint", "status"],
+)
+GITHUB_RATE_LIMIT_REMAINING = Gauge(
+    "github_rate_limit_remaining", "Requests left in the current GitHub rate limit window.",
+    multiprocess_mode="mostrecent",
+)
+GITHUB_RATE_LIMIT_RESET = Gauge(
+    "github_rate_limit_reset_timestamp", "Unix time at which the GitHub rate limit window resets.",
+    multiprocess_mode="mostrecent",
+)
+RATE_LIMIT_WAITS = Counter(
+    "rate_limit_waits_total", "Calls held back by a shared rate limit, by limit and outcome (waited or deferred).",
+    ["limit", "outcome"],
+)
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "rate_limit_wait_seconds", "Time spent waiting for a shared rate limit.", ["limit"], buckets=_LATENCY_BUCKETS,
+)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total", "Log records dropped because the logging queue was full.", ["logger"],
+)
+API_REQUEST_SECONDS = Histogram(
+    "pr_api_request_seconds", "Duration of API requests.", ["method", "route", "status"], buckets=_LATENCY_BUCKETS,
+)
+
+
+@contextmanager
+def stage_timer(stage: str, timings: Optional[Dict[str, float]] = None) -> Iterator[None]:
+    """
+    Times a block as a pipeline stage. The duration is observed in `pr_analysis_stage_seconds`
+    and, when `timings` is given, added to `timings[stage]` in seconds.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed, 4)
+
+
+def record_cache_lookup(cache: str, hits: int, misses: int = 0):
+    """Counts hits and misses of a cache lookup (or of a batched lookup)."""
+    if hits:
+        CACHE_REQUESTS.labels(cache=cache, outcome="hit").inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache=cache, outcome="miss").inc(misses)
+
+
+def record_github_response(endpoint: str, status_code: int, headers: Mapping[str, str]):
+    """Counts a GitHub response and updates the rate limit gauges from its headers."""
+    GITHUB_REQUESTS.labels(endpoint=endpoint, status=str(status_code)).inc()
+    remaining = headers.get("X-RateLimit-Remaining")
+    if remaining is not None and remaining.isdigit():
+        GITHUB_RATE_LIMIT_REMAINING.set(int(remaining))
+    reset = headers.get("X-RateLimit-Reset")
+    if reset is not None and reset.isdigit():
+        GITHUB_RATE_LIMIT_RESET.set(int(reset))
+
+
+def metrics_registry() -> CollectorRegistry:
+    """Returns the registry to expose: the multi-process aggregate when configured, else the process's own."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Renders all metrics in the Prometheus text format, with its content type."""
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    """Drops the live gauges of an exited process from the multi-process aggregate."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,124 @@
+from typing import Optional, Dict, Any, List
+import os
+import threading
+
+import redis
+import redis.asyncio as aioredis
+
+from services.redis_services.codecs import Codec, default_codec
+from services.redis_services.redis_cache import REDIS_HOST, REDIS_PORT
+
+# One connection pool per (host, port, db), shared by every service instance of the process.
+# Requests wait for a free connection once REDIS_MAX_CONNECTIONS are in use.
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", 100))
+_pools: Dict[tuple[str, int, int], aioredis.ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_async_pool(host: str = REDIS_HOST, port: int = REDIS_PORT, db: int = 1) -> aioredis.ConnectionPool:
+    """Returns the process-wide asyncio connection pool for a Redis database, creating it on first use."""
+    key = (host, port, db)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = aioredis.BlockingConnectionPool(
+                host=host, port=port, db=db, max_connections=REDIS_MAX_CONNECTIONS
+            )
+        return _pools[key]
+
+
+class AsyncRedisCacheService:
+    """
+    Asyncio counterpart of `RedisCacheService` for the API's request path.
+
+    Instances are cheap: they share the process-wide connection pool of their database
+    and the configured codec, and connect lazily, so no round trip is made on construction.
+    """
+    def __init__(self, host: str = REDIS_HOST, port: int = REDIS_PORT, db: int = 1, codec: Codec = None):
+        self.redis_client = aioredis.Redis(connection_pool=get_async_pool(host, port, db))
+        self.codec = codec or default_codec()
+        self.db = db
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Gets a value from the cache and decodes it.
+        """
+        try:
+            cached_value = await self.redis_client.get(key)
+        except redis.exceptions.ConnectionError as e:
+            print(f"Error connecting to Redis, on database number {self.db}: {e}")
+            return None
+        return self._decode(key, cached_value)
+
+    async def get_raw_json(self, key: str) -> Optional[bytes]:
+        """
+        Gets a value from the cache as JSON bytes, without parsing it.
+        """
+        try:
+            cached_value = await self.redis_client.get(key)
+        except redis.exceptions.ConnectionError as e:
+            print(f"Error connecting to Redis, on database number {self.db}: {e}")
+            return None
+        return self._decode_json(key, cached_value)
+
+    async def get_many_raw_json(self, keys: List[str]) -> List[Optional[bytes]]:
+        """
+        Like `get_raw_json` for several keys, in a single MGET round trip.
+        """
+        if not keys:
+            return []
+        try:
+            values = await self.redis_client.mget(keys)
+        except redis.exceptions.ConnectionError as e:
+            print(f"Error connecting to Redis, on database number {self.db}: {e}")
+            return [None] * len(keys)
+        return [self._decode_json(key, value) for key, value in zip(keys, values)]
+
+    async def set(self, key: str, value: Dict[str, Any], expiry_seconds: int = 3600):
+        """
+        Encodes a value and sets it in the cache with an expiry.
+        """
+        try:
+            await self.redis_client.set(key, self.codec.encode(value), ex=expiry_seconds)
+        except redis.exceptions.ConnectionError as e:
+            print(f"Error connecting to Redis, on database number {self.db}: {e}")
+
+    async def exists(self, key: str) -> bool:
+        """
+        Checks whether a key is present without transferring its value.
+        """
+        try:
+            return bool(await self.redis_client.exists(key))
+        except redis.exceptions.ConnectionError as e:
+            print(f"Error connecting to Redis, on database number {self.db}: {e}")
+            return False
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Gets several values in a single MGET round trip. Missing or corrupt entries are None.
+        """
+        if not keys:
+            return []
+        try:
+            values = await self.redis_client.mget(keys)
+        except redis.exceptions.ConnectionError as e:
+            print(f"Error connecting to Redis, on database number {self.db}: {e}")
+            return [None] * len(keys)
+        return [self._decode(key, value) for key, value in zip(keys, values)]
+
+    def _decode(self, key: str, cached_value: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        if not cached_value:
+            return None
+        try:
+            return self.codec.decode(cached_value)
+        except (ValueError, KeyError, TypeError):
+            print(f"[REDIS] Cache data for key '{key}' is corrupt or malformed.")
+            return None
+
+    def _decode_json(self, key: str, cached_value: Optional[bytes]) -> Optional[bytes]:
+        if not cached_value:
+            return None
+        try:
+            return self.codec.decode_json(cached_value)
+        except (ValueError, KeyError, TypeError):
+            print(f"[REDIS] Cache data for key '{key}' is corrupt or malformed.")
+            return None
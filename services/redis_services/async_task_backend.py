@@ -0,0 +1,34 @@
+import json
+from typing import Any, Dict, List
+
+import redis.asyncio as aioredis
+
+
+class AsyncTaskBackend:
+    """
+    Reads task state from Celery's Redis result backend without blocking the event loop.
+
+    Celery stores each task's state as JSON under `celery-task-meta-<task_id>`; a missing
+    key means the task is unknown or still queued, which Celery reports as PENDING.
+    """
+    KEY_PREFIX = "celery-task-meta-"
+
+    def __init__(self, url: str):
+        self.redis_client = aioredis.Redis.from_url(url, decode_responses=True)
+
+    async def get_task_meta(self, task_id: str) -> Dict[str, Any]:
+        """Returns the stored task meta (`status`, `result`, ...), or a PENDING placeholder."""
+        raw = await self.redis_client.get(f"{self.KEY_PREFIX}{task_id}")
+        if not raw:
+            return {"task_id": task_id, "status": "PENDING", "result": None}
+        return json.loads(raw)
+
+    async def get_many_task_meta(self, task_ids: List[str]) -> List[Dict[str, Any]]:
+        """Returns the meta of several tasks in a single MGET round trip, in the given order."""
+        if not task_ids:
+            return []
+        raws = await self.redis_client.mget([f"{self.KEY_PREFIX}{task_id}" for task_id in task_ids])
+        return [
+            json.loads(raw) if raw else {"task_id": task_id, "status": "PENDING", "result": None}
+            for task_id, raw in zip(task_ids, raws)
+        ]
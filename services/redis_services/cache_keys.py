@@ -0,0 +1,102 @@
+"""
+Builders for the Redis keys shared by the API and the Celery worker.
+"""
+
+# Pub/sub channel on which writers announce cache keys whose value changed, so that API
+# processes drop their in-process copies.
+CACHE_INVALIDATION_CHANNEL = "cache-invalidations"
+
+
+def repo_slug(repo_url: str) -> str:
+    """
+    Identifies a repository in keys as `owner/repo`, lowercased like GitHub compares names,
+    whether given a URL (`https://github.com/Owner/Repo.git`, with or without a trailing slash)
+    or `owner/repo`, so that every entry point finds the same entries.
+    """
+    parts = repo_url.strip().strip("/").split("/")
+    if len(parts) < 2 or not parts[-2] or not parts[-1]:
+        raise ValueError("Invalid repo_url format.")
+    repo = parts[-1][:-len(".git")] if parts[-1].endswith(".git") else parts[-1]
+    return f"{parts[-2]}/{repo}".lower()
+
+
+def analysis_key(repo_url: str, pr_number: int, head_sha: str) -> str:
+    """Key of the full analysis result for a PR at a given head commit."""
+    return f"analysis:{repo_slug(repo_url)}:{pr_number}:{head_sha}"
+
+
+def file_analysis_key(fingerprint: str) -> str:
+    """Key of a single file's analysis, addressed by the fingerprint of its diff content."""
+    return f"analysis:file:{fingerprint}"
+
+
+def github_etag_key(api_url: str) -> str:
+    """Key of the ETag/Last-Modified validators stored for a GitHub API resource."""
+    return f"github:etag:{api_url}"
+
+
+def inflight_key(result_key: str) -> str:
+    """Key of the in-flight registry entry pointing at the task that computes `result_key`."""
+    return f"inflight:{result_key}"
+
+
+def pr_head_key(repo_url: str, pr_number: int) -> str:
+    """Key of the pointer to the newest known head SHA of a PR and the task analysing it."""
+    return f"pr-head:{repo_slug(repo_url)}:{pr_number}"
+
+
+def batch_key(group_id: str) -> str:
+    """Key of the task ids that make up a batch analysis started by `POST /analyze-prs`."""
+    return f"batch:{group_id}"
+
+
+def task_run_key(task_id: str) -> str:
+    """Key of the run statistics (stage timings, cache and token counts) of an analysis task."""
+    return f"task-run:{task_id}"
+
+
+def task_events_key(task_id: str) -> str:
+    """Key of the event log of a task, also used as its pub/sub channel."""
+    return f"task-events:{task_id}"
+
+
+def rate_limit_key(name: str) -> str:
+    """Key of the token bucket (tokens left, last refill) of a rate limit shared by the workers."""
+    return f"rate-limit:{name}"
+
+
+def rate_limit_pause_key(name: str) -> str:
+    """Key of the time until which a rate limit is paused, e.g. after a 429 or an exhausted GitHub quota."""
+    return f"rate-limit:{name}:paused-until"
+
+
+def repo_analyses_key(repo: str) -> str:
+    """Key of the summaries of a repository's analyses, scored by when they finished."""
+    return f"repo:{repo}:analyses"
+
+
+def repo_prs_key(repo: str) -> str:
+    """Key of a repository's analysed PR numbers, scored by the time of their latest analysis."""
+    return f"repo:{repo}:prs"
+
+
+def pr_latest_analysis_key(repo: str, pr_number: int) -> str:
+    """Key of the pointer to the head SHA and summary of a PR's latest analysis."""
+    return f"repo:{repo}:pr:{pr_number}:latest"
+
+
+def pr_issue_counts_key(repo: str, pr_number: int, by: str) -> str:
+    """Key of the issue counts of a PR's latest analysis, `by` "type" or "file"."""
+    return f"repo:{repo}:pr:{pr_number}:issues-by-{by}"
+
+
+def repo_issues_key(repo: str, issue_type: str = None) -> str:
+    """Key of a repository's reported issues (of one type, if given), scored by when they were reported."""
+    if issue_type:
+        return f"repo:{repo}:issues:type:{issue_type}"
+    return f"repo:{repo}:issues"
+
+
+def repo_issue_counts_key(repo: str, by: str) -> str:
+    """Key of the issue counts over the latest analysis of each PR of a repository, `by` "type" or "file"."""
+    return f"repo:{repo}:issues-by-{by}"
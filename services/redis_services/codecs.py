@@ -0,0 +1,119 @@
+"""
+Binary encodings for values stored in Redis.
+
+Encoded values start with a version byte, followed by a codec id and a compression id:
+
+    b"\x01" <codec: b"j" orjson | b"m" msgpack> <compression: b"-" none | b"z" zstd> <payload>
+
+Values written before the version byte existed are plain JSON text, which always starts
+with a printable character, so both formats can be read side by side while writers are
+switched over (REDIS_CODEC=legacy keeps writing plain JSON).
+"""
+import json
+import os
+from functools import lru_cache
+from typing import Any
+
+import orjson
+
+try:
+    import msgpack
+except ImportError:  # Optional: only needed when REDIS_CODEC=msgpack.
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: values are stored uncompressed without it.
+    zstandard = None
+
+VERSION = b"\x01"
+_ORJSON, _MSGPACK = b"j", b"m"
+_UNCOMPRESSED, _ZSTD = b"-", b"z"
+
+
+class CodecError(ValueError):
+    """Raised when a stored value cannot be decoded."""
+
+
+class Codec:
+    """
+    Encodes values for storage and decodes any supported stored format.
+
+    Args:
+        name: "orjson", "msgpack" or "legacy" (plain JSON text without a version byte).
+        compression_threshold: Encoded payloads of at least this many bytes are zstd-compressed
+            when `zstandard` is installed; 0 disables compression.
+        compression_level: The zstd compression level.
+    """
+    def __init__(self, name: str = "orjson", compression_threshold: int = 16384, compression_level: int = 3):
+        if name == "msgpack" and msgpack is None:
+            print("[REDIS] msgpack is not installed, falling back to orjson encoding.")
+            name = "orjson"
+        self.name = name
+        self.compression_threshold = compression_threshold if zstandard is not None else 0
+        self.compression_level = compression_level
+
+    def encode(self, value: Any) -> bytes:
+        if self.name == "legacy":
+            return json.dumps(value).encode()
+        if self.name == "msgpack":
+            codec, payload = _MSGPACK, msgpack.packb(value, use_bin_type=True)
+        else:
+            codec, payload = _ORJSON, orjson.dumps(value)
+        return self._frame(codec, payload)
+
+    def encode_json(self, payload: bytes) -> bytes:
+        """Frames an already JSON-serialized value, e.g. canonical response bytes, without re-encoding it."""
+        if self.name == "legacy":
+            return payload
+        return self._frame(_ORJSON, payload)
+
+    def decode_json(self, data: bytes) -> bytes:
+        """Returns a stored value as JSON bytes, without parsing it unless it was stored as msgpack."""
+        if not data[:1] == VERSION:
+            return data
+        codec, payload = data[1:2], self._payload(data)
+        if codec == _ORJSON:
+            return payload
+        return orjson.dumps(self.decode(data))
+
+    def decode(self, data: bytes) -> Any:
+        if not data[:1] == VERSION:
+            # Legacy value: plain JSON text.
+            return json.loads(data)
+        codec, payload = data[1:2], self._payload(data)
+        if codec == _ORJSON:
+            return orjson.loads(payload)
+        if codec == _MSGPACK:
+            if msgpack is None:
+                raise CodecError("Value is msgpack-encoded but msgpack is not installed.")
+            return msgpack.unpackb(payload, raw=False)
+        raise CodecError(f"Unknown codec id {codec!r}.")
+
+    def _frame(self, codec: bytes, payload: bytes) -> bytes:
+        if self.compression_threshold and len(payload) >= self.compression_threshold:
+            # zstd contexts are not thread-safe, so each call uses its own.
+            return VERSION + codec + _ZSTD + zstandard.ZstdCompressor(level=self.compression_level).compress(payload)
+        return VERSION + codec + _UNCOMPRESSED + payload
+
+    def _payload(self, data: bytes) -> bytes:
+        compression, payload = data[2:3], data[3:]
+        if compression == _UNCOMPRESSED:
+            return payload
+        if compression == _ZSTD:
+            if zstandard is None:
+                raise CodecError("Value is zstd-compressed but zstandard is not installed.")
+            try:
+                return zstandard.ZstdDecompressor().decompress(payload)
+            except zstandard.ZstdError as e:
+                raise CodecError(str(e)) from e
+        raise CodecError(f"Unknown compression id {compression!r}.")
+
+
+@lru_cache(maxsize=None)
+def default_codec() -> Codec:
+    """Returns the process-wide codec configured by REDIS_CODEC and REDIS_COMPRESSION_THRESHOLD."""
+    return Codec(
+        name=os.environ.get("REDIS_CODEC", "orjson"),
+        compression_threshold=int(os.environ.get("REDIS_COMPRESSION_THRESHOLD", 16384)),
+    )
@@ -0,0 +1,110 @@
+import os
+import uuid
+from typing import Awaitable, Callable
+
+import redis
+
+from services.redis_services.cache_keys import inflight_key
+from services.redis_services.redis_cache import RedisCacheService
+
+# Replace the owner only if it is still the one we saw (compare-and-set).
+_REPLACE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+return false
+"""
+# Refresh or delete the entry only while we own it.
+_REFRESH_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class InFlightRegistry:
+    """
+    Maps result cache keys to the id of the task currently computing them, so that
+    concurrent requests for the same PR head share a single analysis.
+
+    Entries are claimed by the API (`AsyncInFlightRegistry.claim`) and expire after
+    `ttl_seconds` unless the owning task refreshes them, so entries of crashed workers
+    disappear on their own. Workers use this registry to refresh and release their entries.
+    """
+    def __init__(self, cache: RedisCacheService, ttl_seconds: int = None):
+        self.redis_client = cache.redis_client
+        self.ttl_seconds = ttl_seconds or int(os.environ.get("INFLIGHT_TTL_SECONDS", 900))
+        if self.redis_client:
+            self._refresh = self.redis_client.register_script(_REFRESH_SCRIPT)
+            self._release = self.redis_client.register_script(_RELEASE_SCRIPT)
+
+    def refresh(self, result_key: str, task_id: str):
+        """Extends the entry's lifetime while `task_id` still owns it."""
+        if self.redis_client:
+            self._refresh(keys=[inflight_key(result_key)], args=[task_id, self.ttl_seconds])
+
+    def release(self, result_key: str, task_id: str):
+        """Removes the entry if it is still owned by `task_id`."""
+        if self.redis_client:
+            self._release(keys=[inflight_key(result_key)], args=[task_id])
+
+
+class AsyncInFlightRegistry:
+    """
+    Asyncio counterpart of `InFlightRegistry` for the API's request path, which claims entries
+    (atomically with SET NX) and releases those whose task could not be queued.
+    """
+    def __init__(self, cache, ttl_seconds: int = None):
+        self.redis_client = cache.redis_client
+        self.ttl_seconds = ttl_seconds or int(os.environ.get("INFLIGHT_TTL_SECONDS", 900))
+        self._replace = self.redis_client.register_script(_REPLACE_SCRIPT)
+        self._release = self.redis_client.register_script(_RELEASE_SCRIPT)
+
+    async def claim(self, result_key: str, is_stale: Callable[[str], Awaitable[bool]] = None) -> tuple[str, bool]:
+        """
+        Claims the computation of `result_key` for a new task id.
+
+        Args:
+            result_key: The result cache key the task will write.
+            is_stale: Optional coroutine function checking whether a registered task can no longer
+                finish (e.g. it failed or was revoked); such entries are taken over.
+
+        Returns:
+            The id of the task that owns the computation, and whether it was claimed by this call,
+            in which case the caller must start the task under that id.
+        """
+        task_id = str(uuid.uuid4())
+        key = inflight_key(result_key)
+        try:
+            for _ in range(3):
+                if await self.redis_client.set(key, task_id, nx=True, ex=self.ttl_seconds):
+                    return task_id, True
+                owner = await self.redis_client.get(key)
+                if owner is None:
+                    # Expired between SET and GET, try again.
+                    continue
+                owner = owner.decode()
+                if is_stale and await is_stale(owner):
+                    if await self._replace(keys=[key], args=[owner, task_id, self.ttl_seconds]):
+                        print(f"[REDIS] Reclaimed stale in-flight entry {key} from task {owner}.")
+                        return task_id, True
+                    continue
+                return owner, False
+        except redis.exceptions.ConnectionError as e:
+            print(f"[REDIS] In-flight registry unavailable: {e}")
+        # The entry keeps changing hands (or Redis is down); give up on deduplication rather than failing the request.
+        return task_id, True
+
+    async def release(self, result_key: str, task_id: str):
+        """Removes the entry if it is still owned by `task_id`, e.g. when its task could not be queued."""
+        try:
+            await self._release(keys=[inflight_key(result_key)], args=[task_id])
+        except redis.exceptions.ConnectionError as e:
+            print(f"[REDIS] In-flight registry unavailable: {e}")
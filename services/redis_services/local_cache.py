@@ -0,0 +1,172 @@
+"""
+In-process caches in front of Redis for the API.
+
+`LocalCache` is a bounded LRU with a TTL holding ready-to-send JSON bytes, so that a hit
+costs neither a Redis round trip nor decoding. `TieredCache` layers it over an
+`AsyncRedisCacheService`, and `CacheInvalidationListener` drops local copies of keys
+that writers announce on the invalidation channel. The TTL bounds staleness when an
+announcement is missed, e.g. while the listener reconnects.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, List, Optional
+
+import redis
+
+from services.metrics_services.metrics import LOCAL_CACHE_ENTRIES, LOCAL_CACHE_EVICTIONS, record_cache_lookup
+from services.redis_services.cache_keys import CACHE_INVALIDATION_CHANNEL
+
+
+class LocalCache:
+    """
+    A least-recently-used cache of at most `max_entries` values, each kept for `ttl_seconds`.
+    It is meant for the event loop of one process and does no locking.
+
+    Args:
+        name: Labels the cache's hit, miss, eviction and size metrics.
+        max_entries: Number of values kept; 0 disables the cache.
+        ttl_seconds: Seconds a value is served after it was stored.
+    """
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        # Bumped by every invalidation, so that a value read from Redis before an invalidation
+        # arrived is not stored after it (see `TieredCache.get`).
+        self.generation = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the value of `key`, or None if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            record_cache_lookup(self.name, 0, 1)
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._drop(key, "expired")
+            record_cache_lookup(self.name, 0, 1)
+            return None
+        self._entries.move_to_end(key)
+        record_cache_lookup(self.name, 1)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """Stores a value, evicting the least recently used ones beyond `max_entries`."""
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)), "capacity")
+        LOCAL_CACHE_ENTRIES.labels(cache=self.name).set(len(self._entries))
+
+    def invalidate(self, key: Hashable):
+        """Drops the value of `key`, if held."""
+        self.generation += 1
+        if key in self._entries:
+            self._drop(key, "invalidated")
+
+    def clear(self):
+        """Drops all values."""
+        self.generation += 1
+        if self._entries:
+            LOCAL_CACHE_EVICTIONS.labels(cache=self.name, reason="cleared").inc(len(self._entries))
+            self._entries.clear()
+            LOCAL_CACHE_ENTRIES.labels(cache=self.name).set(0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: Hashable, reason: str):
+        del self._entries[key]
+        LOCAL_CACHE_EVICTIONS.labels(cache=self.name, reason=reason).inc()
+        LOCAL_CACHE_ENTRIES.labels(cache=self.name).set(len(self._entries))
+
+
+class TieredCache:
+    """
+    Reads stored values as JSON bytes through a `LocalCache`, falling back to Redis on a miss.
+    The bytes are not parsed, so they can be sent as a response body as they are.
+
+    Args:
+        cache: The AsyncRedisCacheService holding the encoded values.
+        local: The in-process cache, keyed by the same Redis keys.
+    """
+    def __init__(self, cache, local: LocalCache):
+        self.cache = cache
+        self.local = local
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Returns the JSON bytes stored under `key`, or None if it is missing."""
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        generation = self.local.generation
+        value = await self.cache.get_raw_json(key)
+        if value is not None and self.local.generation == generation:
+            self.local.set(key, value)
+        return value
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Like `get` for several keys, reading all local misses from Redis in one MGET."""
+        values = [self.local.get(key) for key in keys]
+        missing = [index for index, value in enumerate(values) if value is None]
+        if not missing:
+            return values
+        generation = self.local.generation
+        cached_values = await self.cache.get_many_raw_json([keys[index] for index in missing])
+        for index, cached in zip(missing, cached_values):
+            values[index] = cached
+            if cached is not None and self.local.generation == generation:
+                self.local.set(keys[index], cached)
+        return values
+
+
+class CacheInvalidationListener:
+    """
+    Subscribes to the invalidation channel and drops the announced keys from local caches.
+    After a lost connection the caches are cleared, since announcements may have been missed.
+
+    Args:
+        cache: An AsyncRedisCacheService of the database the writers publish on.
+        local_caches: The caches whose entries are keyed by Redis keys.
+    """
+    def __init__(self, cache, local_caches: Iterable[LocalCache]):
+        self.redis_client = cache.redis_client
+        self.local_caches = list(local_caches)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Starts listening on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self):
+        while True:
+            pubsub = self.redis_client.pubsub()
+            try:
+                await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message["type"] == "message":
+                        key = message["data"].decode()
+                        for local in self.local_caches:
+                            local.invalidate(key)
+            except redis.exceptions.RedisError as e:
+                print(f"[REDIS] Cache invalidation subscription interrupted: {e}")
+                for local in self.local_caches:
+                    local.clear()
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
@@ -0,0 +1,107 @@
+"""
+Pointers to the newest known head commit of each PR, which let a push supersede the analysis
+of an older head.
+
+A pointer is a hash of the head SHA, the id of the task analysing it and when GitHub last
+updated the PR (`pull_request.updated_at`). Pointers only move forward: webhook deliveries can
+arrive late or twice, and a metadata lookup can hit a lagging replica, so a head that is not
+newer than the pointer's is ignored.
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+
+import redis
+
+from services.redis_services.cache_keys import pr_head_key
+
+PR_HEAD_TTL_SECONDS = 86400
+
+# Moves the pointer to a head updated at least as recently as the current one; a different SHA
+# with the same update time is ambiguous and keeps the current pointer.
+# ARGV: head SHA, task id, updated at (seconds, 0 if unknown), TTL.
+# Returns whether the pointer moved, and the SHA and task id it pointed at before.
+_ADVANCE_SCRIPT = """
+if redis.call('TYPE', KEYS[1]).ok ~= 'hash' then
+    -- Pointers written before they were ordered hold JSON strings.
+    redis.call('DEL', KEYS[1])
+end
+local previous = redis.call('HMGET', KEYS[1], 'sha', 'task_id', 'updated_at')
+if previous[1] then
+    local previous_at = tonumber(previous[3]) or 0
+    local updated_at = tonumber(ARGV[3])
+    if previous_at > updated_at or (previous_at == updated_at and previous[1] ~= ARGV[1]) then
+        return {0, previous[1], previous[2] or ''}
+    end
+end
+redis.call('HSET', KEYS[1], 'sha', ARGV[1], 'task_id', ARGV[2], 'updated_at', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {1, previous[1] or '', previous[2] or ''}
+"""
+
+
+def github_timestamp(value: Optional[str]) -> float:
+    """Converts an ISO 8601 time of the GitHub API (e.g. `2024-05-01T12:00:00Z`) to seconds; 0 if unknown."""
+    if not isinstance(value, str):
+        return 0.0
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class PrHeadPointers:
+    """
+    Reads the pointers for the workers, whose analyses stop once their head is no longer the newest.
+
+    Args:
+        cache: The RedisCacheService of the result cache database.
+    """
+    def __init__(self, cache):
+        self.redis_client = cache.redis_client
+
+    def head_sha(self, repo_url: str, pr_number: int) -> Optional[str]:
+        """Returns the newest known head SHA of a PR, or None if none is known or Redis fails."""
+        if not self.redis_client:
+            return None
+        try:
+            sha = self.redis_client.hget(pr_head_key(repo_url, pr_number), "sha")
+        except redis.exceptions.RedisError as e:
+            print(f"[REDIS] Could not read the head of {repo_url}#{pr_number}: {e}")
+            return None
+        return sha.decode() if sha else None
+
+
+class AsyncPrHeadPointers:
+    """
+    Moves the pointers for the API when it starts the analysis of a head.
+
+    Args:
+        cache: An AsyncRedisCacheService of the result cache database.
+        ttl_seconds: How long a pointer is kept after it last moved.
+    """
+    def __init__(self, cache, ttl_seconds: int = PR_HEAD_TTL_SECONDS):
+        self.redis_client = cache.redis_client
+        self.ttl_seconds = ttl_seconds
+        self._advance = self.redis_client.register_script(_ADVANCE_SCRIPT)
+
+    async def advance(self, repo_url: str, pr_number: int, head_sha: str, task_id: str,
+                      updated_at: Optional[str]) -> Tuple[bool, Optional[str], Optional[str]]:
+        """
+        Points the PR at `head_sha`, analysed by `task_id`, unless a newer head is known.
+
+        Args:
+            updated_at: When GitHub last updated the PR, as sent by the API; heads of unknown
+                age never replace a head of known age.
+
+        Returns:
+            Whether the pointer moved, and the head SHA and task id it pointed at before (None if none).
+        """
+        try:
+            moved, previous_sha, previous_task_id = await self._advance(
+                keys=[pr_head_key(repo_url, pr_number)],
+                args=[head_sha, task_id, repr(github_timestamp(updated_at)), self.ttl_seconds],
+            )
+        except redis.exceptions.RedisError as e:
+            print(f"[REDIS] Could not move the head of {repo_url}#{pr_number}: {e}")
+            return False, None, None
+        return bool(moved), previous_sha.decode() or None, previous_task_id.decode() or None
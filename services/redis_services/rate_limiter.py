@@ -0,0 +1,192 @@
+"""
+Token buckets in Redis, shared by every worker, for the external APIs the analyses call.
+
+A bucket holds up to `burst` tokens and refills at `rate_per_second`; a call takes `cost`
+tokens (one request, or the prompt tokens of an LLM call). A limit can also be paused until a
+point in time, which is how quota headers and 429 responses are fed back to all workers.
+Both are evaluated in one script against the Redis clock, so workers' clocks do not matter.
+"""
+import asyncio
+import os
+import time
+
+import redis
+
+from services.metrics_services.metrics import RATE_LIMIT_WAITS, RATE_LIMIT_WAIT_SECONDS
+from services.redis_services.cache_keys import rate_limit_key, rate_limit_pause_key
+
+# Returns 0 when the tokens were taken, else the milliseconds to wait before trying again.
+_ACQUIRE_SCRIPT = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local paused_until = tonumber(redis.call('GET', KEYS[2]) or '0')
+if paused_until > now_ms then
+    return paused_until - now_ms
+end
+local burst = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2]) / 1000
+local cost = tonumber(ARGV[3])
+if rate <= 0 then
+    return 0
+end
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now_ms
+tokens = math.min(burst, tokens + math.max(0, now_ms - ts) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = math.ceil((cost - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now_ms)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate) + 1000)
+return wait
+"""
+# Extends the pause of a limit; a shorter pause never cuts a longer one short.
+_PAUSE_SCRIPT = """
+local now = redis.call('TIME')
+local until_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000) + tonumber(ARGV[1])
+if until_ms > tonumber(redis.call('GET', KEYS[1]) or '0') then
+    redis.call('SET', KEYS[1], until_ms, 'PX', ARGV[1])
+end
+return until_ms
+"""
+
+
+class RateLimited(Exception):
+    """
+    Raised when a call would have to wait for a rate limit longer than the caller allows, or
+    when the remote API rejected it for exceeding its limits.
+
+    Args:
+        message: What was limited.
+        retry_after: Seconds after which the call should be retried.
+    """
+    def __init__(self, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    Waits for tokens of shared rate limits. Short waits are slept through; a call that would
+    wait longer than `max_wait_seconds` raises `RateLimited`, so that the task can be requeued
+    instead of holding a worker. Without Redis, or if Redis fails, calls are not limited.
+
+    Args:
+        cache: The RedisCacheService whose connection is used.
+        max_wait_seconds: The longest a single call waits; defaults to RATE_LIMIT_MAX_WAIT_SECONDS.
+    """
+    def __init__(self, cache, max_wait_seconds: float = None):
+        self.redis_client = cache.redis_client
+        self.max_wait_seconds = (
+            max_wait_seconds if max_wait_seconds is not None
+            else float(os.environ.get("RATE_LIMIT_MAX_WAIT_SECONDS", 10))
+        )
+        if self.redis_client:
+            self._acquire = self.redis_client.register_script(_ACQUIRE_SCRIPT)
+            self._pause = self.redis_client.register_script(_PAUSE_SCRIPT)
+
+    def acquire(self, name: str, rate_per_second: float, burst: float, cost: float = 1):
+        """
+        Takes `cost` tokens from the bucket `name`, waiting for them if needed.
+
+        Args:
+            name: The limit, e.g. `llm-requests` or `github:<token hash>`; the part before ':' labels metrics.
+            rate_per_second: Tokens added per second; 0 only honours pauses.
+            burst: The bucket size. Larger costs are capped to it so that they can ever succeed.
+            cost: Tokens the call takes.
+
+        Raises:
+            RateLimited: If the tokens are not available within `max_wait_seconds`.
+        """
+        if not self.redis_client:
+            return
+        label = name.split(":")[0]
+        keys = [rate_limit_key(name), rate_limit_pause_key(name)]
+        waited = 0.0
+        while True:
+            try:
+                wait_ms = self._acquire(keys=keys, args=[burst, rate_per_second, min(cost, burst)])
+            except redis.exceptions.RedisError as e:
+                print(f"[REDIS] Rate limit {name} unavailable, not limiting: {e}")
+                return
+            if not wait_ms:
+                if waited:
+                    RATE_LIMIT_WAITS.labels(limit=label, outcome="waited").inc()
+                    RATE_LIMIT_WAIT_SECONDS.labels(limit=label).observe(waited)
+                return
+            wait = wait_ms / 1000
+            if waited + wait > self.max_wait_seconds:
+                RATE_LIMIT_WAITS.labels(limit=label, outcome="deferred").inc()
+                raise RateLimited(f"Rate limit {name} exhausted for {wait:.1f}s.", retry_after=wait)
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, name: str, seconds: float):
+        """Holds every call of the limit `name`, in all workers, for the next `seconds`."""
+        if not self.redis_client or seconds <= 0:
+            return
+        try:
+            self._pause(keys=[rate_limit_pause_key(name)], args=[int(seconds * 1000)])
+            print(f"[REDIS] Rate limit {name} paused for {seconds:.0f}s.")
+        except redis.exceptions.RedisError as e:
+            print(f"[REDIS] Could not pause rate limit {name}: {e}")
+
+
+class AsyncRateLimiter:
+    """
+    Asyncio counterpart of `RateLimiter` for the API's request path, sharing its buckets and
+    pauses with the workers.
+
+    Args:
+        cache: An AsyncRedisCacheService of the database the workers' limits live in.
+        max_wait_seconds: The longest a single call waits; defaults to RATE_LIMIT_MAX_WAIT_SECONDS.
+    """
+    def __init__(self, cache, max_wait_seconds: float = None):
+        self.redis_client = cache.redis_client
+        self.max_wait_seconds = (
+            max_wait_seconds if max_wait_seconds is not None
+            else float(os.environ.get("RATE_LIMIT_MAX_WAIT_SECONDS", 10))
+        )
+        self._acquire = self.redis_client.register_script(_ACQUIRE_SCRIPT)
+        self._pause = self.redis_client.register_script(_PAUSE_SCRIPT)
+
+    async def acquire(self, name: str, rate_per_second: float, burst: float, cost: float = 1):
+        """
+        Takes `cost` tokens from the bucket `name`, waiting for them if needed (see `RateLimiter.acquire`).
+
+        Raises:
+            RateLimited: If the tokens are not available within `max_wait_seconds`.
+        """
+        label = name.split(":")[0]
+        keys = [rate_limit_key(name), rate_limit_pause_key(name)]
+        waited = 0.0
+        while True:
+            try:
+                wait_ms = await self._acquire(keys=keys, args=[burst, rate_per_second, min(cost, burst)])
+            except redis.exceptions.RedisError as e:
+                print(f"[REDIS] Rate limit {name} unavailable, not limiting: {e}")
+                return
+            if not wait_ms:
+                if waited:
+                    RATE_LIMIT_WAITS.labels(limit=label, outcome="waited").inc()
+                    RATE_LIMIT_WAIT_SECONDS.labels(limit=label).observe(waited)
+                return
+            wait = wait_ms / 1000
+            if waited + wait > self.max_wait_seconds:
+                RATE_LIMIT_WAITS.labels(limit=label, outcome="deferred").inc()
+                raise RateLimited(f"Rate limit {name} exhausted for {wait:.1f}s.", retry_after=wait)
+            await asyncio.sleep(wait)
+            waited += wait
+
+    async def pause(self, name: str, seconds: float):
+        """Holds every call of the limit `name`, in the API and all workers, for the next `seconds`."""
+        if seconds <= 0:
+            return
+        try:
+            await self._pause(keys=[rate_limit_pause_key(name)], args=[int(seconds * 1000)])
+            print(f"[REDIS] Rate limit {name} paused for {seconds:.0f}s.")
+        except redis.exceptions.RedisError as e:
+            print(f"[REDIS] Could not pause rate limit {name}: {e}")
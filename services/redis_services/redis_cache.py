@@ -1,52 +1,117 @@
-from typing import Optional, Dict, Any
-import json
+from typing import Optional, Dict, Any, List
+import os
+import threading
 import redis
 
+from services.redis_services.cache_keys import CACHE_INVALIDATION_CHANNEL
+from services.redis_services.codecs import Codec, default_codec
 
-class RedisCacheService:
+REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
+
+# One connection pool per (host, port, db), shared by every service instance of the process.
+# redis-py resets a pool's connections when it is used from a forked child.
+_pools: Dict[tuple[str, int, int], redis.ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host: str = REDIS_HOST, port: int = REDIS_PORT, db: int = 1) -> Optional[redis.ConnectionPool]:
     """
-    Handles getting and setting data in a Redis cache.
+    Returns the process-wide connection pool for a Redis database. The pool is created and
+    its server pinged on first use only; if Redis is unreachable None is returned and the
+    next call tries again.
     """
-    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 1):
-        """
-        Initializes the Redis client.
-        """
+    key = (host, port, db)
+    with _pools_lock:
+        if key in _pools:
+            return _pools[key]
+        pool = redis.ConnectionPool(host=host, port=port, db=db)
         try:
-            self.redis_client = redis.Redis(
-                host=host,
-                port=port,
-                db=db,
-                decode_responses=True  # Decode responses to UTF-8
-            )
-            # Test the connection
-            self.redis_client.ping()
-            print("Successfully connected to Redis, on database number {db}.".format(db=db))
+            redis.Redis(connection_pool=pool).ping()
         except redis.exceptions.ConnectionError as e:
             print(f"Error connecting to Redis, on database number {db}: {e}")
-            self.redis_client = None
+            pool.disconnect()
+            return None
+        print("Successfully connected to Redis, on database number {db}.".format(db=db))
+        _pools[key] = pool
+        return pool
 
 
+class RedisCacheService:
+    """
+    Handles getting and setting data in a Redis cache.
+    """
+    def __init__(self, host: str = REDIS_HOST, port: int = REDIS_PORT, db: int = 1, codec: Codec = None):
+        """
+        Initializes the Redis client on the shared connection pool of the database.
+
+        Args:
+            codec: Encoding of stored values; defaults to the one configured by REDIS_CODEC.
+        """
+        pool = get_pool(host, port, db)
+        self.redis_client = redis.Redis(connection_pool=pool) if pool else None
+        self.codec = codec or default_codec()
+
     def get(self, key: str) -> Optional[Dict[str, Any]]:
         """
-        Gets a value from the cache and decodes it from JSON.
+        Gets a value from the cache and decodes it.
         """
         if not self.redis_client:
             return None
-        try:
-            cached_value = self.redis_client.get(key)
-            if not cached_value:
-                return None
-            # The value in Redis is a JSON string, so we parse it back to a dict
-            return json.loads(cached_value)
-        except (json.JSONDecodeError, KeyError, TypeError):
-            print(f"[REDIS] Cache data for key '{key}' is corrupt or malformed.")
-            return None
+        return self._decode(key, self.redis_client.get(key))
 
     def set(self, key: str, value: Dict[str, Any], expiry_seconds: int = 3600):
         """
-        Encodes a value to JSON and sets it in the cache with an expiry.
+        Encodes a value and sets it in the cache with an expiry.
+        """
+        if not self.redis_client:
+            return
+        self.redis_client.set(key, self.codec.encode(value), ex=expiry_seconds)
+
+    def set_raw_json(self, key: str, payload: bytes, expiry_seconds: int = 3600):
+        """
+        Sets an already JSON-serialized value, so that readers can serve the bytes as they are.
         """
         if not self.redis_client:
             return
-        # Convert the Python dict to a JSON string before storing
-        self.redis_client.set(key, json.dumps(value), ex=expiry_seconds)
\ No newline at end of file
+        self.redis_client.set(key, self.codec.encode_json(payload), ex=expiry_seconds)
+
+    def get_many(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Gets several values in a single MGET round trip. Missing or corrupt entries are None.
+        """
+        if not self.redis_client or not keys:
+            return [None] * len(keys)
+        return [self._decode(key, value) for key, value in zip(keys, self.redis_client.mget(keys))]
+
+    def set_many(self, items: Dict[str, Dict[str, Any]], expiry_seconds: int = 3600):
+        """
+        Sets several values with the same expiry in a single pipelined round trip.
+        """
+        if not self.redis_client or not items:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(key, self.codec.encode(value), ex=expiry_seconds)
+        pipe.execute()
+
+    def announce_change(self, key: str):
+        """
+        Tells API processes to drop their in-process copies of a key that was overwritten.
+        Best effort: their copies expire on their own if the announcement is lost.
+        """
+        if not self.redis_client:
+            return
+        try:
+            self.redis_client.publish(CACHE_INVALIDATION_CHANNEL, key)
+        except redis.exceptions.RedisError as e:
+            print(f"[REDIS] Could not announce the change of '{key}': {e}")
+
+    def _decode(self, key: str, cached_value: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        if not cached_value:
+            return None
+        try:
+            return self.codec.decode(cached_value)
+        except (ValueError, KeyError, TypeError):
+            print(f"[REDIS] Cache data for key '{key}' is corrupt or malformed.")
+            return None
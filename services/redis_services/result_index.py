@@ -0,0 +1,262 @@
+"""
+Secondary indexes over stored analysis results, for querying a repository without decoding
+every result blob.
+
+When a worker stores a result, `ResultIndexWriter` decomposes it into per-repository
+structures in the result cache database:
+
+- `repo:{repo}:analyses`: a sorted set of analysis summaries, scored by when they finished;
+- `repo:{repo}:issues` and `repo:{repo}:issues:type:{type}`: sorted sets of the reported issues;
+- `repo:{repo}:prs` and `repo:{repo}:pr:{pr}:latest`: the analysed PRs by their latest analysis,
+  and a pointer to the head SHA and summary of that analysis;
+- `repo:{repo}:issues-by-type` and `repo:{repo}:issues-by-file`: issue counts over the latest
+  analysis of each PR, kept exact by replacing a PR's previous counts in one script.
+
+Entries are kept for ANALYSIS_INDEX_TTL_SECONDS. Sorted sets are trimmed when written to and
+readers never look further back, so a page costs O(log N + page size) regardless of its offset
+(see `AsyncResultIndex.page`).
+"""
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+import redis
+
+from services.redis_services.cache_keys import (
+    pr_issue_counts_key, pr_latest_analysis_key, repo_analyses_key, repo_issue_counts_key, repo_issues_key,
+    repo_prs_key, repo_slug,
+)
+
+# How far back the indexes reach; 0 disables indexing.
+ANALYSIS_INDEX_TTL_SECONDS = int(os.environ.get("ANALYSIS_INDEX_TTL_SECONDS", 7 * 86400))
+# PRs whose latest analysis left the index window that one write removes from the counters.
+_STALE_PRS_PER_WRITE = 100
+
+# KEYS: the PR's pointer, its counts by type and by file, the repository's counts by type and by
+# file, and the repository's PRs.
+_SUBTRACT_PR_COUNTS = """
+local function subtract_pr_counts()
+    local types = redis.call('HGETALL', KEYS[2])
+    for i = 1, #types, 2 do
+        if redis.call('HINCRBY', KEYS[4], types[i], -tonumber(types[i + 1])) <= 0 then
+            redis.call('HDEL', KEYS[4], types[i])
+        end
+    end
+    local files = redis.call('HGETALL', KEYS[3])
+    for i = 1, #files, 2 do
+        redis.call('ZINCRBY', KEYS[5], -tonumber(files[i + 1]), files[i])
+    end
+    redis.call('ZREMRANGEBYSCORE', KEYS[5], '-inf', 0)
+    redis.call('DEL', KEYS[2], KEYS[3])
+end
+"""
+
+# Moves a PR's pointer to a new analysis and replaces its share of the repository's counters,
+# unless a later analysis of the PR was indexed already.
+# ARGV: PR number, analysed at, TTL, head SHA, summary, number of types, then (type, count)
+# pairs followed by (file, count) pairs.
+_RECORD_PR_SCRIPT = _SUBTRACT_PR_COUNTS + """
+local previous = tonumber(redis.call('HGET', KEYS[1], 'analyzed_at') or '0')
+if previous > tonumber(ARGV[2]) then
+    return 0
+end
+subtract_pr_counts()
+local types_end = 6 + 2 * tonumber(ARGV[6])
+for i = 7, types_end, 2 do
+    redis.call('HINCRBY', KEYS[4], ARGV[i], ARGV[i + 1])
+    redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+end
+for i = types_end + 1, #ARGV, 2 do
+    redis.call('ZINCRBY', KEYS[5], ARGV[i + 1], ARGV[i])
+    redis.call('HSET', KEYS[3], ARGV[i], ARGV[i + 1])
+end
+redis.call('HSET', KEYS[1], 'head_sha', ARGV[4], 'analyzed_at', ARGV[2], 'summary', ARGV[5])
+redis.call('ZADD', KEYS[6], ARGV[2], ARGV[1])
+for i = 1, 6 do
+    redis.call('EXPIRE', KEYS[i], ARGV[3])
+end
+return 1
+"""
+
+# Removes a PR whose latest analysis is older than the cutoff from the counters.
+# ARGV: PR number, cutoff.
+_DROP_PR_SCRIPT = _SUBTRACT_PR_COUNTS + """
+local analyzed_at = redis.call('HGET', KEYS[1], 'analyzed_at')
+if analyzed_at and tonumber(analyzed_at) >= tonumber(ARGV[2]) then
+    return 0
+end
+subtract_pr_counts()
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[6], ARGV[1])
+return 1
+"""
+
+# Newest-first page of a sorted set between `since` and a pinned `until`, addressed by rank:
+# entries added after `until` do not shift the pages, and no entries are skipped over.
+# ARGV: until, since, offset, limit.
+_PAGE_SCRIPT = """
+local first = redis.call('ZCOUNT', KEYS[1], '(' .. ARGV[1], '+inf') + tonumber(ARGV[3])
+local last = math.min(first + tonumber(ARGV[4]), redis.call('ZCOUNT', KEYS[1], ARGV[2], '+inf')) - 1
+if last < first then
+    return {}
+end
+return redis.call('ZREVRANGE', KEYS[1], first, last, 'WITHSCORES')
+"""
+
+
+def _pr_keys(repo: str, pr_number: int) -> List[str]:
+    return [
+        pr_latest_analysis_key(repo, pr_number),
+        pr_issue_counts_key(repo, pr_number, "type"),
+        pr_issue_counts_key(repo, pr_number, "file"),
+        repo_issue_counts_key(repo, "type"),
+        repo_issue_counts_key(repo, "file"),
+        repo_prs_key(repo),
+    ]
+
+
+class ResultIndexWriter:
+    """
+    Indexes the results stored by the pipeline. Indexing is best effort: a Redis error is
+    printed and never fails the analysis, since the result itself is already stored.
+
+    Args:
+        cache: The RedisCacheService of the result cache database.
+        ttl_seconds: How long entries stay in the indexes (ANALYSIS_INDEX_TTL_SECONDS).
+    """
+    def __init__(self, cache, ttl_seconds: int = None):
+        self.redis_client = cache.redis_client
+        self.ttl_seconds = ANALYSIS_INDEX_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        if self.redis_client:
+            self._record_pr = self.redis_client.register_script(_RECORD_PR_SCRIPT)
+            self._drop_pr = self.redis_client.register_script(_DROP_PR_SCRIPT)
+
+    def record(self, repo_url: str, pr_number: int, head_sha: str, result: Dict[str, Any], analyzed_at: float = None):
+        """
+        Indexes a result (a dumped `Result`) in one round trip, plus one more when PRs left the
+        index window and are removed from the counters.
+        """
+        if not self.redis_client or self.ttl_seconds <= 0:
+            return
+        repo = repo_slug(repo_url)
+        analyzed_at = analyzed_at or time.time()
+        cutoff = analyzed_at - self.ttl_seconds
+
+        issues_by_type: Dict[str, List[bytes]] = {}
+        issues_by_file: Dict[str, int] = {}
+        for file in result["files"]:
+            for issue in file["issues"]:
+                issue_type = issue["type"].strip().lower()
+                issues_by_type.setdefault(issue_type, []).append(orjson.dumps({
+                    "pr_number": pr_number, "head_sha": head_sha, "file": file["name"], "line": issue["line"],
+                    "type": issue_type, "description": issue["description"], "suggestion": issue["suggestion"],
+                }))
+                issues_by_file[file["name"]] = issues_by_file.get(file["name"], 0) + 1
+        type_counts = {issue_type: len(members) for issue_type, members in issues_by_type.items()}
+        summary = orjson.dumps({
+            "pr_number": pr_number, "head_sha": head_sha, **result["summary"], "issue_types": type_counts,
+        })
+
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._add(pipe, repo_analyses_key(repo), {summary: analyzed_at}, cutoff)
+            if issues_by_type:
+                self._add(pipe, repo_issues_key(repo), {
+                    member: analyzed_at for members in issues_by_type.values() for member in members
+                }, cutoff)
+                for issue_type, members in issues_by_type.items():
+                    self._add(pipe, repo_issues_key(repo, issue_type), dict.fromkeys(members, analyzed_at), cutoff)
+            args = [pr_number, analyzed_at, self.ttl_seconds, head_sha, summary, len(type_counts)]
+            for counts in (type_counts, issues_by_file):
+                for name, count in counts.items():
+                    args += [name, count]
+            self._record_pr(keys=_pr_keys(repo, pr_number), args=args, client=pipe)
+            pipe.zrangebyscore(repo_prs_key(repo), "-inf", f"({cutoff}", start=0, num=_STALE_PRS_PER_WRITE)
+            stale_prs = pipe.execute()[-1]
+
+            if stale_prs:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for stale_pr in stale_prs:
+                    self._drop_pr(keys=_pr_keys(repo, int(stale_pr)), args=[int(stale_pr), cutoff], client=pipe)
+                pipe.execute()
+        except redis.exceptions.RedisError as e:
+            print(f"[REDIS] Could not index the analysis of {repo}#{pr_number}: {e}")
+
+    def _add(self, pipe, key: str, members: Dict[bytes, float], cutoff: float):
+        pipe.zadd(key, members)
+        pipe.zremrangebyscore(key, "-inf", f"({cutoff}")
+        pipe.expire(key, self.ttl_seconds)
+
+
+class AsyncResultIndex:
+    """
+    Reads the indexes for the API. Pages run newest first over the window between `since` and
+    `until`; passing back the `until` of the first page keeps later pages stable while new
+    analyses are indexed.
+
+    Args:
+        cache: An AsyncRedisCacheService of the result cache database.
+        ttl_seconds: How far back entries are indexed (ANALYSIS_INDEX_TTL_SECONDS).
+    """
+    def __init__(self, cache, ttl_seconds: int = None):
+        self.redis_client = cache.redis_client
+        self.ttl_seconds = ANALYSIS_INDEX_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._page = self.redis_client.register_script(_PAGE_SCRIPT)
+
+    def window(self, since: Optional[float], until: Optional[float]) -> Tuple[float, float]:
+        """Resolves a requested time window to the part of it the indexes still cover."""
+        now = time.time()
+        oldest = now - self.ttl_seconds
+        return max(since or oldest, oldest), min(until or now, now)
+
+    async def page(self, key: str, since: float, until: float, offset: int, limit: int) -> List[Tuple[bytes, float]]:
+        """Returns up to `limit` (member, score) pairs of a sorted set, newest first, after skipping `offset`."""
+        entries = await self._page(keys=[key], args=[repr(until), repr(since), offset, limit])
+        return [(entries[i], float(entries[i + 1])) for i in range(0, len(entries), 2)]
+
+    async def analyses(self, repo: str, since: float, until: float, offset: int, limit: int) -> List[Dict[str, Any]]:
+        """Returns a page of a repository's analyses, each a summary with its `analyzed_at` time."""
+        page = await self.page(repo_analyses_key(repo), since, until, offset, limit)
+        return [{**orjson.loads(member), "analyzed_at": analyzed_at} for member, analyzed_at in page]
+
+    async def latest_analyses(self, repo: str, since: float, until: float, offset: int,
+                              limit: int) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Returns a page of the latest analysis of each PR, ordered by when it finished, and the
+        number of index entries it covers, from which the next page starts. PRs that left the
+        window between the two reads are left out, so a page can be short without being the last.
+        """
+        page = await self.page(repo_prs_key(repo), since, until, offset, limit)
+        if not page:
+            return [], 0
+        pipe = self.redis_client.pipeline(transaction=False)
+        for pr_number, _ in page:
+            pipe.hmget(pr_latest_analysis_key(repo, int(pr_number)), "summary", "analyzed_at")
+        analyses = []
+        for summary, analyzed_at in await pipe.execute():
+            # The PR may have left the window between the two reads.
+            if summary is not None:
+                analyses.append({**orjson.loads(summary), "analyzed_at": float(analyzed_at)})
+        return analyses, len(page)
+
+    async def issues(self, repo: str, issue_type: Optional[str], since: float, until: float, offset: int,
+                     limit: int) -> List[Dict[str, Any]]:
+        """Returns a page of a repository's reported issues, of one type if given."""
+        key = repo_issues_key(repo, issue_type.strip().lower() if issue_type else None)
+        page = await self.page(key, since, until, offset, limit)
+        return [{**orjson.loads(member), "analyzed_at": analyzed_at} for member, analyzed_at in page]
+
+    async def issue_counts(self, repo: str, top_files: int) -> Tuple[Dict[str, int], List[Tuple[str, int]]]:
+        """
+        Returns the issue counts over the latest analysis of each PR: by type, and for the
+        `top_files` files with the most issues.
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hgetall(repo_issue_counts_key(repo, "type"))
+        pipe.zrevrange(repo_issue_counts_key(repo, "file"), 0, top_files - 1, withscores=True)
+        by_type, by_file = await pipe.execute()
+        return (
+            {issue_type.decode(): int(count) for issue_type, count in by_type.items()},
+            [(name.decode(), int(count)) for name, count in by_file],
+        )
@@ -0,0 +1,128 @@
+"""
+Task progress events over Redis pub/sub.
+
+Workers publish every event of a task to the channel `task-events:{task_id}` and append it
+to the list of the same name, so that subscribers joining late replay what they missed.
+Each message is `<seq>:<json>`; the sequence number is assigned atomically with the append,
+which lets subscribers drop events they already received through the replay.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import orjson
+import redis
+
+from services.redis_services.cache_keys import task_events_key
+
+# Events after which a task publishes nothing more.
+TERMINAL_EVENTS = frozenset({"result", "error", "superseded"})
+
+# Append, publish and expire as one step, numbering the event by its position in the log.
+_PUBLISH_SCRIPT = """
+local seq = redis.call('LLEN', KEYS[1]) + 1
+local message = seq .. ':' .. ARGV[1]
+redis.call('RPUSH', KEYS[1], message)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('PUBLISH', KEYS[1], message)
+return seq
+"""
+
+TaskEvent = Tuple[int, str, Any]
+
+
+def parse_event(message: bytes) -> TaskEvent:
+    """Splits a stored or published message into (sequence number, event name, data)."""
+    seq, _, payload = message.partition(b":")
+    body = orjson.loads(payload)
+    return int(seq), body["event"], body["data"]
+
+
+class TaskEventPublisher:
+    """
+    Publishes the events of analysis tasks. Events are best effort: a Redis error is
+    printed and never fails the analysis.
+
+    Args:
+        cache: The RedisCacheService whose connection is used.
+        ttl_seconds: How long the replay log of a task is kept after its last event.
+    """
+    def __init__(self, cache, ttl_seconds: int = 3600):
+        self.redis_client = cache.redis_client
+        self.ttl_seconds = ttl_seconds
+        if self.redis_client:
+            self._publish = self.redis_client.register_script(_PUBLISH_SCRIPT)
+
+    def publish(self, task_id: str, event: str, data: Any):
+        if not self.redis_client:
+            return
+        try:
+            payload = orjson.dumps({"event": event, "data": data})
+            self._publish(keys=[task_events_key(task_id)], args=[payload, self.ttl_seconds])
+        except redis.exceptions.RedisError as e:
+            print(f"[REDIS] Could not publish {event} event of task {task_id}: {e}")
+
+
+class AsyncTaskEventHub:
+    """
+    Delivers task events to the API's stream handlers through a single pub/sub connection,
+    shared by every listener of the process, instead of one connection per client.
+    """
+    def __init__(self, cache):
+        self.redis_client = cache.redis_client
+        self._pubsub = None
+        self._listeners: Dict[str, Set[asyncio.Queue]] = {}
+        self._reader: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def replay(self, task_id: str) -> List[TaskEvent]:
+        """Returns the events the task published so far."""
+        return [parse_event(message) for message in await self.redis_client.lrange(task_events_key(task_id), 0, -1)]
+
+    @asynccontextmanager
+    async def subscription(self, task_id: str) -> AsyncIterator[asyncio.Queue]:
+        """Yields a queue receiving the task's events published while the context is open."""
+        channel = task_events_key(task_id)
+        queue: asyncio.Queue = asyncio.Queue()
+        async with self._lock:
+            if self._pubsub is None:
+                self._pubsub = self.redis_client.pubsub()
+            if channel not in self._listeners:
+                self._listeners[channel] = set()
+                await self._pubsub.subscribe(channel)
+            self._listeners[channel].add(queue)
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+        try:
+            yield queue
+        finally:
+            async with self._lock:
+                listeners = self._listeners.get(channel)
+                if listeners is not None:
+                    listeners.discard(queue)
+                    if not listeners:
+                        del self._listeners[channel]
+                        await self._pubsub.unsubscribe(channel)
+
+    async def _read(self):
+        """Routes published messages to the queues of their channel while anyone listens."""
+        while self._listeners:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except redis.exceptions.ConnectionError as e:
+                print(f"[REDIS] Task event subscription interrupted: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if not message or message["type"] != "message":
+                continue
+            channel = message["channel"].decode()
+            for queue in self._listeners.get(channel, ()):
+                queue.put_nowait(parse_event(message["data"]))
+
+    async def close(self):
+        """Stops the reader and releases the pub/sub connection, e.g. on application shutdown."""
+        if self._reader is not None:
+            self._reader.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
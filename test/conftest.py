@@ -0,0 +1,64 @@
+"""
+Shared fakes for the tests: the local GitHub API and the in-memory Redis stand-in of the
+benchmarks, started once per session, and fakeredis servers for code that runs Lua scripts.
+
+The services read their endpoints from the environment when first imported, so they are
+configured here, before any test module imports them.
+"""
+import os
+import types
+
+import fakeredis
+import pytest
+
+from benchmarks.fake_github import FakeGitHub
+from benchmarks.fake_redis import FakeRedis
+
+_github = FakeGitHub().start()
+_redis = FakeRedis().start()
+os.environ.update({
+    "GITHUB_API_URL": _github.url,
+    "REDIS_HOST": "127.0.0.1",
+    "REDIS_PORT": str(_redis.port),
+    "CELERY_BROKER_URL": f"redis://127.0.0.1:{_redis.port}/0",
+    "CELERY_RESULT_BACKEND": f"redis://127.0.0.1:{_redis.port}/1",
+})
+
+REPO_URL = "https://github.com/test/repo"
+
+
+@pytest.fixture
+def github() -> FakeGitHub:
+    """The fake GitHub API, with its request and connection counts reset."""
+    _github.stats.update({name: 0 for name in _github.stats})
+    return _github
+
+
+@pytest.fixture(scope="session")
+def api_client():
+    """
+    A client of the API app, shared by all tests: the async Redis pools are created once per
+    process, on the event loop of the first client.
+    """
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def redis_server() -> fakeredis.FakeServer:
+    """An empty fakeredis server; `sync_cache` and `async_cache` connect services to it."""
+    return fakeredis.FakeServer()
+
+
+def sync_cache(server: fakeredis.FakeServer) -> types.SimpleNamespace:
+    """Stands in for a RedisCacheService: the services only use its `redis_client`."""
+    return types.SimpleNamespace(redis_client=fakeredis.FakeRedis(server=server))
+
+
+def async_cache(server: fakeredis.FakeServer) -> types.SimpleNamespace:
+    """Stands in for an AsyncRedisCacheService."""
+    return types.SimpleNamespace(redis_client=fakeredis.FakeAsyncRedis(server=server))
@@ -0,0 +1,16 @@
+"""
+Imports the API in a fresh interpreter and checks that it leaves the AI stack unloaded.
+"""
+import pathlib
+
+from benchmarks.bench_api_startup import measure
+
+
+def test_api_does_not_load_worker_only_modules(monkeypatch):
+    # The probe imports `app.main` from the working directory.
+    monkeypatch.chdir(pathlib.Path(__file__).resolve().parent.parent)
+
+    result = measure()
+
+    assert result["forbidden_modules_loaded"] == []
+    assert result["modules_loaded"] > 0
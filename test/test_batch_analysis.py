@@ -0,0 +1,57 @@
+"""
+Posts batches to /analyze-prs, with the local fakes behind the API and the Celery group replaced
+by a recorder.
+"""
+import types
+
+import orjson
+from conftest import REPO_URL
+
+from app import main
+from services.redis_services.cache_keys import analysis_key
+from services.redis_services.redis_cache import RedisCacheService
+
+# Keys are out of the models' order, so a result that was parsed and serialized again differs.
+STORED_RESULT = orjson.dumps({
+    "summary": {"critical_issues": 1, "total_files": 1, "total_issues": 1},
+    "files": [{"issues": [
+        {"line": 3, "type": "bug", "suggestion": "Use <=.", "description": "Off by one."},
+    ], "name": "a.py"}],
+})
+
+
+def test_cached_results_are_sent_as_stored(api_client, github, monkeypatch):
+    groups = []
+    monkeypatch.setattr(main, "group", lambda signatures: types.SimpleNamespace(
+        apply_async=lambda: groups.append(signatures) or types.SimpleNamespace(id="group-1")
+    ))
+    RedisCacheService(db=2).set_raw_json(analysis_key(REPO_URL, 301, github.head_sha(301)), STORED_RESULT)
+
+    response = api_client.post("/analyze-prs", json=[
+        {"repo_url": REPO_URL, "pr_number": 301},
+        {"repo_url": REPO_URL, "pr_number": 302},
+    ])
+
+    assert response.status_code == 200
+    assert b'"result":' + STORED_RESULT in response.content
+    body = response.json()
+    cached, started = body["items"]
+    assert cached["status"] == "CACHED"
+    assert cached["head_sha"] == github.head_sha(301)
+    assert cached["result"] == orjson.loads(STORED_RESULT)
+    assert started["status"] == "TASK_STARTED"
+    assert started["result"] is None
+    assert body["group_id"] == "group-1"
+    assert len(groups) == 1 and len(groups[0]) == 1
+    main.BatchAnalysisResponse.model_validate(body)
+
+
+def test_fully_cached_batch_starts_nothing(api_client, github, monkeypatch):
+    monkeypatch.setattr(main, "group", None)
+    RedisCacheService(db=2).set_raw_json(analysis_key(REPO_URL, 303, github.head_sha(303)), STORED_RESULT)
+
+    body = api_client.post("/analyze-prs", json=[{"repo_url": REPO_URL, "pr_number": 303}]).json()
+
+    assert body["group_id"] is None
+    assert [item["status"] for item in body["items"]] == ["CACHED"]
+    assert body["items"][0]["result"] == orjson.loads(STORED_RESULT)
@@ -0,0 +1,69 @@
+"""
+Encodes values for Redis with each codec, and reads every stored format back.
+"""
+import json
+
+import orjson
+import pytest
+
+from services.redis_services.codecs import VERSION, Codec, CodecError
+
+VALUE = {"summary": {"total_files": 2, "critical_issues": 1}, "files": [{"name": "app/main.py", "issues": []}]}
+LARGE_VALUE = {"files": [{"name": f"src/file_{index}.py", "issues": ["x" * 100]} for index in range(200)]}
+
+
+@pytest.mark.parametrize("name, codec_id", [("orjson", b"j"), ("msgpack", b"m")])
+def test_values_round_trip_behind_the_version_byte(name, codec_id):
+    encoded = Codec(name).encode(VALUE)
+
+    assert encoded[:3] == VERSION + codec_id + b"-"
+    assert Codec(name).decode(encoded) == VALUE
+
+
+@pytest.mark.parametrize("name", ["orjson", "msgpack"])
+def test_any_codec_reads_values_written_by_another(name):
+    encoded = Codec(name).encode(VALUE)
+
+    assert Codec("orjson").decode(encoded) == Codec("legacy").decode(encoded) == VALUE
+    assert orjson.loads(Codec("orjson").decode_json(encoded)) == VALUE
+
+
+@pytest.mark.parametrize("name", ["orjson", "msgpack"])
+def test_payloads_are_compressed_from_the_threshold(name):
+    codec = Codec(name, compression_threshold=1024)
+
+    small, large = codec.encode(VALUE), codec.encode(LARGE_VALUE)
+
+    assert small[2:3] == b"-"
+    assert large[2:3] == b"z"
+    assert len(large) < len(orjson.dumps(LARGE_VALUE)) // 4
+    assert codec.decode(large) == LARGE_VALUE
+    assert orjson.loads(codec.decode_json(large)) == LARGE_VALUE
+
+
+def test_zero_threshold_disables_compression():
+    assert Codec("orjson", compression_threshold=0).encode(LARGE_VALUE)[2:3] == b"-"
+
+
+def test_serialized_json_is_framed_without_reencoding():
+    payload = orjson.dumps(VALUE)
+    encoded = Codec("orjson").encode_json(payload)
+
+    assert encoded == VERSION + b"j-" + payload
+    assert Codec("orjson").decode_json(encoded) == payload
+    assert Codec("legacy").encode_json(payload) == payload
+
+
+def test_plain_json_written_before_the_version_byte_is_read():
+    legacy = json.dumps(VALUE).encode()
+
+    for name in ("orjson", "msgpack", "legacy"):
+        assert Codec(name).decode(legacy) == VALUE
+        assert Codec(name).decode_json(legacy) == legacy
+    assert Codec("legacy").encode(VALUE) == legacy
+
+
+@pytest.mark.parametrize("data", [VERSION + b"x-{}", VERSION + b"jq{}", VERSION + b"jznot zstd"])
+def test_unknown_or_corrupt_frames_raise_codec_errors(data):
+    with pytest.raises(CodecError):
+        Codec("orjson").decode(data)
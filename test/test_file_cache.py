@@ -0,0 +1,65 @@
+"""
+Reuses cached file analyses across pushes, sending only the changed files to the crew.
+"""
+import uuid
+
+from benchmarks.fake_llm import _FILE_LINE, FakeCrew, FakeOutput
+from conftest import REPO_URL
+
+from app.analysis_pipeline import AnalysisPipeline
+
+FILES = ("app/models.py", "app/views.py", "app/urls.py")
+
+
+class RecordingCrew(FakeCrew):
+    """Records the names of the files each call reviews."""
+    def __init__(self):
+        super().__init__()
+        self.files = []
+
+    def kickoff(self, inputs: dict) -> FakeOutput:
+        self.files.extend(match.group("name") for match in _FILE_LINE.finditer(inputs["code"]))
+        return super().kickoff(inputs)
+
+
+def _patch(head_sha: str, contents: dict) -> str:
+    diffs = "".join(
+        f"diff --git a/{name} b/{name}\n--- a/{name}\n+++ b/{name}\n"
+        f"@@ -1,2 +1,2 @@\n def handler():\n-    return None\n+    return '{contents[name]}'\n"
+        for name in FILES
+    )
+    return f"From {head_sha} Mon Sep 17 00:00:00 2001\nSubject: [PATCH] Change\n\n---\n{diffs}-- \n2.43.0\n\n"
+
+
+def _push(github, monkeypatch, pr_number: int, contents: dict) -> tuple:
+    monkeypatch.setattr(github, "patch_factory", lambda number: _patch(uuid.uuid4().hex + "0" * 8, contents))
+    crew = RecordingCrew()
+    pipeline = AnalysisPipeline(github_token="test-token", crew=crew)
+    result = pipeline.run(REPO_URL, pr_number, head_sha=github.head_sha(pr_number))
+    return result, pipeline.run_meta, crew
+
+
+def test_push_changing_one_file_only_sends_that_file(github, monkeypatch):
+    # Fresh contents, so the per-file cache of earlier runs does not answer for the crew.
+    contents = {name: uuid.uuid4().hex for name in FILES}
+    first, first_meta, first_crew = _push(github, monkeypatch, 701, contents)
+
+    second, second_meta, second_crew = _push(github, monkeypatch, 702, {**contents, "app/views.py": uuid.uuid4().hex})
+
+    assert sorted(first_crew.files) == sorted(FILES)
+    assert second_crew.files == ["app/views.py"]
+    assert (first_meta["file_cache_hits"], first_meta["file_cache_misses"]) == (0, 3)
+    assert (second_meta["file_cache_hits"], second_meta["file_cache_misses"]) == (2, 1)
+    assert [file["name"] for file in second["files"]] == [file["name"] for file in first["files"]] == list(FILES)
+    assert second["files"] == first["files"]
+
+
+def test_cache_hits_count_before_packing_but_are_not_sent(github, monkeypatch):
+    contents = {name: uuid.uuid4().hex for name in FILES}
+    _, first_meta, _ = _push(github, monkeypatch, 703, contents)
+
+    _, second_meta, _ = _push(github, monkeypatch, 704, {**contents, "app/views.py": uuid.uuid4().hex})
+
+    # Every content token has the same length, so the unpacked prompts are as large as before.
+    assert second_meta["prompt_tokens_before"] == first_meta["prompt_tokens_before"]
+    assert 0 < second_meta["prompt_tokens_after"] < first_meta["prompt_tokens_after"]
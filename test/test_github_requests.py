@@ -0,0 +1,45 @@
+"""
+Counts the requests an analysis makes to GitHub, against the local fake API.
+"""
+from benchmarks.fake_llm import FakeCrew
+from conftest import REPO_URL
+
+from app.analysis_pipeline import AnalysisPipeline
+from services.github_services.get_pr import GitHubService
+from services.redis_services.redis_cache import RedisCacheService
+
+
+def test_head_sha_lookup_is_one_request(github):
+    service = GitHubService(github_token="test-token", etag_store=RedisCacheService(db=2))
+
+    assert service.get_pr_head_sha(REPO_URL, 101) == github.head_sha(101)
+    assert github.stats == {**github.stats, "metadata": 1, "not_modified": 0, "patch": 0}
+
+
+def test_repeated_head_sha_lookup_is_served_from_the_etag_store(github):
+    # Separate services share the validators through the store, like the API and the workers.
+    GitHubService(github_token="test-token", etag_store=RedisCacheService(db=2)).get_pr_head_sha(REPO_URL, 102)
+    service = GitHubService(github_token="test-token", etag_store=RedisCacheService(db=2))
+
+    assert service.get_pr_head_sha(REPO_URL, 102) == github.head_sha(102)
+    assert github.stats["metadata"] == 1
+    assert github.stats["not_modified"] == 1
+
+
+def test_analysis_with_a_known_head_downloads_only_the_patch(github):
+    pipeline = AnalysisPipeline(github_token="test-token", crew=FakeCrew())
+
+    result = pipeline.run(REPO_URL, 103, head_sha=github.head_sha(103))
+
+    assert result["summary"]["total_files"] == 5
+    assert github.stats["patch"] == 1
+    assert github.stats["metadata"] + github.stats["not_modified"] == 0
+
+
+def test_analysis_resolves_the_head_and_downloads_the_patch_once(github):
+    pipeline = AnalysisPipeline(github_token="test-token", crew=FakeCrew())
+
+    pipeline.run(REPO_URL, 104)
+
+    assert github.stats["metadata"] == 1
+    assert github.stats["patch"] == 1
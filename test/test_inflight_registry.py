@@ -0,0 +1,100 @@
+"""
+Claims, takes over and releases in-flight analyses on a fakeredis server: the API claims
+entries asynchronously, workers refresh and release them.
+"""
+import asyncio
+
+from conftest import async_cache, sync_cache
+from services.redis_services.cache_keys import inflight_key
+from services.redis_services.inflight_registry import AsyncInFlightRegistry, InFlightRegistry
+
+RESULT_KEY = "result:test/repo:1:abc"
+
+
+def _claim(redis_server, is_stale=None, ttl_seconds: int = None) -> tuple:
+    """Claims RESULT_KEY the way the API does and returns the owner and whether it was claimed."""
+    registry = AsyncInFlightRegistry(async_cache(redis_server), ttl_seconds=ttl_seconds)
+    return asyncio.run(registry.claim(RESULT_KEY, is_stale=is_stale))
+
+
+def _checks(result: bool, checked: list = None):
+    """An `is_stale` coroutine function answering `result`, recording the task ids it checked."""
+    async def is_stale(task_id: str) -> bool:
+        if checked is not None:
+            checked.append(task_id)
+        return result
+
+    return is_stale
+
+
+def test_first_claim_owns_the_computation(redis_server):
+    task_id, claimed = _claim(redis_server, ttl_seconds=60)
+
+    assert claimed
+    client = sync_cache(redis_server).redis_client
+    assert client.get(inflight_key(RESULT_KEY)) == task_id.encode()
+    assert 0 < client.ttl(inflight_key(RESULT_KEY)) <= 60
+
+
+def test_duplicate_claim_returns_the_owner(redis_server):
+    owner, _ = _claim(redis_server)
+    checked = []
+
+    assert _claim(redis_server, is_stale=_checks(False, checked)) == (owner, False)
+    assert _claim(redis_server) == (owner, False)
+    assert checked == [owner]
+
+
+def test_stale_owner_is_taken_over(redis_server):
+    failed, _ = _claim(redis_server)
+    checked = []
+
+    task_id, claimed = _claim(redis_server, is_stale=_checks(True, checked))
+
+    assert claimed and task_id != failed
+    assert checked == [failed]
+    assert sync_cache(redis_server).redis_client.get(inflight_key(RESULT_KEY)) == task_id.encode()
+
+
+def test_release_by_the_worker_frees_the_key_for_the_next_claim(redis_server):
+    owner, _ = _claim(redis_server)
+
+    InFlightRegistry(sync_cache(redis_server)).release(RESULT_KEY, owner)
+
+    assert sync_cache(redis_server).redis_client.get(inflight_key(RESULT_KEY)) is None
+    task_id, claimed = _claim(redis_server)
+    assert claimed and task_id != owner
+
+
+def test_refresh_extends_the_owners_entry_only(redis_server):
+    owner, _ = _claim(redis_server, ttl_seconds=10)
+    registry = InFlightRegistry(sync_cache(redis_server), ttl_seconds=600)
+    client = registry.redis_client
+
+    registry.refresh(RESULT_KEY, "another-task")
+    assert client.ttl(inflight_key(RESULT_KEY)) <= 10
+    registry.refresh(RESULT_KEY, owner)
+    assert client.ttl(inflight_key(RESULT_KEY)) > 10
+
+
+def test_release_by_another_task_keeps_the_owner(redis_server):
+    owner, _ = _claim(redis_server)
+
+    InFlightRegistry(sync_cache(redis_server)).release(RESULT_KEY, "another-task")
+
+    assert _claim(redis_server) == (owner, False)
+
+
+def test_api_releases_the_claim_of_a_task_it_could_not_queue(redis_server):
+    async def scenario():
+        registry = AsyncInFlightRegistry(async_cache(redis_server))
+        owner, _ = await registry.claim(RESULT_KEY)
+        successor, claimed = await registry.claim(RESULT_KEY, is_stale=_checks(True))
+        assert claimed and successor != owner
+
+        await registry.release(RESULT_KEY, owner)
+        assert await registry.redis_client.get(inflight_key(RESULT_KEY)) == successor.encode()
+        await registry.release(RESULT_KEY, successor)
+        assert await registry.redis_client.get(inflight_key(RESULT_KEY)) is None
+
+    asyncio.run(scenario())
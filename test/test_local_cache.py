@@ -0,0 +1,137 @@
+"""
+Expires, evicts and invalidates values of the in-process caches in front of Redis.
+"""
+import asyncio
+import types
+
+import pytest
+
+from conftest import async_cache, sync_cache
+from services.redis_services import local_cache
+from services.redis_services.cache_keys import CACHE_INVALIDATION_CHANNEL
+from services.redis_services.local_cache import CacheInvalidationListener, LocalCache, TieredCache
+
+
+@pytest.fixture
+def clock(monkeypatch) -> types.SimpleNamespace:
+    """A monotonic clock for the caches that only moves when the test advances it."""
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(local_cache.time, "monotonic", lambda: now.value)
+    return now
+
+
+class StoredValues:
+    """Stands in for an AsyncRedisCacheService holding encoded values, counting its reads."""
+    def __init__(self, values: dict):
+        self.values = values
+        self.reads = 0
+
+    async def get_raw_json(self, key: str):
+        self.reads += 1
+        return self.values.get(key)
+
+    async def get_many_raw_json(self, keys: list):
+        self.reads += 1
+        return [self.values.get(key) for key in keys]
+
+
+def test_values_expire_after_the_ttl(clock):
+    cache = LocalCache("test", max_entries=10, ttl_seconds=5)
+    cache.set("key", b"value")
+
+    clock.value += 4.9
+    assert cache.get("key") == b"value"
+    clock.value += 0.1
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_value_is_evicted(clock):
+    cache = LocalCache("test", max_entries=2, ttl_seconds=60)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    assert cache.get("a") == b"1"
+
+    cache.set("c", b"3")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (b"1", b"3")
+
+
+def test_zero_entries_disable_the_cache(clock):
+    cache = LocalCache("test", max_entries=0, ttl_seconds=60)
+    cache.set("key", b"value")
+
+    assert cache.get("key") is None
+
+
+def test_invalidate_drops_the_key_and_bumps_the_generation(clock):
+    cache = LocalCache("test", max_entries=10, ttl_seconds=60)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+
+    cache.invalidate("a")
+    cache.invalidate("missing")
+
+    assert (cache.get("a"), cache.get("b")) == (None, b"2")
+    assert cache.generation == 2
+
+
+def test_tiered_cache_serves_hits_without_redis(clock):
+    stored = StoredValues({"a": b'{"a": 1}', "b": b'{"b": 2}'})
+    tiered = TieredCache(stored, LocalCache("test", max_entries=10, ttl_seconds=60))
+
+    async def scenario():
+        assert await tiered.get("a") == b'{"a": 1}'
+        assert await tiered.get("a") == b'{"a": 1}'
+        assert await tiered.get_many(["a", "b", "missing"]) == [b'{"a": 1}', b'{"b": 2}', None]
+        assert await tiered.get_many(["a", "b"]) == [b'{"a": 1}', b'{"b": 2}']
+
+    asyncio.run(scenario())
+    assert stored.reads == 2
+
+
+def test_value_read_before_an_invalidation_is_not_stored(clock):
+    local = LocalCache("test", max_entries=10, ttl_seconds=60)
+
+    class InvalidatedWhileReading(StoredValues):
+        async def get_raw_json(self, key: str):
+            local.invalidate(key)
+            return await super().get_raw_json(key)
+
+    stored = InvalidatedWhileReading({"a": b'{"a": 1}'})
+
+    assert asyncio.run(TieredCache(stored, local).get("a")) == b'{"a": 1}'
+    assert local.get("a") is None
+
+
+def test_announced_keys_are_dropped_by_the_listener(redis_server):
+    results = LocalCache("results", max_entries=10, ttl_seconds=60)
+    others = LocalCache("others", max_entries=10, ttl_seconds=60)
+    writer = sync_cache(redis_server).redis_client
+
+    async def wait_for(condition):
+        for _ in range(100):
+            if condition():
+                return
+            await asyncio.sleep(0.02)
+        raise AssertionError("The listener did not act in time.")
+
+    async def scenario():
+        listener = CacheInvalidationListener(async_cache(redis_server), [results, others])
+        listener.start()
+        try:
+            await wait_for(lambda: writer.pubsub_numsub(CACHE_INVALIDATION_CHANNEL)[0][1] == 1)
+            for cache in (results, others):
+                cache.set("result:a", b"1")
+                cache.set("result:b", b"2")
+
+            writer.publish(CACHE_INVALIDATION_CHANNEL, "result:a")
+
+            await wait_for(lambda: results.generation and others.generation)
+            for cache in (results, others):
+                assert (cache.get("result:a"), cache.get("result:b")) == (None, b"2")
+        finally:
+            await listener.close()
+
+    asyncio.run(scenario())
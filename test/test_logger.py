@@ -0,0 +1,131 @@
+"""
+Writes application logs through the queue listener: lazy formatting, JSON and text lines,
+structured fields, payload sampling and dropping records when the queue is full.
+"""
+import json
+import logging
+import re
+import threading
+import uuid
+
+import pytest
+from prometheus_client import REGISTRY
+
+from services.logging_services import logger as logger_module
+from services.logging_services.logger import AppLogger
+
+
+@pytest.fixture
+def make_logger(tmp_path):
+    """Creates AppLoggers under fresh names writing to a temporary directory, and stops their listeners."""
+    names = []
+
+    def make(log_level=logging.DEBUG) -> AppLogger:
+        names.append(f"test-{uuid.uuid4().hex[:8]}")
+        return AppLogger(names[-1], log_dir=str(tmp_path), log_level=log_level)
+
+    yield make
+    for name in names:
+        listener = logger_module._listeners.pop(name)
+        if listener._thread is not None:
+            listener.stop()
+
+
+def _lines(app_logger: AppLogger, tmp_path) -> list:
+    """Writes the queued records of a logger and returns the lines of its file."""
+    logger_module._listeners[app_logger.logger.name].stop()
+    return (tmp_path / f"{app_logger.logger.name}.log").read_text().splitlines()
+
+
+class Recorded:
+    """An argument that records the threads that format it."""
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self) -> str:
+        self.threads.append(threading.current_thread())
+        return "formatted"
+
+
+def test_arguments_are_formatted_on_the_listener_thread_only_when_enabled(make_logger, tmp_path):
+    app_logger = make_logger(log_level=logging.INFO)
+    skipped, written = Recorded(), Recorded()
+
+    app_logger.debug("Skipped %s", skipped)
+    app_logger.info("Written %s", written)
+    lines = _lines(app_logger, tmp_path)
+
+    assert skipped.threads == []
+    assert written.threads and threading.main_thread() not in written.threads
+    assert [json.loads(line)["message"] for line in lines] == ["Written formatted"]
+
+
+def test_keyword_fields_are_top_level_json_keys(make_logger, tmp_path):
+    app_logger = make_logger()
+
+    app_logger.warning("Analysis of %s#%d deferred", "repo", 7, task_id="task-1", retry_after=40)
+    (entry,) = [json.loads(line) for line in _lines(app_logger, tmp_path)]
+
+    assert entry["message"] == "Analysis of repo#7 deferred"
+    assert (entry["level"], entry["logger"]) == ("WARNING", app_logger.logger.name)
+    assert (entry["task_id"], entry["retry_after"]) == ("task-1", 40)
+    assert "args" not in entry and "msg" not in entry
+
+
+def test_text_format_writes_plain_lines(make_logger, tmp_path, monkeypatch):
+    monkeypatch.setattr(logger_module, "LOG_FORMAT", "text")
+    app_logger = make_logger()
+
+    app_logger.info("Fetched %d file(s)", 3, task_id="task-1")
+
+    (line,) = _lines(app_logger, tmp_path)
+    assert re.fullmatch(rf"\d{{4}}-\d\d-\d\d [\d:,]+ - {app_logger.logger.name} - INFO - Fetched 3 file\(s\)", line)
+
+
+def test_full_queue_drops_records_and_counts_them(make_logger, tmp_path, monkeypatch):
+    monkeypatch.setattr(logger_module, "LOG_QUEUE_SIZE", 2)
+    app_logger = make_logger()
+    name = app_logger.logger.name
+    # A stopped listener no longer drains the queue.
+    logger_module._listeners[name].stop()
+
+    for index in range(5):
+        app_logger.info("Record %d", index)
+
+    assert REGISTRY.get_sample_value("log_records_dropped_total", {"logger": name}) == 3
+    logger_module._listeners[name].start()
+    assert [json.loads(line)["message"] for line in _lines(app_logger, tmp_path)] == ["Record 0", "Record 1"]
+
+
+def test_payloads_are_sampled(make_logger, tmp_path, monkeypatch):
+    app_logger = make_logger()
+    monkeypatch.setattr(logger_module, "LOG_PAYLOAD_SAMPLE_RATE", 0.5)
+    monkeypatch.setattr(logger_module.random, "random", iter([0.7, 0.2]).__next__)
+
+    app_logger.payload("Skipped output", "a")
+    app_logger.payload("Sampled output", "b")
+
+    assert [json.loads(line)["message"] for line in _lines(app_logger, tmp_path)] == ["Sampled output\nb"]
+
+
+def test_payloads_are_truncated_and_serialized_when_written(make_logger, tmp_path, monkeypatch):
+    app_logger = make_logger()
+    monkeypatch.setattr(logger_module, "LOG_PAYLOAD_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(logger_module, "LOG_PAYLOAD_MAX_CHARS", 10)
+
+    app_logger.payload("Raw output", "x" * 25, task_id="task-1")
+    app_logger.payload("Result", {"a": 1})
+    entries = [json.loads(line) for line in _lines(app_logger, tmp_path)]
+
+    assert entries[0]["message"] == "Raw output\n" + "x" * 10 + "... [15 more characters]"
+    assert entries[0]["level"] == "DEBUG" and entries[0]["task_id"] == "task-1"
+    assert entries[1]["message"] == 'Result\n{"a":1}'
+
+
+def test_payloads_are_not_logged_above_debug(make_logger, tmp_path, monkeypatch):
+    app_logger = make_logger(log_level=logging.INFO)
+    monkeypatch.setattr(logger_module, "LOG_PAYLOAD_SAMPLE_RATE", 1.0)
+
+    app_logger.payload("Raw output", "x")
+
+    assert _lines(app_logger, tmp_path) == []
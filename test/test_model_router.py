@@ -0,0 +1,81 @@
+"""
+Routes shards of hand-written diffs between the fast and the pro model tier.
+"""
+import os
+import subprocess
+import sys
+
+from services.ai_services import model_router
+from services.ai_services.model_router import FAST, PRO, ModelRouter
+from services.github_services.streaming_diff_parser import StreamingDiffParser
+
+
+def _files(*names: str, lines: int = 1, added: str = "value = 1"):
+    patch = "".join(
+        f"diff --git a/{name} b/{name}\n--- a/{name}\n+++ b/{name}\n@@ -0,0 +1,{lines} @@\n" + f"+{added}\n" * lines
+        for name in names
+    )
+    return StreamingDiffParser().parse(patch)
+
+
+def _router(**kwargs) -> ModelRouter:
+    return ModelRouter(max_changed_lines=20, max_files=3, max_branches=2, **kwargs)
+
+
+def test_small_simple_shard_goes_to_the_fast_model():
+    assert _router().route(_files("app/views.py", "app/models.py")) == (FAST, "small")
+
+
+def test_dockerfiles_go_to_the_pro_model():
+    assert _router().route(_files("Dockerfile")) == (PRO, "path")
+    assert _router().route(_files("services/api/Dockerfile")) == (PRO, "path")
+
+
+def test_path_globs_match_case_insensitively():
+    assert _router().route(_files("app/Auth/Login.py")) == (PRO, "path")
+    assert _router(pro_path_globs=["Billing/*"]).route(_files("billing/invoice.py")) == (PRO, "path")
+
+
+def test_risky_extensions_go_to_the_pro_model():
+    assert _router().route(_files("scripts/deploy.sh")) == (PRO, "language")
+    assert _router().route(_files("src/Parser.CPP")) == (PRO, "language")
+
+
+def test_configured_globs_and_extensions_replace_the_defaults(monkeypatch):
+    monkeypatch.setenv("ROUTING_PRO_PATH_GLOBS", "api/*")
+    monkeypatch.setenv("ROUTING_PRO_EXTENSIONS", ".go")
+    router = _router()
+
+    assert router.route(_files("Dockerfile")) == (FAST, "small")
+    assert router.route(_files("api/handlers.py")) == (PRO, "path")
+    assert router.route(_files("cmd/main.go")) == (PRO, "language")
+
+
+def test_thresholds_send_large_or_complex_shards_to_the_pro_model():
+    router = _router()
+
+    assert router.route(_files("a.py", "b.py", "c.py")) == (FAST, "small")
+    assert router.route(_files("a.py", "b.py", "c.py", "d.py")) == (PRO, "files")
+    assert router.route(_files("a.py", lines=20)) == (FAST, "small")
+    assert router.route(_files("a.py", lines=21)) == (PRO, "changed_lines")
+    assert router.route(_files("a.py", lines=2, added="if ready:")) == (FAST, "small")
+    assert router.route(_files("a.py", lines=3, added="if ready:")) == (PRO, "branches")
+
+
+def test_a_single_model_reviews_every_shard_on_the_pro_tier(monkeypatch):
+    monkeypatch.setitem(model_router.TIER_MODELS, FAST, "")
+    assert _router().route(_files("a.py")) == (PRO, "no_fast_model")
+
+    monkeypatch.setitem(model_router.TIER_MODELS, FAST, model_router.TIER_MODELS[PRO])
+    assert _router().route(_files("a.py")) == (PRO, "no_fast_model")
+
+
+def test_an_empty_pro_model_falls_back_to_the_fast_model():
+    env = {**os.environ, "LLM_MODEL_FAST": "fast-model", "LLM_MODEL_PRO": ""}
+    output = subprocess.run(
+        [sys.executable, "-c", "from services.ai_services.model_router import TIER_MODELS; print(TIER_MODELS)"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env, capture_output=True, text=True,
+        check=True,
+    ).stdout
+
+    assert output.strip() == "{'fast': 'fast-model', 'pro': 'fast-model'}"
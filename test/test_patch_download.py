@@ -0,0 +1,108 @@
+"""
+Collects patches with spool_patch under a byte cap, and reviews oversized patches partially.
+"""
+import uuid
+
+import pytest
+
+from benchmarks.fake_llm import FakeCrew
+from benchmarks.synthetic import make_patch
+from conftest import REPO_URL
+
+from app.analysis_pipeline import AnalysisPipeline
+from services.github_services.patch_download import spool_patch
+from services.github_services.streaming_diff_parser import StreamingDiffParser
+
+
+def _chunks(patch: bytes, size: int = 100) -> list:
+    return [patch[start:start + size] for start in range(0, len(patch), size)]
+
+
+def _spool(patch: bytes, max_bytes: int, spooled: bool):
+    # A threshold below the cap spools the patch to a temporary file.
+    return spool_patch(_chunks(patch), max_bytes=max_bytes, spool_threshold=200 if spooled else 10 ** 9)
+
+
+@pytest.mark.parametrize("spooled", [False, True], ids=["memory", "spooled"])
+def test_patch_under_the_cap_is_kept_whole(spooled):
+    patch = make_patch(files=3, hunks=2, lines=10).encode()
+
+    with _spool(patch, len(patch), spooled) as downloaded:
+        assert (downloaded.truncated, downloaded.spooled, downloaded.size) == (False, spooled, len(patch))
+        assert bytes(downloaded.buffer) == patch
+        assert downloaded.head_sha == patch.split(b" ", 2)[1].decode()
+
+
+@pytest.mark.parametrize("spooled", [False, True], ids=["memory", "spooled"])
+def test_truncated_patch_keeps_its_complete_files(spooled):
+    patch = make_patch(files=6, hunks=2, lines=10).encode()
+    cut = patch.index(b"diff --git a/src/module_4/")
+
+    with _spool(patch, cut + 50, spooled) as downloaded:
+        assert downloaded.truncated and downloaded.spooled == spooled
+        assert downloaded.head_sha is None
+        assert bytes(downloaded.buffer) == patch[:cut]
+
+
+@pytest.mark.parametrize("spooled", [False, True], ids=["memory", "spooled"])
+def test_first_file_over_the_cap_keeps_its_complete_hunks(spooled):
+    patch = make_patch(files=1, hunks=10, lines=20).encode()
+    cut = patch.index(b"\n@@ -", patch.index(b"def function_")) + 1
+    for _ in range(4):
+        cut = patch.index(b"\n@@ -", cut) + 1
+
+    with _spool(patch, cut + 30, spooled) as downloaded:
+        assert downloaded.truncated
+        assert bytes(downloaded.buffer) == patch[:cut]
+        (file,) = StreamingDiffParser().parse(downloaded.buffer)
+
+    (whole,) = StreamingDiffParser().parse(patch)
+    assert len(file.hunks) == 5
+    assert [list(hunk.kinds) for hunk in file.hunks] == [list(hunk.kinds) for hunk in whole.hunks[:5]]
+
+
+def test_first_file_of_a_bare_diff_over_the_cap_keeps_its_complete_hunks():
+    patch = make_patch(files=2, hunks=4, lines=20).encode()
+    diff = patch[patch.index(b"diff --git "):]
+    second_hunk = diff.index(b"\n@@ -", diff.index(b"\n@@ -") + 1) + 1
+
+    with _spool(diff, second_hunk + 30, spooled=False) as downloaded:
+        (file,) = StreamingDiffParser().parse(downloaded.buffer)
+
+    assert len(file.hunks) == 1
+
+
+def _pipeline(github, monkeypatch, patch: str) -> AnalysisPipeline:
+    # A fresh token, so the per-file cache of earlier runs does not answer for the crew.
+    token = uuid.uuid4().hex
+    monkeypatch.setattr(github, "patch_factory", lambda number: patch.replace("synthetic line", token))
+    return AnalysisPipeline(github_token="test-token", crew=FakeCrew())
+
+
+@pytest.mark.parametrize("limit, value, reason, files", [
+    ("max_patch_files", 2, "more than 2 changed files", 2),
+    ("max_patch_lines", 50, "more than 50 diff lines", 2),
+    ("max_patch_bytes", 3000, "patch larger than 3000 bytes", 1),
+])
+def test_oversized_patch_is_reviewed_partially(github, monkeypatch, limit, value, reason, files):
+    pr_number = 601 + ["max_patch_files", "max_patch_lines", "max_patch_bytes"].index(limit)
+    pipeline = _pipeline(github, monkeypatch, make_patch(files=4, hunks=2, lines=12, seed=pr_number))
+    setattr(pipeline, limit, value)
+
+    result = pipeline.run(REPO_URL, pr_number, head_sha=github.head_sha(pr_number))
+
+    assert result["summary"]["truncated"] is True
+    assert result["summary"]["truncation_reason"] == reason
+    assert [file["name"] for file in result["files"]] == [f"src/module_{index}/file_{index}.py" for index in range(files)]
+
+
+def test_single_file_over_the_byte_cap_is_still_reviewed(github, monkeypatch):
+    pr_number = 611
+    pipeline = _pipeline(github, monkeypatch, make_patch(files=1, hunks=10, lines=20, seed=pr_number))
+    pipeline.max_patch_bytes = 5000
+
+    result = pipeline.run(REPO_URL, pr_number, head_sha=github.head_sha(pr_number))
+
+    assert result["summary"]["truncated"] is True
+    assert [file["name"] for file in result["files"]] == ["src/module_0/file_0.py"]
+    assert result["files"][0]["issues"]
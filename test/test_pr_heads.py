@@ -0,0 +1,69 @@
+"""
+Moves PR head pointers forward only, on a fakeredis server.
+"""
+import asyncio
+
+from conftest import async_cache, sync_cache
+from services.redis_services.cache_keys import pr_head_key
+from services.redis_services.pr_heads import AsyncPrHeadPointers, PrHeadPointers, github_timestamp
+
+REPO_URL = "https://github.com/test/heads"
+
+
+def _advance(redis_server, *moves) -> list:
+    """Applies (head SHA, task id, updated_at) moves in order and returns their outcomes."""
+    async def apply():
+        pointers = AsyncPrHeadPointers(async_cache(redis_server))
+        return [await pointers.advance(REPO_URL, 1, *move) for move in moves]
+
+    return asyncio.run(apply())
+
+
+def test_pointer_moves_to_newer_heads_only(redis_server):
+    outcomes = _advance(
+        redis_server,
+        ("a", "task-a", "2024-05-01T12:00:00Z"),
+        ("b", "task-b", "2024-05-01T12:05:00Z"),
+        ("a", "task-a2", "2024-05-01T12:00:00Z"),
+    )
+
+    assert outcomes == [(True, None, None), (True, "a", "task-a"), (False, "b", "task-b")]
+    assert PrHeadPointers(sync_cache(redis_server)).head_sha(REPO_URL, 1) == "b"
+
+
+def test_same_head_takes_the_new_task(redis_server):
+    outcomes = _advance(
+        redis_server,
+        ("a", "task-a", "2024-05-01T12:00:00Z"),
+        ("a", "task-a2", "2024-05-01T12:00:00Z"),
+    )
+
+    assert outcomes[1] == (True, "a", "task-a")
+    client = sync_cache(redis_server).redis_client
+    assert client.hget(pr_head_key(REPO_URL, 1), "task_id") == b"task-a2"
+
+
+def test_heads_of_unknown_or_equal_age_do_not_replace_a_known_head(redis_server):
+    outcomes = _advance(
+        redis_server,
+        ("a", "task-a", "2024-05-01T12:00:00Z"),
+        ("b", "task-b", None),
+        ("c", "task-c", "2024-05-01T12:00:00Z"),
+    )
+
+    assert [moved for moved, _, _ in outcomes] == [True, False, False]
+    assert PrHeadPointers(sync_cache(redis_server)).head_sha(REPO_URL, 1) == "a"
+
+
+def test_pointer_written_as_json_is_replaced(redis_server):
+    client = sync_cache(redis_server).redis_client
+    client.set(pr_head_key(REPO_URL, 1), b'{"sha": "old", "task_id": "task-old"}')
+
+    assert PrHeadPointers(sync_cache(redis_server)).head_sha(REPO_URL, 1) is None
+    assert _advance(redis_server, ("a", "task-a", "2024-05-01T12:00:00Z")) == [(True, None, None)]
+    assert PrHeadPointers(sync_cache(redis_server)).head_sha(REPO_URL, 1) == "a"
+
+
+def test_github_timestamps():
+    assert github_timestamp("2024-05-01T12:00:00Z") == 1714564800.0
+    assert github_timestamp(None) == github_timestamp("yesterday") == 0.0
@@ -0,0 +1,148 @@
+"""
+Packs parsed files into prompt batches with PromptPacker.
+"""
+import pytest
+
+from benchmarks.synthetic import make_patch
+from services.ai_services.prompt_packer import PromptPacker, estimate_tokens
+from services.github_services.streaming_diff_parser import StreamingDiffParser, render_prompt
+
+
+def _file(name: str, before: int, after: int, change: str = "value = 2") -> str:
+    """A diff of one file with a single changed line between `before` and `after` context lines."""
+    context = [f" line_{index}\n" for index in range(before + after)]
+    length = before + after + 1
+    return (f"diff --git a/{name} b/{name}\n--- a/{name}\n+++ b/{name}\n"
+            f"@@ -1,{length} +1,{length} @@\n" + "".join(context[:before])
+            + f"-value = 1\n+{change}\n" + "".join(context[before:]))
+
+
+def _lines(batches) -> list:
+    """Every (file, type, source line, target line) sent to the crew, in order."""
+    return [(file.name, line_type, source_no, target_no)
+            for batch in batches for file in batch.files
+            for _hunk, _kind, line_type, source_no, target_no, _content in file.iter_lines()]
+
+
+def _lines_of(file) -> list:
+    """The lines of a parsed file in the form of `_lines`."""
+    return [(file.name, line_type, source_no, target_no)
+            for _hunk, _kind, line_type, source_no, target_no, _content in file.iter_lines()]
+
+
+def test_small_files_share_one_batch():
+    files = StreamingDiffParser().parse(_file("a.py", 2, 2) + _file("b.py", 2, 2))
+    (batch,) = PromptPacker(token_budget=1000, context_radius=3, exclude_globs=()).pack(files)
+
+    assert [file.name for file in batch.files] == ["a.py", "b.py"]
+    assert batch.prompt == render_prompt(files, 3)
+    assert batch.tokens == sum(estimate_tokens(render_prompt([file], 3)) for file in files)
+
+
+def test_batches_stay_under_the_token_budget():
+    files = StreamingDiffParser().parse(make_patch(files=8, hunks=2, lines=10))
+    budget = 2 * estimate_tokens(render_prompt(files[:1], 3)) + 10
+    batches = PromptPacker(token_budget=budget, context_radius=3, exclude_globs=()).pack(files)
+
+    assert [len(batch.files) for batch in batches] == [2, 2, 2, 2]
+    assert all(batch.tokens <= budget for batch in batches)
+    assert [file.name for batch in batches for file in batch.files] == [file.name for file in files]
+
+
+def test_batches_hold_at_most_max_files():
+    files = StreamingDiffParser().parse(make_patch(files=7, hunks=1, lines=5))
+    batches = PromptPacker(token_budget=100_000, context_radius=3, exclude_globs=(), max_files=3).pack(files)
+
+    assert [len(batch.files) for batch in batches] == [3, 3, 1]
+
+
+def test_context_radius_drops_distant_unchanged_lines():
+    (file,) = StreamingDiffParser().parse(_file("a.py", 10, 10))
+    packer = PromptPacker(token_budget=1000, context_radius=2, exclude_globs=())
+    (batch,) = packer.pack([file])
+
+    assert batch.prompt == (
+        "File: a.py (modified)\n"
+        "@@ -1,21 +1,21 @@\n"
+        "    ... | (8 unchanged lines)\n"
+        "      9 | line_8\n"
+        "     10 | line_9\n"
+        "-    11 | value = 1\n"
+        "+    11 | value = 2\n"
+        "     12 | line_10\n"
+        "     13 | line_11\n"
+        "    ... | (8 unchanged lines)\n"
+        "\n"
+    )
+    assert batch.tokens < estimate_tokens(render_prompt([file]))
+
+
+def test_zero_context_radius_keeps_only_changed_lines():
+    (file,) = StreamingDiffParser().parse(_file("a.py", 3, 3))
+    (batch,) = PromptPacker(token_budget=1000, context_radius=0, exclude_globs=()).pack([file])
+
+    assert "line_" not in batch.prompt
+    assert "-     4 | value = 1\n+     4 | value = 2\n" in batch.prompt
+
+
+def test_oversized_file_is_split_at_hunk_boundaries():
+    patch = make_patch(files=3, hunks=6, lines=20)
+    files = StreamingDiffParser().parse(patch)
+    hunk_tokens = estimate_tokens(render_prompt([files[1]], 3)) // 6
+    budget = 2 * hunk_tokens + 40
+    packer = PromptPacker(token_budget=budget, context_radius=3, exclude_globs=())
+
+    batches = packer.pack(files)
+
+    split = [batch for batch in batches if batch.files[0].name == files[1].name]
+    assert len(split) > 1
+    assert all(len(batch.files) == 1 and batch.tokens <= budget for batch in split)
+    assert sum(len(batch.files[0].hunks) for batch in split) == 6
+    for file in files:
+        assert _lines(batch for batch in batches if batch.files[0].name == file.name) == _lines_of(file)
+
+
+def test_single_huge_hunk_is_split_into_line_windows():
+    (file,) = StreamingDiffParser().parse(make_patch(files=1, hunks=1, lines=400))
+    budget = estimate_tokens(render_prompt([file], 3)) // 4
+    batches = PromptPacker(token_budget=budget, context_radius=3, exclude_globs=()).pack([file])
+
+    assert len(batches) >= 4
+    assert _lines(batches) == _lines_of(file)
+    for batch in batches:
+        (hunk,) = batch.files[0].hunks
+        source_nos = [number for number in hunk.source_nos if number]
+        target_nos = [number for number in hunk.target_nos if number]
+        assert (hunk.source_length, hunk.target_length) == (len(source_nos), len(target_nos))
+        if source_nos:
+            assert hunk.source_start == source_nos[0]
+        if target_nos:
+            assert hunk.target_start == target_nos[0]
+
+
+def test_excluded_paths_are_matched_by_glob():
+    patch = _file("package-lock.json", 1, 1) + _file("web/dist/app.min.js", 1, 1) + _file("src/app.py", 1, 1)
+    files = StreamingDiffParser().parse(patch)
+    packer = PromptPacker(token_budget=1000, context_radius=3)
+
+    assert [packer.is_excluded(file) for file in files] == [True, True, False]
+    assert not any(PromptPacker(context_radius=3, exclude_globs=()).is_excluded(file) for file in files)
+
+
+@pytest.mark.parametrize("name, excluded", [
+    ("vendor/github.com/pkg/errors/errors.go", True),
+    ("dist/app.js", True),
+    ("third_party/zlib/inflate.c", True),
+    ("web/node_modules/left-pad/index.js", True),
+    ("src/components/__snapshots__/button.test.js.snap", True),
+    ("services/api/go.sum", True),
+    ("src/app/dist/handler.py", False),
+    ("internal/vendor/client.go", False),
+    ("pkg/third_party/adapter.py", False),
+    ("src/distribution/main.py", False),
+    ("vendor.py", False),
+])
+def test_directory_globs_match_whole_segments_from_the_root(name, excluded):
+    (file,) = StreamingDiffParser().parse(_file(name, 1, 1))
+
+    assert PromptPacker(context_radius=3).is_excluded(file) is excluded
@@ -0,0 +1,175 @@
+"""
+Waits for and defers on shared rate limits on a fakeredis server, and requeues analyses
+held back by them.
+"""
+import time
+import types
+import uuid
+
+import pytest
+from celery.exceptions import Retry
+
+from benchmarks.fake_llm import FakeCrew
+from conftest import REPO_URL, sync_cache
+
+import app.celery_app as celery_app
+from app.analysis_pipeline import LLM_RATE_LIMIT_BACKOFF_SECONDS, AnalysisPipeline, PipelineResources
+from services.redis_services.cache_keys import rate_limit_pause_key
+from services.redis_services.rate_limiter import RateLimited, RateLimiter
+
+PR_NUMBER = 501
+
+
+@pytest.fixture
+def sleeps(monkeypatch) -> list:
+    """The seconds the rate limiter sleeps, still slept for real so that the bucket refills."""
+    slept = []
+    real_sleep = time.sleep
+
+    def sleep(seconds: float):
+        slept.append(seconds)
+        real_sleep(seconds)
+
+    monkeypatch.setattr("services.redis_services.rate_limiter.time.sleep", sleep)
+    return slept
+
+
+def test_calls_within_the_burst_do_not_wait(redis_server, sleeps):
+    limiter = RateLimiter(sync_cache(redis_server), max_wait_seconds=1)
+    for _ in range(3):
+        limiter.acquire("github:token", rate_per_second=0.01, burst=3)
+
+    assert sleeps == []
+
+
+def test_short_wait_is_slept_through(redis_server, sleeps):
+    limiter = RateLimiter(sync_cache(redis_server), max_wait_seconds=1)
+    limiter.acquire("llm-requests", rate_per_second=20, burst=1)
+    limiter.acquire("llm-requests", rate_per_second=20, burst=1)
+
+    assert sleeps and 0 < sum(sleeps) <= 0.1
+
+
+def test_long_wait_is_deferred_without_sleeping(redis_server, sleeps):
+    limiter = RateLimiter(sync_cache(redis_server), max_wait_seconds=1)
+    limiter.acquire("llm-tokens", rate_per_second=0.1, burst=100, cost=100)
+
+    with pytest.raises(RateLimited) as raised:
+        limiter.acquire("llm-tokens", rate_per_second=0.1, burst=100, cost=50)
+
+    assert 499 <= raised.value.retry_after <= 500
+    assert sleeps == []
+
+
+def test_pause_holds_every_call_and_is_not_cut_short(redis_server, sleeps):
+    limiter = RateLimiter(sync_cache(redis_server), max_wait_seconds=1)
+    limiter.pause("llm-requests", 30)
+    limiter.pause("llm-requests", 5)
+
+    with pytest.raises(RateLimited) as raised:
+        RateLimiter(sync_cache(redis_server), max_wait_seconds=1).acquire("llm-requests", 100, 100)
+
+    assert 29 <= raised.value.retry_after <= 30
+    limiter.acquire("llm-tokens", rate_per_second=100, burst=100)
+    assert sleeps == []
+
+
+def test_without_redis_calls_are_not_limited():
+    limiter = RateLimiter(types.SimpleNamespace(redis_client=None), max_wait_seconds=0)
+    for _ in range(3):
+        limiter.acquire("llm-requests", rate_per_second=0.001, burst=1)
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class RateLimitedCrew(FakeCrew):
+    """Answers every call like an LLM provider whose quota is used up."""
+    def kickoff(self, inputs: dict):
+        self.calls += 1
+        raise RateLimitError("429 Too Many Requests")
+
+
+class RecordingRegistry:
+    """Records what a pipeline does with its in-flight entry."""
+    def __init__(self):
+        self.calls = []
+
+    def refresh(self, result_key: str, task_id: str):
+        self.calls.append(("refresh", task_id))
+
+    def release(self, result_key: str, task_id: str):
+        self.calls.append(("release", task_id))
+
+
+def test_llm_429_pauses_the_limit_and_defers_the_analysis(github, monkeypatch, redis_server):
+    # Fresh contents, so the per-file cache of earlier runs does not answer for the crew.
+    token = uuid.uuid4().hex
+    monkeypatch.setattr(github, "patch_factory", lambda number: (
+        f"From {'5' * 40} Mon Sep 17 00:00:00 2001\nSubject: [PATCH] Change\n\n---\n"
+        "diff --git a/app/views.py b/app/views.py\n--- a/app/views.py\n+++ b/app/views.py\n"
+        f"@@ -1,2 +1,2 @@\n def view():\n-    return None\n+    return '{token}'\n-- \n2.43.0\n\n"
+    ))
+    crew = RateLimitedCrew()
+    resources = PipelineResources(github_token="test-token", crew=crew)
+    resources.rate_limiter = RateLimiter(sync_cache(redis_server), max_wait_seconds=1)
+    resources.inflight = RecordingRegistry()
+    pipeline = AnalysisPipeline(resources=resources, task_id="task-1")
+
+    with pytest.raises(RateLimited) as raised:
+        pipeline.run(REPO_URL, PR_NUMBER, head_sha=github.head_sha(PR_NUMBER))
+
+    assert crew.calls == 1
+    assert raised.value.retry_after == LLM_RATE_LIMIT_BACKOFF_SECONDS
+    client = resources.rate_limiter.redis_client
+    assert 0 < client.pttl(rate_limit_pause_key("llm-requests")) <= LLM_RATE_LIMIT_BACKOFF_SECONDS * 1000
+    # The requeued task keeps its in-flight entry, so duplicate requests still find it.
+    assert resources.inflight.calls[-1] == ("refresh", "task-1")
+    assert ("release", "task-1") not in resources.inflight.calls
+
+
+class DeferredPipeline:
+    """Stands in for AnalysisPipeline in the Celery task: every run hits a rate limit."""
+    def __init__(self, **_):
+        pass
+
+    def run(self, repo_url: str, pr_number: int, head_sha: str = None):
+        raise RateLimited("Rate limit llm-requests exhausted for 40.0s.", retry_after=40)
+
+
+def _retry_countdown(monkeypatch, retries: int) -> float:
+    """Runs the analysis task after `retries` earlier retries and returns the countdown of its requeue."""
+    requeued = {}
+
+    def retry(exc=None, countdown=None, max_retries=None, **_):
+        requeued.update(exc=exc, countdown=countdown, max_retries=max_retries)
+        return Retry(exc=exc, when=countdown)
+
+    task = celery_app.analyze_pr_task
+    monkeypatch.setattr(celery_app, "AnalysisPipeline", DeferredPipeline)
+    monkeypatch.setattr(celery_app, "get_pipeline_resources", lambda: None)
+    monkeypatch.setattr(task, "retry", retry)
+    task.push_request(id="task-1", retries=retries)
+    try:
+        with pytest.raises(Retry):
+            task.run(REPO_URL, PR_NUMBER, "a" * 40)
+    finally:
+        task.pop_request()
+
+    assert isinstance(requeued["exc"], RateLimited)
+    assert requeued["max_retries"] == celery_app.RATE_LIMIT_MAX_RETRIES
+    return requeued["countdown"]
+
+
+def test_rate_limited_task_is_requeued_after_at_least_the_requested_wait(monkeypatch):
+    countdown = _retry_countdown(monkeypatch, retries=0)
+
+    assert 40 <= countdown <= 40 * 1.2
+
+
+def test_requeue_backs_off_exponentially_up_to_the_cap(monkeypatch):
+    base = celery_app.RATE_LIMIT_RETRY_BASE_SECONDS
+
+    assert 8 * base <= _retry_countdown(monkeypatch, retries=3) <= 8 * base * 1.2
+    assert _retry_countdown(monkeypatch, retries=20) == celery_app.RATE_LIMIT_RETRY_MAX_SECONDS
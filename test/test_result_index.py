@@ -0,0 +1,152 @@
+"""
+Indexes results with ResultIndexWriter and pages through them with AsyncResultIndex, on fakeredis.
+"""
+import asyncio
+from typing import Tuple
+
+from conftest import async_cache, sync_cache
+
+from app import main
+from services.redis_services.cache_keys import pr_latest_analysis_key
+from services.redis_services.result_index import AsyncResultIndex, ResultIndexWriter
+
+REPO_URL = "https://github.com/Test/Index"
+REPO = "test/index"
+T0 = 1_700_000_000.0
+
+
+def _result(*issues) -> dict:
+    """A dumped Result with one issue per (file, type) pair."""
+    files = {}
+    for name, issue_type in issues:
+        files.setdefault(name, []).append(
+            {"type": issue_type, "line": len(files.get(name, [])) + 1, "description": "d", "suggestion": "s"}
+        )
+    total = sum(len(found) for found in files.values())
+    return {
+        "files": [{"name": name, "issues": found} for name, found in files.items()],
+        "summary": {"total_files": len(files), "total_issues": total, "critical_issues": 0},
+    }
+
+
+def _index(redis_server) -> Tuple[AsyncResultIndex, Tuple[float, float]]:
+    """A reader and a window around T0."""
+    return AsyncResultIndex(async_cache(redis_server)), (T0 - 3600, T0 + 3600)
+
+
+def _issue_counts(redis_server):
+    index, _ = _index(redis_server)
+    return asyncio.run(index.issue_counts(REPO, top_files=10))
+
+
+def test_pages_stay_stable_while_new_analyses_are_indexed(redis_server):
+    writer = ResultIndexWriter(sync_cache(redis_server))
+    for pr_number in range(1, 6):
+        writer.record(REPO_URL, pr_number, f"sha{pr_number}", _result(), analyzed_at=T0 + pr_number)
+
+    async def pages():
+        index, (since, _) = _index(redis_server)
+        until = T0 + 5
+        first = await index.analyses(REPO, since, until, 0, 2)
+        writer.record(REPO_URL, 6, "sha6", _result(), analyzed_at=T0 + 6)
+        return first, await index.analyses(REPO, since, until, 2, 2), await index.analyses(REPO, since, until, 4, 2)
+
+    first, second, last = asyncio.run(pages())
+    assert [item["pr_number"] for item in first] == [5, 4]
+    assert [item["pr_number"] for item in second] == [3, 2]
+    assert [(item["pr_number"], item["analyzed_at"]) for item in last] == [(1, T0 + 1)]
+
+
+def test_issues_page_by_type(redis_server):
+    writer = ResultIndexWriter(sync_cache(redis_server))
+    writer.record(REPO_URL, 1, "sha1", _result(("a.py", "Bug"), ("a.py", "style")), analyzed_at=T0)
+    writer.record(REPO_URL, 2, "sha2", _result(("b.py", "bug")), analyzed_at=T0 + 1)
+
+    async def pages():
+        index, (since, until) = _index(redis_server)
+        return (await index.issues(REPO, " BUG ", since, until, 0, 10),
+                await index.issues(REPO, None, since, until, 0, 2),
+                await index.issues(REPO, None, since, until, 2, 2))
+
+    bugs, first, second = asyncio.run(pages())
+    assert [(item["pr_number"], item["file"], item["type"]) for item in bugs] == [(2, "b.py", "bug"), (1, "a.py", "bug")]
+    assert [item["pr_number"] for item in first] == [2, 1]
+    assert len(second) == 1 and second[0]["pr_number"] == 1
+
+
+def test_new_analysis_of_a_pr_replaces_its_counts(redis_server):
+    writer = ResultIndexWriter(sync_cache(redis_server))
+    writer.record(REPO_URL, 1, "sha1", _result(("a.py", "bug"), ("a.py", "bug"), ("b.py", "style")), analyzed_at=T0)
+    writer.record(REPO_URL, 2, "sha2", _result(("a.py", "bug")), analyzed_at=T0 + 1)
+    assert _issue_counts(redis_server) == ({"bug": 3, "style": 1}, [("a.py", 3), ("b.py", 1)])
+
+    writer.record(REPO_URL, 1, "sha1b", _result(("c.py", "security")), analyzed_at=T0 + 2)
+
+    assert _issue_counts(redis_server) == ({"bug": 1, "security": 1}, [("c.py", 1), ("a.py", 1)])
+
+    async def latest():
+        index, (since, until) = _index(redis_server)
+        return await index.latest_analyses(REPO, since, until, 0, 10)
+
+    items, _ = asyncio.run(latest())
+    assert [(item["pr_number"], item["head_sha"]) for item in items] == [(1, "sha1b"), (2, "sha2")]
+
+
+def test_older_analysis_indexed_late_keeps_the_newer_counts(redis_server):
+    writer = ResultIndexWriter(sync_cache(redis_server))
+    writer.record(REPO_URL, 1, "new", _result(("a.py", "style")), analyzed_at=T0 + 10)
+    writer.record(REPO_URL, 1, "old", _result(("a.py", "bug"), ("b.py", "bug")), analyzed_at=T0)
+
+    assert _issue_counts(redis_server) == ({"style": 1}, [("a.py", 1)])
+
+    async def latest():
+        index, (since, until) = _index(redis_server)
+        return await index.latest_analyses(REPO, since, until, 0, 10)
+
+    items, _ = asyncio.run(latest())
+    assert [item["head_sha"] for item in items] == ["new"]
+
+
+def test_prs_leaving_the_window_are_removed_from_the_counts(redis_server):
+    writer = ResultIndexWriter(sync_cache(redis_server), ttl_seconds=100)
+    writer.record(REPO_URL, 1, "sha1", _result(("a.py", "bug")), analyzed_at=T0)
+    writer.record(REPO_URL, 2, "sha2", _result(("b.py", "style")), analyzed_at=T0 + 200)
+
+    assert _issue_counts(redis_server) == ({"style": 1}, [("b.py", 1)])
+    assert not writer.redis_client.exists(pr_latest_analysis_key(REPO, 1))
+
+
+def test_latest_page_shortened_by_expired_prs_still_links_to_the_next(redis_server):
+    writer = ResultIndexWriter(sync_cache(redis_server))
+    for pr_number in range(1, 6):
+        writer.record(REPO_URL, pr_number, f"sha{pr_number}", _result(), analyzed_at=T0 + pr_number)
+    # PR 4 left the window between reading the PR ranks and reading their pointers.
+    writer.redis_client.delete(pr_latest_analysis_key(REPO, 4))
+
+    async def pages():
+        index, (since, until) = _index(redis_server)
+        return [await index.latest_analyses(REPO, since, until, offset, 2) for offset in (0, 2, 4)]
+
+    (first, scanned_first), (second, scanned_second), (last, scanned_last) = asyncio.run(pages())
+    assert [item["pr_number"] for item in first] == [5]
+    assert scanned_first == 2
+    assert [item["pr_number"] for item in second] == [3, 2]
+    assert scanned_second == 2
+    assert [item["pr_number"] for item in last] == [1]
+    assert scanned_last == 1
+
+
+def test_latest_analyses_endpoint_pages_past_a_short_page(api_client, redis_server, monkeypatch):
+    writer = ResultIndexWriter(sync_cache(redis_server), ttl_seconds=10 ** 10)
+    for pr_number in range(1, 6):
+        writer.record(REPO_URL, pr_number, f"sha{pr_number}", _result(), analyzed_at=T0 + pr_number)
+    writer.redis_client.delete(pr_latest_analysis_key(REPO, 4))
+    monkeypatch.setattr(main, "result_index", AsyncResultIndex(async_cache(redis_server), ttl_seconds=10 ** 10))
+
+    pages, offset = [], 0
+    while offset is not None:
+        page = api_client.get(f"/repos/Test/Index/analyses?latest=true&limit=2&offset={offset}").json()
+        pages.append([item["pr_number"] for item in page["items"]])
+        offset = page["next_offset"]
+
+    assert pages == [[5], [3, 2], [1]]
@@ -0,0 +1,63 @@
+"""
+Merges the shard outputs of a crew that names files differently from the diff.
+"""
+import json
+import uuid
+
+from benchmarks.fake_llm import FakeCrew, FakeOutput
+from conftest import REPO_URL
+
+from app.analysis_pipeline import AnalysisPipeline
+from models.output_model import FileAnalysis, Issue, Result
+
+PR_NUMBER = 401
+
+
+def _patch(number: int) -> str:
+    # Fresh contents, so the per-file cache of earlier runs does not answer for the crew.
+    token = uuid.uuid4().hex
+    return (
+        f"From {'4' * 40} Mon Sep 17 00:00:00 2001\nSubject: [PATCH] Rename\n\n---\n"
+        "diff --git a/old/util.py b/new/util.py\nsimilarity index 90%\nrename from old/util.py\nrename to new/util.py\n"
+        "--- a/old/util.py\n+++ b/new/util.py\n@@ -1,2 +1,2 @@\n def helper():\n-    return 1\n"
+        f"+    return '{token}'\n"
+        "diff --git a/app/views.py b/app/views.py\n--- a/app/views.py\n+++ b/app/views.py\n"
+        f"@@ -1,2 +1,2 @@\n def view():\n-    return None\n+    return '{token}'\n"
+        "-- \n2.43.0\n\n"
+    )
+
+
+class RenamingCrew(FakeCrew):
+    """Reports the renamed file under its old path, the other with git's b/ prefix, and a file outside the diff."""
+    def kickoff(self, inputs: dict) -> FakeOutput:
+        result = json.loads(super().kickoff(inputs).raw)
+        for file in result["files"]:
+            file["name"] = {"new/util.py": "old/util.py", "app/views.py": "b/app/views.py"}[file["name"]]
+        result["files"].append({"name": "app/settings.py", "issues": [
+            {"type": "bug", "line": 9, "description": "Unrelated file.", "suggestion": "Check it."},
+        ]})
+        return FakeOutput(json.dumps(result))
+
+
+def test_issues_reported_under_other_names_are_kept(github, monkeypatch):
+    monkeypatch.setattr(github, "patch_factory", _patch)
+    pipeline = AnalysisPipeline(github_token="test-token", crew=RenamingCrew())
+
+    result = pipeline.run(REPO_URL, PR_NUMBER, head_sha=github.head_sha(PR_NUMBER))
+
+    assert {file["name"]: [issue["line"] for issue in file["issues"]] for file in result["files"]} == {
+        "new/util.py": [2],
+        "app/views.py": [2],
+        "app/settings.py": [9],
+    }
+    assert [file["name"] for file in result["files"]][-1] == "app/settings.py"
+    assert result["summary"]["total_issues"] == 3
+
+
+def test_summary_counts_only_critical_and_security_issues():
+    issues = [Issue(type=issue_type, line=line, description="Issue.", suggestion="Fix it.")
+              for line, issue_type in enumerate(["critical", "Security", "bug", "style", "performance"], start=1)]
+
+    summary = Result.from_files([FileAnalysis(name="app/views.py", issues=issues)]).summary
+
+    assert (summary.total_files, summary.total_issues, summary.critical_issues) == (1, 5, 2)
@@ -0,0 +1,50 @@
+"""
+Runs concurrent analyses on one set of pipeline resources, the way a threaded worker does.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from benchmarks.fake_llm import FakeCrew
+from conftest import REPO_URL
+
+from app.analysis_pipeline import AnalysisPipeline, PipelineResources
+
+POOL_SIZE = 4
+PR_NUMBERS = range(201, 213)
+
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(?P<start>\d+)")
+
+
+def _first_added_lines(patch: str) -> Dict[str, int]:
+    """Maps each file of a patch to its first added line, where the fake crew reports an issue."""
+    first_added, name, line_no = {}, None, 0
+    for line in patch.splitlines():
+        if line.startswith("+++ b/"):
+            name = line[len("+++ b/"):]
+        elif header := _HUNK_HEADER.match(line):
+            line_no = int(header.group("start"))
+        elif line.startswith("+") and name and name not in first_added:
+            first_added[name] = line_no
+        if line.startswith((" ", "+")):
+            line_no += 1
+    return first_added
+
+
+def test_concurrent_pipelines_share_resources(github):
+    resources = PipelineResources(github_token="test-token", crew=FakeCrew(), http_pool_size=POOL_SIZE)
+
+    def analyze(pr_number):
+        return AnalysisPipeline(resources=resources).run(REPO_URL, pr_number)
+
+    with ThreadPoolExecutor(max_workers=POOL_SIZE) as executor:
+        results = list(executor.map(analyze, PR_NUMBERS))
+
+    for pr_number, result in zip(PR_NUMBERS, results):
+        expected = _first_added_lines(github.patch_factory(pr_number))
+        assert result["summary"]["total_files"] == len(expected)
+        assert {file["name"]: [issue["line"] for issue in file["issues"]] for file in result["files"]} == {
+            name: [line_no] for name, line_no in expected.items()
+        }
+    assert github.stats["patch"] == len(PR_NUMBERS)
+    assert github.stats["connections"] <= POOL_SIZE
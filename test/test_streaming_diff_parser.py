@@ -0,0 +1,179 @@
+"""
+Compares StreamingDiffParser with the unidiff-based DiffParser on the same patches, including
+capped and truncated ones.
+"""
+import pytest
+
+from benchmarks.synthetic import make_patch
+from services.github_services.diff_parser import DiffParser
+from services.github_services.patch_download import spool_patch
+from services.github_services.streaming_diff_parser import StreamingDiffParser
+
+EDGE_CASES = """\
+diff --git a/README.md b/README.md
+index 1111111..2222222 100644
+--- a/README.md
++++ b/README.md
+@@ -1,3 +1,4 @@ # Title
+ intro
+
+-old line
++new line
++another line
+diff --git a/src/added.py b/src/added.py
+new file mode 100644
+index 0000000..3333333
+--- /dev/null
++++ b/src/added.py
+@@ -0,0 +1,2 @@
++def added():
++    return 1
+\\ No newline at end of file
+diff --git a/src/removed.py b/src/removed.py
+deleted file mode 100644
+index 4444444..0000000
+--- a/src/removed.py
++++ /dev/null
+@@ -1,2 +0,0 @@
+-def removed():
+-    return 2
+diff --git a/src/old_name.py b/src/new_name.py
+similarity index 90%
+rename from src/old_name.py
+rename to src/new_name.py
+index 5555555..6666666 100644
+--- a/src/old_name.py
++++ b/src/new_name.py
+@@ -10,2 +10,2 @@ class Renamed:
+     def run(self):
+-        return 3
++        return 4
+diff --git a/assets/logo.png b/assets/logo.png
+index 7777777..8888888 100644
+Binary files a/assets/logo.png and b/assets/logo.png differ
+diff --git a/src/last.py b/src/last.py
+index 9999999..aaaaaaa 100644
+--- a/src/last.py
++++ b/src/last.py
+@@ -1 +1 @@
+-x = 1
+\\ No newline at end of file
++x = 2
+\\ No newline at end of file
+"""
+
+
+def _as_dicts(files) -> list:
+    """Brings parsed CompactFiles into the format of DiffParser."""
+    result = []
+    for file in files:
+        hunks = []
+        for hunk in file.hunks:
+            hunks.append({"hunk_header": hunk.header.strip(), "lines": []})
+        for hunk, _kind, line_type, source_no, target_no, content in file.iter_lines():
+            hunks[file.hunks.index(hunk)]["lines"].append({
+                "type": line_type,
+                "content": content,
+                "source_line_no": source_no,
+                "target_line_no": target_no,
+            })
+        result.append({
+            "source_file": file.source_file,
+            "target_file": file.target_file,
+            "is_new_file": file.is_new_file,
+            "is_deleted_file": file.is_deleted_file,
+            "is_renamed_file": file.is_renamed_file,
+            "hunks": hunks,
+        })
+    return result
+
+
+@pytest.mark.parametrize("patch", [
+    EDGE_CASES,
+    make_patch(files=5, hunks=3, lines=15, seed=1),
+    make_patch(files=1, hunks=1, lines=200, seed=2),
+], ids=["edge-cases", "synthetic", "single-large-hunk"])
+def test_matches_unidiff(patch):
+    expected = DiffParser().parse(patch)
+    assert _as_dicts(StreamingDiffParser().parse(patch)) == expected
+    assert _as_dicts(StreamingDiffParser().parse(patch.encode())) == expected
+
+
+def test_edge_cases_keep_their_flags_and_skip_binary_files():
+    files = StreamingDiffParser().parse(EDGE_CASES)
+
+    assert [file.name for file in files] == [
+        "README.md", "src/added.py", "src/removed.py", "src/new_name.py", "src/last.py",
+    ]
+    assert [(file.is_new_file, file.is_deleted_file, file.is_renamed_file) for file in files] == [
+        (False, False, False), (True, False, False), (False, True, False),
+        (False, False, True), (False, False, False),
+    ]
+    assert [(file.added, file.removed) for file in files] == [(2, 1), (2, 0), (0, 2), (1, 1), (1, 1)]
+
+
+def test_capped_by_file_count():
+    patch = make_patch(files=6, hunks=2, lines=10)
+    files, reason = StreamingDiffParser().parse_limited(patch, max_files=4)
+
+    assert reason == "more than 4 changed files"
+    assert _as_dicts(files) == DiffParser().parse(patch)[:4]
+
+
+def test_capped_by_line_count_stops_before_the_file_that_exceeds_it():
+    patch = make_patch(files=5, hunks=2, lines=10)
+    files, reason = StreamingDiffParser().parse_limited(patch, max_lines=45)
+
+    assert reason == "more than 45 diff lines"
+    assert _as_dicts(files) == DiffParser().parse(patch)[:2]
+
+
+def test_line_cap_always_keeps_the_first_file():
+    patch = make_patch(files=3, hunks=4, lines=20)
+    files, reason = StreamingDiffParser().parse_limited(patch, max_lines=10)
+
+    assert reason == "more than 10 diff lines"
+    assert [file.name for file in files] == ["src/module_0/file_0.py"]
+    assert sum(len(hunk) for hunk in files[0].hunks) == 80
+
+
+def test_patch_within_the_caps_is_kept_whole():
+    patch = make_patch(files=3, hunks=2, lines=10)
+    files, reason = StreamingDiffParser().parse_limited(patch, max_files=3, max_lines=60)
+
+    assert reason is None
+    assert _as_dicts(files) == DiffParser().parse(patch)
+
+
+def test_truncated_download_parses_its_complete_files():
+    patch = make_patch(files=6, hunks=2, lines=10).encode()
+    cut = patch.index(b"diff --git a/src/module_4/")
+    chunks = [patch[start:start + 100] for start in range(0, len(patch), 100)]
+
+    with spool_patch(chunks, max_bytes=cut + 50) as downloaded:
+        assert downloaded.truncated
+        files = StreamingDiffParser().parse(downloaded.buffer)
+        expected = DiffParser().parse(patch[:cut].decode())
+        assert len(expected) == 4
+        assert _as_dicts(files) == expected
+
+
+def test_truncated_spooled_download_parses_from_the_memory_map():
+    patch = make_patch(files=6, hunks=2, lines=10).encode()
+    cut = patch.index(b"diff --git a/src/module_3/")
+    chunks = [patch[start:start + 100] for start in range(0, len(patch), 100)]
+
+    with spool_patch(chunks, max_bytes=cut + 50, spool_threshold=200) as downloaded:
+        assert downloaded.spooled and downloaded.truncated
+        files = StreamingDiffParser().parse(downloaded.buffer)
+        assert _as_dicts(files) == DiffParser().parse(patch[:cut].decode())
+
+
+def test_patch_cut_inside_a_hunk_is_rejected_like_unidiff():
+    patch = make_patch(files=2, hunks=1, lines=10)
+    cut = patch[:patch.rindex("value_5")]
+
+    with pytest.raises(Exception):
+        DiffParser().parse(cut)
+    with pytest.raises(ValueError, match="shorter than expected"):
+        StreamingDiffParser().parse(cut)
@@ -0,0 +1,112 @@
+"""
+Reports the run statistics of tasks through /status, their errors in one shape, and the
+pipeline metrics through /metrics.
+"""
+import itertools
+import json
+import re
+import uuid
+
+import fakeredis
+import pytest
+
+from benchmarks.fake_llm import FakeCrew
+from conftest import REPO_URL, sync_cache
+
+from app import main
+from app.analysis_pipeline import AnalysisPipeline, PipelineResources
+from services.redis_services.async_task_backend import AsyncTaskBackend
+from services.redis_services.inflight_registry import InFlightRegistry
+
+# Every analysed task reviews a new PR, so it is not answered by the result cache.
+PR_NUMBERS = itertools.count(801)
+STAGES = {"result_cache_read", "fetch_patch", "parse", "triage", "file_cache_read", "pack", "llm", "total"}
+
+
+@pytest.fixture
+def backend(monkeypatch, redis_server) -> fakeredis.FakeRedis:
+    """The Celery result backend the API reads, on a fakeredis server."""
+    task_backend = AsyncTaskBackend("redis://unused")
+    task_backend.redis_client = fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True)
+    monkeypatch.setattr(main, "task_backend", task_backend)
+    return sync_cache(redis_server).redis_client
+
+
+def _set_task_meta(backend, task_id: str, status: str, result):
+    backend.set(f"{AsyncTaskBackend.KEY_PREFIX}{task_id}", json.dumps({"status": status, "result": result}))
+
+
+@pytest.fixture
+def analysed_task(github, monkeypatch, redis_server) -> tuple:
+    """Runs an analysis as task and returns its id and the progress metas it reported."""
+    token = uuid.uuid4().hex
+    monkeypatch.setattr(github, "patch_factory", lambda number: (
+        f"From {'8' * 40} Mon Sep 17 00:00:00 2001\nSubject: [PATCH] Change\n\n---\n"
+        "diff --git a/app/views.py b/app/views.py\n--- a/app/views.py\n+++ b/app/views.py\n"
+        f"@@ -1,2 +1,2 @@\n def view():\n-    return None\n+    return '{token}'\n-- \n2.43.0\n\n"
+    ))
+    task_id, pr_number = str(uuid.uuid4()), next(PR_NUMBERS)
+    progress = []
+    resources = PipelineResources(github_token="test-token", crew=FakeCrew())
+    # Tasks refresh their in-flight entry, which runs a script.
+    resources.inflight = InFlightRegistry(sync_cache(redis_server))
+    pipeline = AnalysisPipeline(resources=resources, task_id=task_id,
+                                task_state_updater=lambda state, meta: progress.append((state, meta)))
+    pipeline.run(REPO_URL, pr_number, head_sha=github.head_sha(pr_number))
+    return task_id, progress
+
+
+def test_stage_timings_reach_the_task_meta(api_client, backend, analysed_task):
+    task_id, progress = analysed_task
+    _set_task_meta(backend, task_id, "SUCCESS", {"result_key": "unused"})
+
+    response = api_client.get(f"/status/{task_id}")
+
+    assert response.status_code == 200
+    meta = response.json()["meta"]
+    assert STAGES <= set(meta["timings"])
+    assert all(seconds >= 0 for seconds in meta["timings"].values())
+    assert (meta["file_cache_hits"], meta["file_cache_misses"]) == (0, 1)
+    # Progress updates carry the statistics gathered so far.
+    _, last_progress = progress[-1]
+    assert {"triage", "file_cache_read"} <= set(last_progress["timings"])
+
+
+def test_metrics_expose_the_documented_series(api_client, analysed_task):
+    body = api_client.get("/metrics").text
+
+    for stage in STAGES:
+        assert f'pr_analysis_stage_seconds_count{{stage="{stage}"}}' in body
+    for series in ('pr_analysis_cache_requests_total{cache="file",outcome="miss"}',
+                   "pr_analysis_llm_call_seconds_count", 'pr_analysis_llm_tokens_count{kind="prompt"}',
+                   'github_requests_total{endpoint="patch",status="200"}', "pr_api_request_seconds_count"):
+        assert series in body
+    assert re.search(r'^pr_api_request_seconds_count\{method="GET",route="/status/\{task_id\}"', body, re.MULTILINE)
+
+
+@pytest.mark.parametrize("status, result, error", [
+    ("RETRY", {"exc_type": "RateLimited", "exc_message": ["Rate limit llm-requests exhausted for 40.0s."],
+               "exc_module": "services.redis_services.rate_limiter"}, "Rate limit llm-requests exhausted for 40.0s."),
+    ("FAILURE", {"exc_type": "ValueError", "exc_message": ["Invalid repo_url format."],
+                 "exc_module": "builtins"}, "Invalid repo_url format."),
+    ("SUPERSEDED", {"error": "A newer head is being analysed."}, "A newer head is being analysed."),
+    ("REVOKED", {"exc_type": "TaskRevokedError", "exc_message": ["revoked"],
+                 "exc_module": "celery.exceptions"}, "revoked"),
+])
+def test_unsuccessful_tasks_report_their_error(api_client, backend, status, result, error):
+    task_id = str(uuid.uuid4())
+    _set_task_meta(backend, task_id, status, result)
+
+    response = api_client.get(f"/status/{task_id}")
+
+    assert response.json() == {"task_id": task_id, "status": status, "meta": {"error": error}}
+
+
+def test_retrying_task_keeps_its_run_statistics(api_client, backend, analysed_task):
+    task_id, _ = analysed_task
+    _set_task_meta(backend, task_id, "RETRY", {"exc_type": "RateLimited", "exc_message": ["Deferred."]})
+
+    meta = api_client.get(f"/status/{task_id}").json()["meta"]
+
+    assert meta["error"] == "Deferred."
+    assert STAGES <= set(meta["timings"])
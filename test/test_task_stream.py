@@ -0,0 +1,148 @@
+"""
+Streams task events as Server-Sent Events from a fakeredis server: replays, resumes, live events
+and the terminal event that closes the stream.
+"""
+import json
+import threading
+import uuid
+
+import fakeredis
+import pytest
+
+from conftest import async_cache, sync_cache
+
+from app import main
+from services.redis_services.async_task_backend import AsyncTaskBackend
+from services.redis_services.task_events import AsyncTaskEventHub, TaskEventPublisher
+
+
+@pytest.fixture
+def events(monkeypatch, redis_server) -> TaskEventPublisher:
+    """Publishes task events the way workers do, to the hub and result backend the API reads."""
+    monkeypatch.setattr(main, "task_event_hub", AsyncTaskEventHub(async_cache(redis_server)))
+    backend = AsyncTaskBackend("redis://unused")
+    backend.redis_client = fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True)
+    monkeypatch.setattr(main, "task_backend", backend)
+    return TaskEventPublisher(sync_cache(redis_server))
+
+
+def _set_task_meta(redis_server, task_id: str, status: str, result):
+    client = sync_cache(redis_server).redis_client
+    client.set(f"{AsyncTaskBackend.KEY_PREFIX}{task_id}", json.dumps({"status": status, "result": result}))
+
+
+def _stream(client, task_id: str, last_event_id: str = None) -> list:
+    """Reads a stream to its end and returns its (id, event, data) messages and keep-alives."""
+    headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+    response = client.get(f"/stream/{task_id}", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    messages = []
+    for block in response.text.split("\n\n")[:-1]:
+        if block.startswith(":"):
+            messages.append("keep-alive")
+            continue
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        messages.append((fields.get("id"), fields["event"], json.loads(fields["data"])))
+    return messages
+
+
+def test_replay_ends_with_the_result(api_client, events):
+    task_id = str(uuid.uuid4())
+    events.publish(task_id, "progress", {"state": "FETCHING"})
+    events.publish(task_id, "file", {"name": "app/main.py", "issues": []})
+    events.publish(task_id, "result", {"summary": {"total_files": 1}})
+
+    assert _stream(api_client, task_id) == [
+        ("1", "progress", {"state": "FETCHING"}),
+        ("2", "file", {"name": "app/main.py", "issues": []}),
+        ("3", "result", {"summary": {"total_files": 1}}),
+    ]
+
+
+def test_reconnecting_client_resumes_after_the_last_event_id(api_client, events):
+    task_id = str(uuid.uuid4())
+    for state in ("FETCHING", "PARSING", "ANALYZING"):
+        events.publish(task_id, "progress", {"state": state})
+    events.publish(task_id, "result", {})
+
+    assert _stream(api_client, task_id, last_event_id="2") == [
+        ("3", "progress", {"state": "ANALYZING"}),
+        ("4", "result", {}),
+    ]
+
+
+@pytest.mark.parametrize("event", ["result", "error", "superseded"])
+def test_stream_closes_after_the_terminal_event(api_client, events, event):
+    task_id = str(uuid.uuid4())
+    events.publish(task_id, "progress", {"state": "ANALYZING"})
+    events.publish(task_id, event, {"error": "stop"})
+    # Nothing follows a terminal event; were it sent, the stream would not have closed there.
+    events.publish(task_id, "progress", {"state": "AFTER"})
+
+    messages = _stream(api_client, task_id)
+
+    assert [message[1] for message in messages] == ["progress", event]
+
+
+def test_live_events_are_streamed_until_the_result(api_client, events, monkeypatch):
+    monkeypatch.setattr(main, "STREAM_HEARTBEAT_SECONDS", 0.05)
+    task_id = str(uuid.uuid4())
+    events.publish(task_id, "progress", {"state": "FETCHING"})
+
+    def finish():
+        events.publish(task_id, "file", {"name": "app/main.py", "issues": []})
+        events.publish(task_id, "result", {"summary": {}})
+
+    timer = threading.Timer(0.3, finish)
+    timer.start()
+    try:
+        messages = [message for message in _stream(api_client, task_id) if message != "keep-alive"]
+    finally:
+        timer.cancel()
+
+    assert messages == [
+        ("1", "progress", {"state": "FETCHING"}),
+        ("2", "file", {"name": "app/main.py", "issues": []}),
+        ("3", "result", {"summary": {}}),
+    ]
+
+
+@pytest.mark.parametrize("status, result, expected", [
+    ("SUCCESS", {"summary": {"total_files": 0}, "files": []}, ("result", {"summary": {"total_files": 0}, "files": []})),
+    ("FAILURE", {"exc_type": "ValueError", "exc_message": ["Invalid repo_url format."]},
+     ("error", {"error": "Invalid repo_url format."})),
+    ("SUPERSEDED", {"error": "A newer head is being analysed."}, ("superseded", {"error": "A newer head is being analysed."})),
+])
+def test_finished_task_without_a_replay_log_ends_with_its_backend_state(api_client, events, redis_server,
+                                                                      status, result, expected):
+    task_id = str(uuid.uuid4())
+    _set_task_meta(redis_server, task_id, status, result)
+
+    assert _stream(api_client, task_id) == [(None, *expected)]
+
+
+def test_unknown_task_is_closed_after_the_idle_heartbeats(api_client, events, monkeypatch):
+    monkeypatch.setattr(main, "STREAM_HEARTBEAT_SECONDS", 0.01)
+    monkeypatch.setattr(main, "STREAM_MAX_IDLE_HEARTBEATS", 3)
+
+    messages = _stream(api_client, str(uuid.uuid4()))
+
+    assert messages == ["keep-alive"] * 3 + [(None, "error", {"error": "Task ID not found."})]
+
+
+def test_started_task_is_not_closed_while_idle(api_client, events, redis_server, monkeypatch):
+    monkeypatch.setattr(main, "STREAM_HEARTBEAT_SECONDS", 0.02)
+    monkeypatch.setattr(main, "STREAM_MAX_IDLE_HEARTBEATS", 1)
+    task_id = str(uuid.uuid4())
+    _set_task_meta(redis_server, task_id, "STARTED", None)
+    timer = threading.Timer(0.3, events.publish, args=(task_id, "result", {}))
+    timer.start()
+    try:
+        messages = _stream(api_client, task_id)
+    finally:
+        timer.cancel()
+
+    assert messages.count("keep-alive") > 1
+    assert messages[-1] == ("1", "result", {})
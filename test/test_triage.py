@@ -0,0 +1,74 @@
+"""
+Classifies small hand-written diffs with FileTriage.
+"""
+import pytest
+
+from services.ai_services.triage import CODE, DOCS, RENAME, TRIVIAL, FileTriage
+from services.github_services.streaming_diff_parser import StreamingDiffParser
+
+
+def _diff(name: str, removed: str, added: str) -> str:
+    return (f"diff --git a/{name} b/{name}\n--- a/{name}\n+++ b/{name}\n"
+            f"@@ -1,3 +1,3 @@\n first\n-{removed}\n+{added}\n last\n")
+
+
+def _classify(patch: str) -> str:
+    (file,) = StreamingDiffParser().parse(patch)
+    return FileTriage().classify(file)
+
+
+def test_whitespace_within_a_shell_command_is_code():
+    assert _classify(_diff("deploy.sh", "rm -rf /tmp/build", "rm -rf / tmp/build")) == CODE
+
+
+def test_whitespace_within_a_string_literal_is_code():
+    assert _classify(_diff("a.js", 'const parts = items.join(", ");', 'const parts = items.join(",");')) == CODE
+
+
+def test_reindented_line_is_trivial():
+    assert _classify(_diff("a.js", "  return value;", "    return value;  ")) == TRIVIAL
+
+
+def test_reindented_python_line_is_code():
+    assert _classify(_diff("a.py", "    return value", "return value")) == CODE
+
+
+def test_trailing_whitespace_in_python_is_trivial():
+    assert _classify(_diff("a.py", "    return value", "    return value   ")) == TRIVIAL
+
+
+def test_version_bump_in_a_manifest_is_trivial():
+    assert _classify(_diff("requirements.txt", "requests==2.31.0", "requests==2.32.3")) == TRIVIAL
+
+
+def test_new_dependency_in_a_manifest_is_code():
+    assert _classify(_diff("requirements.txt", "requests==2.31.0", "requests-toolbelt==1.0.0")) == CODE
+
+
+def test_moved_line_is_code():
+    patch = ("diff --git a/a.js b/a.js\n--- a/a.js\n+++ b/a.js\n"
+             "@@ -1,2 +1,2 @@\n-check(user);\n remove(item);\n+check(user);\n")
+    assert _classify(patch) == CODE
+
+
+def test_documentation_is_docs():
+    assert _classify(_diff("docs/usage.md", "Run it.", "Run it twice.")) == DOCS
+
+
+def test_pure_rename_is_rename():
+    patch = ("diff --git a/old.py b/new.py\nsimilarity index 100%\n"
+             "rename from old.py\nrename to new.py\n")
+    assert _classify(patch) == RENAME
+
+
+def test_documentation_files_are_docs_in_any_directory():
+    assert _classify(_diff("README", "Run it.", "Run it twice.")) == DOCS
+    assert _classify(_diff("pkg/LICENSE", "MIT", "Apache-2.0")) == DOCS
+    assert _classify(_diff("notes/todo.txt", "one", "two")) == DOCS
+
+
+@pytest.mark.parametrize("name", [
+    "api/docs/views.py", "docs/conf.py", "lib/doc/parser.c", "pkg/README_helpers.py", "CMakeLists.txt",
+])
+def test_source_files_under_documentation_paths_are_code(name):
+    assert _classify(_diff(name, "value = 1", "value = 2")) == CODE
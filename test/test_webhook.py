@@ -0,0 +1,140 @@
+"""
+Sends GitHub webhook deliveries to the API, with the local fake Redis behind it and the broker
+publish replaced by a recorder.
+"""
+import hashlib
+import hmac
+import json
+import types
+import uuid
+from typing import Union
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from services.redis_services.cache_keys import pr_head_key
+
+SECRET = "webhook-secret"
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """The analyses published to the broker by the requests of a test."""
+    monkeypatch.setenv("GITHUB_WEBHOOK_SECRET", SECRET)
+    published = []
+
+    def send_analysis(repo_url, pr_number, head_sha, task_id, priority):
+        published.append((repo_url, pr_number, head_sha, task_id, priority))
+        return types.SimpleNamespace(id=task_id)
+
+    monkeypatch.setattr(main, "send_analysis", send_analysis)
+    return published
+
+
+def _deliver(client: TestClient, event: str, body: bytes, signature: Union[str, bytes] = None):
+    signature = signature or "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+    return client.post("/webhooks/github", content=body, headers={
+        "X-GitHub-Event": event, "X-Hub-Signature-256": signature, "Content-Type": "application/json",
+    })
+
+
+def _pull_request(action: str = "synchronize", head_sha: str = None) -> dict:
+    return {
+        "action": action,
+        "repository": {"html_url": "https://github.com/test/webhooks"},
+        "pull_request": {"number": 7, "head": {"sha": head_sha or uuid.uuid4().hex}},
+    }
+
+
+def test_signed_push_starts_an_analysis_once(api_client, sent):
+    payload = _pull_request()
+    head_sha = payload["pull_request"]["head"]["sha"]
+
+    first = _deliver(api_client, "pull_request", json.dumps(payload).encode())
+    second = _deliver(api_client, "pull_request", json.dumps(payload).encode())
+
+    assert first.status_code == 202
+    assert first.json()["status"] == "TASK_STARTED"
+    assert second.json() == {**first.json(), "status": "IN_PROGRESS", "message": "Analysis is already in progress."}
+    assert [(repo_url, pr_number, sha) for repo_url, pr_number, sha, _, _ in sent] == [
+        ("https://github.com/test/webhooks", 7, head_sha)
+    ]
+    assert sent[0][4] == main.PRIORITY_BACKGROUND
+
+
+def test_wrong_signature_is_rejected(api_client, sent):
+    body = json.dumps(_pull_request()).encode()
+
+    assert _deliver(api_client, "pull_request", body, signature="sha256=" + "0" * 64).status_code == 401
+    assert _deliver(api_client, "pull_request", body, signature="sha256=ünïcode".encode("latin-1")).status_code == 401
+    assert sent == []
+
+
+def test_ping_is_answered(api_client, sent):
+    response = _deliver(api_client, "ping", b'{"zen": "Keep it logically awesome."}')
+
+    assert response.status_code == 202
+    assert response.json()["status"] == "PONG"
+
+
+@pytest.mark.parametrize("event, action", [("pull_request", "closed"), ("push", None)])
+def test_events_without_a_new_head_are_ignored(api_client, sent, event, action):
+    response = _deliver(api_client, event, json.dumps(_pull_request(action=action)).encode())
+
+    assert response.json()["status"] == "IGNORED"
+    assert sent == []
+
+
+@pytest.mark.parametrize("body", [
+    b"not json",
+    b"\xff\xfe",
+    b"[1, 2]",
+    json.dumps({"action": "opened", "repository": {"html_url": "https://github.com/test/webhooks"}}).encode(),
+    json.dumps({**_pull_request(), "pull_request": {"number": 7, "head": None}}).encode(),
+    json.dumps({**_pull_request(), "pull_request": {"number": "7", "head": {"sha": "abc"}}}).encode(),
+])
+def test_malformed_payload_is_a_bad_request(api_client, sent, body):
+    assert _deliver(api_client, "pull_request", body).status_code == 400
+    assert sent == []
+
+
+@pytest.fixture
+def lua_cache(api_client, redis_server, monkeypatch):
+    """Serves the API's result cache from fakeredis, which runs the Lua scripts of the head pointers."""
+    cache = main.AsyncRedisCacheService(db=2)
+    cache.redis_client = fakeredis.FakeAsyncRedis(server=redis_server)
+    monkeypatch.setitem(main.app.dependency_overrides, main.get_result_cache_service, lambda: cache)
+    revoked = []
+    monkeypatch.setattr(main, "revoke", revoked.append)
+    return revoked
+
+
+def _push(head_sha: str, updated_at: str) -> bytes:
+    payload = _pull_request(head_sha=head_sha)
+    payload["pull_request"]["updated_at"] = updated_at
+    return json.dumps(payload).encode()
+
+
+def test_late_delivery_of_an_older_head_keeps_the_newer_one(api_client, sent, lua_cache, redis_server):
+    newer, older = "b" * 40, "a" * 40
+    started = _deliver(api_client, "pull_request", _push(newer, "2024-05-01T12:05:00Z")).json()
+
+    late = _deliver(api_client, "pull_request", _push(older, "2024-05-01T12:00:00Z"))
+
+    assert late.json()["status"] == "TASK_STARTED"
+    assert lua_cache == []
+    pointer = fakeredis.FakeRedis(server=redis_server).hgetall(pr_head_key("https://github.com/test/webhooks", 7))
+    assert (pointer[b"sha"].decode(), pointer[b"task_id"].decode()) == (newer, started["task_id"])
+
+
+def test_newer_head_revokes_the_analysis_of_the_older_one(api_client, sent, lua_cache, redis_server):
+    older, newer = "c" * 40, "d" * 40
+    first = _deliver(api_client, "pull_request", _push(older, "2024-05-01T12:00:00Z")).json()
+
+    _deliver(api_client, "pull_request", _push(newer, "2024-05-01T12:05:00Z"))
+
+    assert lua_cache == [first["task_id"]]
+    pointer = fakeredis.FakeRedis(server=redis_server).hgetall(pr_head_key("https://github.com/test/webhooks", 7))
+    assert pointer[b"sha"].decode() == newer